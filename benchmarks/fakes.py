@@ -0,0 +1,278 @@
+"""Local stand-ins for the Ollama and Notion HTTP APIs used by the benchmarks."""
+import contextlib
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+def deterministic_embedding(text: str, dimensions: int) -> List[float]:
+    """Unit vector derived from a hash of the text, stable across runs."""
+    values = []
+    counter = 0
+    while len(values) < dimensions:
+        digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        values.extend((byte - 127.5) / 127.5 for byte in digest)
+        counter += 1
+    values = values[:dimensions]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+
+class _FakeServer:
+    handler_class = None
+
+    def __init__(self, latency: float = 0.0, parallel: Optional[int] = None):
+        self.latency = latency
+        # Requests that can be inside their latency at once; None for no limit
+        self.slots = threading.BoundedSemaphore(parallel) if parallel else contextlib.nullcontext()
+        self.request_count = 0
+        self._lock = threading.Lock()
+        handler = type("Handler", (self.handler_class,), {"fake": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def count_request(self):
+        with self._lock:
+            self.request_count += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    fake = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_json(self, payload, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, method: str):
+        self.fake.count_request()
+        if self.fake.latency:
+            with self.fake.slots:
+                time.sleep(self.fake.latency)
+        self.route(method, urlparse(self.path))
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def route(self, method, url):
+        raise NotImplementedError
+
+
+class _OllamaHandler(_JSONHandler):
+    def route(self, method, url):
+        if url.path == "/api/embeddings":
+            body = self.read_json()
+            self.send_json({"embedding": deterministic_embedding(body.get("prompt", ""), self.fake.dimensions)})
+        elif url.path == "/api/embed":
+            body = self.read_json()
+            inputs = body.get("input", [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            self.send_json({
+                "model": body.get("model"),
+                "embeddings": [deterministic_embedding(text, self.fake.dimensions) for text in inputs],
+            })
+        elif url.path == "/api/generate":
+            body = self.read_json()
+            words = self.fake.response_text.split()
+            self.send_json({
+                "model": body.get("model"),
+                "response": self.fake.response_text,
+                "done": True,
+                "context": [1, 2, 3],
+                "total_duration": int(self.fake.latency * 1e9),
+                "load_duration": 0,
+                "prompt_eval_count": len(body.get("prompt", "").split()),
+                "eval_count": len(words),
+                "eval_duration": max(1_000_000, int(self.fake.latency * 1e9)),
+            })
+        elif url.path in ("/api/tags", "/api/ps"):
+            self.send_json({"models": [{"name": self.fake.model, "model": self.fake.model}]})
+        else:
+            self.send_json({"error": "not found"}, status=404)
+
+
+class FakeOllamaServer(_FakeServer):
+    """Serves /api/embeddings, /api/embed and /api/generate with deterministic output.
+
+    `parallel` caps concurrent requests like OLLAMA_NUM_PARALLEL does for a real instance.
+    """
+
+    handler_class = _OllamaHandler
+
+    def __init__(self, latency: float = 0.0, dimensions: int = 384, model: str = "mistral-nemo",
+                 response_text: str = "A deterministic benchmark answer.", parallel: Optional[int] = None):
+        super().__init__(latency, parallel)
+        self.dimensions = dimensions
+        self.model = model
+        self.response_text = response_text
+
+
+def _page_id(database_id: str, index: int) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{database_id}/{index}"))
+
+
+def _title_property(text: str) -> Dict:
+    return {"id": "title", "type": "title", "title": [{"plain_text": text, "type": "text"}]}
+
+
+class SyntheticDatabase:
+    """A Notion database of `size` note pages, each related to one of `npc_count` NPC pages."""
+
+    def __init__(self, database_id: str, size: int, npc_count: Optional[int] = None, paragraphs: int = 3):
+        self.database_id = database_id
+        self.size = size
+        self.npc_count = npc_count or max(1, size // 10)
+        self.paragraphs = paragraphs
+        self.npc_ids = [_page_id(f"{database_id}-npc", i) for i in range(self.npc_count)]
+        self.page_ids = [_page_id(database_id, i) for i in range(size)]
+        self._index = {page_id: i for i, page_id in enumerate(self.page_ids)}
+        self._npc_index = {page_id: i for i, page_id in enumerate(self.npc_ids)}
+
+    def npc_name(self, index: int) -> str:
+        return f"NPC {index}"
+
+    def page(self, index: int) -> Dict:
+        page_id = self.page_ids[index]
+        npc = index % self.npc_count
+        return {
+            "object": "page",
+            "id": page_id,
+            "url": f"https://www.notion.so/{page_id.replace('-', '')}",
+            "last_edited_time": "2024-01-01T00:00:00.000Z",
+            "properties": {
+                "Name": _title_property(f"Session note {index}"),
+                "About NPC": {"id": "npc", "type": "relation", "relation": [{"id": self.npc_ids[npc]}], "has_more": False},
+                "Tags": {"id": "tags", "type": "multi_select", "multi_select": [{"name": f"tag{index % 5}"}]},
+            },
+        }
+
+    def npc_page(self, index: int) -> Dict:
+        page_id = self.npc_ids[index]
+        return {
+            "object": "page",
+            "id": page_id,
+            "url": f"https://www.notion.so/{page_id.replace('-', '')}",
+            "last_edited_time": "2024-01-01T00:00:00.000Z",
+            "properties": {"Name": _title_property(self.npc_name(index))},
+        }
+
+    def retrieve(self, page_id: str) -> Optional[Dict]:
+        if page_id in self._index:
+            return self.page(self._index[page_id])
+        if page_id in self._npc_index:
+            return self.npc_page(self._npc_index[page_id])
+        return None
+
+    def blocks(self, page_id: str) -> List[Dict]:
+        index = self._index.get(page_id, 0)
+        return [
+            {
+                "object": "block",
+                "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"{page_id}/{i}")),
+                "type": "paragraph",
+                "has_children": False,
+                "paragraph": {"rich_text": [{"plain_text": f"Note {index} paragraph {i} about {self.npc_name(index % self.npc_count)}."}]},
+            }
+            for i in range(self.paragraphs)
+        ]
+
+
+_PAGE_PATH = re.compile(r"^/v1/pages/([^/]+)$")
+_BLOCKS_PATH = re.compile(r"^/v1/blocks/([^/]+)/children$")
+_QUERY_PATH = re.compile(r"^/v1/databases/([^/]+)/query$")
+
+
+def _paginate(items: List, cursor: Optional[str], page_size: int) -> Dict:
+    start = int(cursor) if cursor else 0
+    end = start + page_size
+    has_more = end < len(items)
+    return {"object": "list", "results": items[start:end], "has_more": has_more, "next_cursor": str(end) if has_more else None}
+
+
+class _NotionHandler(_JSONHandler):
+    def route(self, method, url):
+        query = parse_qs(url.query)
+        if method == "POST" and _QUERY_PATH.match(url.path):
+            database = self.fake.databases.get(_QUERY_PATH.match(url.path).group(1))
+            if database is None:
+                return self.send_json({"object": "error", "status": 404, "code": "object_not_found", "message": "not found"}, 404)
+            body = self.read_json()
+            page_size = min(int(body.get("page_size") or 100), 100)
+            start = int(body.get("start_cursor") or 0)
+            pages = [database.page(i) for i in range(start, min(start + page_size, database.size))]
+            has_more = start + page_size < database.size
+            return self.send_json({"object": "list", "results": pages, "has_more": has_more,
+                                   "next_cursor": str(start + page_size) if has_more else None})
+        if method == "GET" and _BLOCKS_PATH.match(url.path):
+            page_id = _BLOCKS_PATH.match(url.path).group(1)
+            database = self.fake.find(page_id)
+            blocks = database.blocks(page_id) if database else []
+            return self.send_json(_paginate(blocks, query.get("start_cursor", [None])[0], 100))
+        if method == "GET" and _PAGE_PATH.match(url.path):
+            page_id = _PAGE_PATH.match(url.path).group(1)
+            database = self.fake.find(page_id)
+            if database is None:
+                return self.send_json({"object": "error", "status": 404, "code": "object_not_found", "message": "not found"}, 404)
+            return self.send_json(database.retrieve(page_id))
+        if method == "POST" and url.path == "/v1/search":
+            body = self.read_json()
+            results = [
+                {"object": "database", "id": database_id, "title": [{"plain_text": f"Database {database_id}"}]}
+                for database_id in self.fake.databases
+            ]
+            return self.send_json(_paginate(results, body.get("start_cursor"), int(body.get("page_size") or 100)))
+        if method == "GET" and url.path == "/v1/users":
+            return self.send_json({"object": "list", "results": [{"object": "user", "id": "bench-user"}], "has_more": False, "next_cursor": None})
+        self.send_json({"object": "error", "status": 404, "code": "invalid_request_url", "message": url.path}, 404)
+
+
+class FakeNotionServer(_FakeServer):
+    """Serves the subset of the Notion v1 API that the ingest path calls."""
+
+    handler_class = _NotionHandler
+
+    def __init__(self, databases: List[SyntheticDatabase], latency: float = 0.0):
+        super().__init__(latency)
+        self.databases = {database.database_id: database for database in databases}
+
+    def find(self, page_id: str) -> Optional[SyntheticDatabase]:
+        for database in self.databases.values():
+            if database.retrieve(page_id) is not None:
+                return database
+        return None
@@ -0,0 +1,215 @@
+"""Benchmark the Notion extract, ingest and answer hot paths against local stand-ins.
+
+Usage:
+    python -m benchmarks.run --sizes 100 1000 10000 --ollama-latency 0.005
+    python -m benchmarks.run --output new.json --compare benchmarks/results/<commit>.json
+    python -m benchmarks.run --sizes 1000 --ollama-latency 0.01 --ollama-parallel 1 --ollama-instances 4
+
+Ollama and Notion are replaced by the HTTP servers in benchmarks/fakes.py and Chroma
+persists to a temporary directory, so nothing outside the process is touched.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+from benchmarks.fakes import FakeNotionServer, FakeOllamaServer, SyntheticDatabase
+from src.telemetry.metrics import percentile
+
+DEFAULT_SIZES = [100, 1000, 10000]
+RESULTS_DIR = project_root / "benchmarks" / "results"
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=project_root, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def measure(fn: Callable[[], object], repeat: int, items: int = 1) -> Dict[str, float]:
+    """Time `fn` `repeat` times; `items` is the number of units processed per call."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    total = sum(samples)
+    return {
+        "runs": repeat,
+        "items_per_run": items,
+        "throughput_per_s": (items * repeat / total) if total else 0.0,
+        "mean_s": total / repeat,
+        "p50_s": percentile(samples, 50),
+        "p95_s": percentile(samples, 95),
+        "p99_s": percentile(samples, 99),
+    }
+
+
+def configure(ollama_url: str, notion_url: str, chroma_dir: str):
+    """Point the shared clients and the Chroma client at the local stand-ins."""
+    from src import config
+    from src.clients import close_clients
+
+    os.environ["NOTION_API_KEY"] = "benchmark"
+    os.environ["ANONYMIZED_TELEMETRY"] = "False"
+    config.NOTION_API_KEY = "benchmark"
+    config.NOTION_BASE_URL = notion_url
+    config.OLLAMA_HOST = ollama_url
+    config.OLLAMA_HOSTS = []
+    config.CHROMA_PERSIST_DIRECTORY = Path(chroma_dir)
+    config.INGEST_JOB_DB = Path(chroma_dir) / "ingest_jobs.sqlite3"
+    config.VECTOR_INDEX_DIRECTORY = Path(chroma_dir) / "vector_index"
+    config.AUTOCOMPLETE_INDEX_FILE = Path(chroma_dir) / "autocomplete.json"
+    config.RELATION_GRAPH_DIRECTORY = Path(chroma_dir) / "relation_graph"
+    # The stand-in has no request quota, so measure the pipeline rather than the limiter
+    config.NOTION_RATE_LIMIT = 0
+    close_clients()
+
+
+def run(args) -> Dict:
+    from src.notion.download import extract_notion_docs
+    from src.ollama_utils.ingest import process_and_store_embeddings
+    from src.ollama_utils import answer
+
+    # The pipeline modules log per document at INFO; keep that out of the measurements
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    databases = [SyntheticDatabase(f"bench{size}", size) for size in args.sizes]
+    results: Dict[str, Dict] = {}
+
+    with contextlib.ExitStack() as stack:
+        ollama_servers = [
+            stack.enter_context(FakeOllamaServer(latency=args.ollama_latency, dimensions=args.dimensions,
+                                                 parallel=args.ollama_parallel))
+            for _ in range(max(1, args.ollama_instances))
+        ]
+        notion_server = stack.enter_context(FakeNotionServer(databases, latency=args.notion_latency))
+        chroma_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix="notekeeper-bench-"))
+        configure(ollama_servers[0].url, notion_server.url, chroma_dir)
+        if len(ollama_servers) > 1:
+            from src import config
+            from src.clients import close_clients
+
+            config.OLLAMA_HOSTS = [server.url for server in ollama_servers]
+            close_clients()
+        answer.chroma_client = None
+
+        for database in databases:
+            docs: List = []
+
+            def extract():
+                docs[:] = extract_notion_docs(database.database_id) or []
+
+            results[f"extract_notion_docs[{database.size}]"] = measure(extract, args.repeat, database.size)
+            if len(docs) != database.size:
+                raise RuntimeError(f"Expected {database.size} docs, extracted {len(docs)}")
+
+            results[f"process_and_store_embeddings[{database.size}]"] = measure(
+                lambda: process_and_store_embeddings(database.database_id, [doc.copy(deep=True) for doc in docs]),
+                args.repeat,
+                database.npc_count,
+            )
+
+        questions = [f"Who is NPC {i}?" for i in range(args.questions)]
+        samples = []
+        start = time.perf_counter()
+        for question in questions:
+            t0 = time.perf_counter()
+            answer.answer_question(question, [database.database_id for database in databases])
+            samples.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - start
+        results["answer_question"] = {
+            "runs": len(samples),
+            "items_per_run": 1,
+            "throughput_per_s": len(samples) / elapsed if elapsed else 0.0,
+            "mean_s": elapsed / len(samples) if samples else 0.0,
+            "p50_s": percentile(samples, 50),
+            "p95_s": percentile(samples, 95),
+            "p99_s": percentile(samples, 99),
+        }
+        results["_requests"] = {"ollama": sum(server.request_count for server in ollama_servers),
+                                "notion": notion_server.request_count}
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "parameters": {
+            "sizes": args.sizes,
+            "repeat": args.repeat,
+            "questions": args.questions,
+            "ollama_latency": args.ollama_latency,
+            "ollama_instances": args.ollama_instances,
+            "ollama_parallel": args.ollama_parallel,
+            "notion_latency": args.notion_latency,
+            "dimensions": args.dimensions,
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict) -> List[str]:
+    """Lines describing p50 and throughput changes relative to a previous run."""
+    lines = [f"Comparing {current['commit']} against {baseline.get('commit', 'baseline')}"]
+    for name, result in current["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if name.startswith("_") or not previous:
+            continue
+        p50_change = (result["p50_s"] / previous["p50_s"] - 1) * 100 if previous["p50_s"] else 0.0
+        tput_change = (result["throughput_per_s"] / previous["throughput_per_s"] - 1) * 100 if previous["throughput_per_s"] else 0.0
+        lines.append(f"{name:45s} p50 {result['p50_s'] * 1000:9.2f} ms ({p50_change:+6.1f}%)  "
+                     f"throughput {result['throughput_per_s']:9.2f}/s ({tput_change:+6.1f}%)")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Synthetic database sizes in pages")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per extract/ingest measurement")
+    parser.add_argument("--questions", type=int, default=50, help="Questions for the answer_question measurement")
+    parser.add_argument("--ollama-latency", type=float, default=0.0, help="Seconds of latency per fake Ollama request")
+    parser.add_argument("--ollama-instances", type=int, default=1, help="Fake Ollama instances to balance over")
+    parser.add_argument("--ollama-parallel", type=int, help="Concurrent requests each fake Ollama instance serves (default: no limit)")
+    parser.add_argument("--notion-latency", type=float, default=0.0, help="Seconds of latency per fake Notion request")
+    parser.add_argument("--dimensions", type=int, default=384, help="Dimensions of the fake embeddings")
+    parser.add_argument("--output", type=Path, help="JSON result path (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="Previous JSON result to compare against")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    report = run(args)
+
+    output = args.output or RESULTS_DIR / f"{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {output}")
+
+    for name, result in report["results"].items():
+        if not name.startswith("_"):
+            print(f"{name:45s} p50 {result['p50_s'] * 1000:9.2f} ms  p95 {result['p95_s'] * 1000:9.2f} ms  "
+                  f"p99 {result['p99_s'] * 1000:9.2f} ms  {result['throughput_per_s']:9.2f}/s")
+
+    if args.compare:
+        for line in compare(report, json.loads(args.compare.read_text())):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import os
 from dotenv import load_dotenv
 from pathlib import Path
 from discord.bot import bot
+from src.telemetry.logging_setup import configure_logging
 
 def main():
     # Get the project root directory
@@ -11,6 +12,8 @@ def main():
     config_path = project_root / "config" / ".env"
     load_dotenv(dotenv_path=config_path)
 
+    configure_logging()
+
     # Run the bot
     bot_token = os.getenv('DISCORD_NOTEKEEPER_KEY')
     if bot_token is None:
@@ -0,0 +1,121 @@
+"""Cooperative cancellation for syncs and /ask.
+
+Long-running loops take a CancellationToken and call `check()` between units of work
+(Notion pages, embedding batches, streamed tokens); `/cancel` sets the token and the
+loop stops at its next check, after finishing the unit in hand so Chroma and the job
+checkpoints stay consistent.
+"""
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+
+class OperationCancelled(BaseException):
+    """Raised at a cancellation check.
+
+    A BaseException, like asyncio.CancelledError, so the `except Exception` handlers that
+    turn failures into partial results do not swallow it.
+    """
+
+
+class CancellationToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def check(self):
+        if self._event.is_set():
+            raise OperationCancelled()
+
+    def wait(self, seconds: float) -> bool:
+        """Sleep up to `seconds`, waking early on cancellation; returns whether it was cancelled."""
+        return self._event.wait(seconds)
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """Call `callback` when the token is cancelled, or now if it already is."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+
+def check(token: Optional[CancellationToken]):
+    """token.check() for the many call sites where cancellation is optional."""
+    if token is not None:
+        token.check()
+
+
+@dataclass
+class Operation:
+    operation_id: str
+    kind: str
+    description: str
+    guild_id: Optional[int] = None
+    # Display name for /jobs; ownership goes by user_id, since names are neither unique nor fixed
+    user: Optional[str] = None
+    user_id: Optional[int] = None
+    started_at: float = field(default_factory=time.time)
+    token: CancellationToken = field(default_factory=CancellationToken, repr=False)
+
+    def cancellable_by(self, user_id: int, manage_guild: bool = False) -> bool:
+        """Only the member who started it, or one who may manage the server, may cancel it."""
+        return manage_guild or (self.user_id is not None and self.user_id == user_id)
+
+
+class OperationRegistry:
+    """The syncs and questions in progress, so /jobs can list them and /cancel can stop them."""
+
+    def __init__(self):
+        self._operations: Dict[str, Operation] = {}
+        self._lock = threading.Lock()
+
+    def start(self, kind: str, description: str, guild_id: int = None, user: str = None,
+              operation_id: str = None, user_id: int = None) -> Operation:
+        """Register an operation; `operation_id` lets a thin client and the service share one."""
+        with self._lock:
+            # Short enough to type into /cancel
+            operation_id = operation_id or f"{kind}-{uuid.uuid4().hex[:6]}"
+            operation = Operation(operation_id, kind, description, guild_id, user, user_id)
+            self._operations[operation_id] = operation
+            return operation
+
+    def finish(self, operation: Operation):
+        with self._lock:
+            if self._operations.get(operation.operation_id) is operation:
+                del self._operations[operation.operation_id]
+
+    def cancel(self, operation_id: str) -> bool:
+        with self._lock:
+            operation = self._operations.get(operation_id)
+        if operation is None:
+            return False
+        operation.token.cancel()
+        return True
+
+    def list(self, guild_id: int = None) -> List[Operation]:
+        with self._lock:
+            running = list(self._operations.values())
+        return sorted(
+            (operation for operation in running if guild_id is None or operation.guild_id == guild_id),
+            key=lambda operation: operation.started_at,
+        )
+
+
+operations = OperationRegistry()
@@ -0,0 +1,27 @@
+import importlib
+
+# registry pulls in ollama, notion_client and langchain, so it is loaded on first access;
+# rate_limit stays importable on its own for the bot's per-guild limiters
+_LAZY_EXPORTS = {
+    "get_ollama_client": ".registry",
+    "get_notion_client": ".registry",
+    "get_embeddings": ".registry",
+    "get_llm": ".registry",
+    "get_latency_metrics": ".registry",
+    "close_clients": ".registry",
+}
+
+__all__ = [
+    "get_ollama_client",
+    "get_notion_client",
+    "get_embeddings",
+    "get_llm",
+    "get_latency_metrics",
+    "close_clients"
+]
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        module = importlib.import_module(_LAZY_EXPORTS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
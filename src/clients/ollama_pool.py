@@ -0,0 +1,249 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Set
+
+import httpx
+import ollama
+
+from src import config
+from src.telemetry.metrics import ollama_endpoint_latency
+
+logger = logging.getLogger(__name__)
+
+# Completions older than this no longer count toward an instance's requests/sec
+THROUGHPUT_WINDOW = 60.0
+
+
+class OllamaEndpoint:
+    """One Ollama instance with its own pooled client and load counters."""
+
+    def __init__(self, host: str, client: ollama.Client, clock: Callable[[], float] = time.monotonic):
+        self.host = host
+        self.client = client
+        self.clock = clock
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        # Until this clock time the instance is skipped; 0 while it is up
+        self.down_until = 0.0
+        self.started_at = clock()
+        self._completed: Deque[float] = deque()
+
+    def available(self) -> bool:
+        return self.down_until <= self.clock()
+
+    def requests_per_second(self) -> float:
+        now = self.clock()
+        while self._completed and self._completed[0] < now - THROUGHPUT_WINDOW:
+            self._completed.popleft()
+        elapsed = min(THROUGHPUT_WINDOW, now - self.started_at)
+        return len(self._completed) / elapsed if elapsed > 0 else 0.0
+
+
+def _unreachable(error: Exception) -> bool:
+    """The instance did not answer: refused, timed out or dropped the connection."""
+    return isinstance(error, httpx.TransportError)
+
+
+def _busy(error: Exception) -> bool:
+    # Ollama answers 503 when its request queue is full; another instance may have room
+    return isinstance(error, ollama.ResponseError) and error.status_code == 503
+
+
+class OllamaPool:
+    """Spreads Ollama calls over several instances, least outstanding requests first.
+
+    Duck-types the ollama.Client methods the pipeline uses. An instance that does not
+    answer is skipped for `retry_after` seconds and the call is retried on the next one, so
+    a dead instance costs one failed request rather than one per call; a background probe
+    brings it back once it answers again. An embedding ingest keeping one instance busy
+    shows up as outstanding requests there, so /ask goes to another instance.
+    """
+
+    def __init__(self, endpoints: Sequence[OllamaEndpoint], retry_after: float = None,
+                 health_interval: float = None):
+        self.endpoints = list(endpoints)
+        self.retry_after = config.OLLAMA_RETRY_AFTER if retry_after is None else retry_after
+        self._lock = threading.Lock()
+        self._next = 0
+        self._closed = threading.Event()
+        self._prober = None
+        health_interval = config.OLLAMA_HEALTH_INTERVAL if health_interval is None else health_interval
+        if len(self.endpoints) > 1 and health_interval > 0:
+            self._prober = threading.Thread(target=self._probe_loop, args=(health_interval,),
+                                            name="ollama-health", daemon=True)
+            self._prober.start()
+
+    def _acquire(self, tried: Set[str]) -> Optional[OllamaEndpoint]:
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.host not in tried]
+            if not candidates:
+                return None
+            up = [e for e in candidates if e.available()]
+            if up:
+                # Rotating the start makes ties go round-robin instead of always to the first instance
+                start = self._next % len(self.endpoints)
+                self._next += 1
+                order = {e.host: (i - start) % len(self.endpoints) for i, e in enumerate(self.endpoints)}
+                endpoint = min(up, key=lambda e: (e.outstanding, order[e.host]))
+            else:
+                # Every instance is marked down; try the one that has been down longest rather than fail
+                endpoint = min(candidates, key=lambda e: e.down_until)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _release(self, endpoint: OllamaEndpoint, start: float, error: Optional[Exception] = None):
+        seconds = time.perf_counter() - start
+        with self._lock:
+            endpoint.outstanding -= 1
+            if error is None:
+                endpoint.down_until = 0.0
+                endpoint._completed.append(endpoint.clock())
+            else:
+                endpoint.failures += 1
+                if _unreachable(error):
+                    endpoint.down_until = endpoint.clock() + self.retry_after
+        ollama_endpoint_latency.record(endpoint.host, seconds, error=error is not None)
+
+    def _failover(self, endpoint: OllamaEndpoint, error: Exception, tried: Set[str]) -> bool:
+        """Whether to retry the call on another instance after `error`."""
+        if not (_unreachable(error) or _busy(error)):
+            return False
+        tried.add(endpoint.host)
+        logger.warning(f"Ollama at {endpoint.host} failed ({type(error).__name__}: {error}); trying another instance")
+        return len(tried) < len(self.endpoints)
+
+    def _call(self, method: str, *args, **kwargs) -> Any:
+        tried: Set[str] = set()
+        while True:
+            endpoint = self._acquire(tried)
+            start = time.perf_counter()
+            try:
+                result = getattr(endpoint.client, method)(*args, **kwargs)
+            except Exception as e:
+                self._release(endpoint, start, e)
+                if self._failover(endpoint, e, tried):
+                    continue
+                raise
+            self._release(endpoint, start)
+            return result
+
+    def _stream(self, method: str, *args, **kwargs) -> Iterator[Dict[str, Any]]:
+        """A streamed call holds its instance until the stream ends or is closed.
+
+        Failover only happens before the first chunk; after that the partial output is
+        the caller's.
+        """
+        tried: Set[str] = set()
+        while True:
+            endpoint = self._acquire(tried)
+            start = time.perf_counter()
+            stream = None
+            try:
+                stream = getattr(endpoint.client, method)(*args, **kwargs)
+                first = next(stream, None)
+            except Exception as e:
+                if stream is not None:
+                    stream.close()
+                self._release(endpoint, start, e)
+                if self._failover(endpoint, e, tried):
+                    continue
+                raise
+            break
+        error = None
+        try:
+            if first is not None:
+                yield first
+            yield from stream
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            stream.close()
+            self._release(endpoint, start, error)
+
+    def embeddings(self, *args, **kwargs) -> Dict[str, Any]:
+        return self._call("embeddings", *args, **kwargs)
+
+    def embed(self, *args, **kwargs) -> Dict[str, Any]:
+        return self._call("embed", *args, **kwargs)
+
+    def generate(self, *args, stream: bool = False, **kwargs):
+        if stream:
+            return self._stream("generate", *args, stream=True, **kwargs)
+        return self._call("generate", *args, **kwargs)
+
+    def chat(self, *args, stream: bool = False, **kwargs):
+        if stream:
+            return self._stream("chat", *args, stream=True, **kwargs)
+        return self._call("chat", *args, **kwargs)
+
+    def ps(self) -> Dict[str, Any]:
+        """Models loaded on any reachable instance."""
+        models, seen = [], set()
+        for endpoint in self.endpoints:
+            try:
+                loaded = endpoint.client.ps().get("models", [])
+            except Exception as e:
+                logger.error(f"Failed to list loaded models on {endpoint.host}: {e}")
+                continue
+            for model in loaded:
+                if model["name"] not in seen:
+                    seen.add(model["name"])
+                    models.append(model)
+        return {"models": models}
+
+    def __getattr__(self, name: str):
+        # Calls without special handling (list, show, ...) go to the least busy instance
+        if hasattr(ollama.Client, name):
+            return lambda *args, **kwargs: self._call(name, *args, **kwargs)
+        raise AttributeError(name)
+
+    def probe(self):
+        """Check every instance with a cheap /api/ps and mark it up or down."""
+        for endpoint in self.endpoints:
+            try:
+                endpoint.client.ps()
+            except Exception as e:
+                with self._lock:
+                    if endpoint.available():
+                        logger.warning(f"Ollama at {endpoint.host} is not responding: {e}")
+                    endpoint.down_until = endpoint.clock() + self.retry_after
+                continue
+            with self._lock:
+                if not endpoint.available():
+                    logger.info(f"Ollama at {endpoint.host} is responding again")
+                endpoint.down_until = 0.0
+
+    def _probe_loop(self, interval: float):
+        while not self._closed.wait(interval):
+            self.probe()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            endpoints = [
+                {"host": e.host, "up": e.available(), "outstanding": e.outstanding, "requests": e.requests,
+                 "failures": e.failures, "requests_per_second": e.requests_per_second()}
+                for e in self.endpoints
+            ]
+        for endpoint in endpoints:
+            summary = ollama_endpoint_latency.summary(endpoint["host"])
+            endpoint["p50"], endpoint["p95"] = summary["p50"], summary["p95"]
+        return endpoints
+
+    def format(self) -> str:
+        lines = [f"{'ollama instance':32s} {'up':>3s} {'busy':>5s} {'requests':>9s} {'failed':>7s} "
+                 f"{'req/s':>6s} {'p50 ms':>8s} {'p95 ms':>8s}"]
+        for e in self.stats():
+            lines.append(f"{e['host'][:32]:32s} {'yes' if e['up'] else 'no':>3s} {e['outstanding']:5d} "
+                         f"{e['requests']:9d} {e['failures']:7d} {e['requests_per_second']:6.1f} "
+                         f"{e['p50'] * 1000:8.1f} {e['p95'] * 1000:8.1f}")
+        return "\n".join(lines)
+
+    def close(self):
+        self._closed.set()
+        for endpoint in self.endpoints:
+            endpoint.client._client.close()
@@ -0,0 +1,74 @@
+import threading
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second on average, bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Block until a token is available; returns the seconds spent waiting."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    self.waited += waited
+                    return waited
+                delay = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def try_acquire(self) -> bool:
+        """Take a token if one is available right now, without waiting."""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self._paused_until and self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def pause(self, seconds: float):
+        """Hold every caller back, e.g. after the server answered 429 with Retry-After."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+def rate_limit_hooks(bucket: TokenBucket) -> Dict[str, List[Any]]:
+    """httpx event hooks that take a token per request and back off on 429 responses."""
+    def on_request(request: httpx.Request):
+        bucket.acquire()
+
+    def on_response(response: httpx.Response):
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After")
+            try:
+                seconds = float(retry_after)
+            except (TypeError, ValueError):
+                seconds = 1.0
+            bucket.pause(seconds)
+
+    return {"request": [on_request], "response": [on_response]}
@@ -0,0 +1,166 @@
+import importlib.util
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+import ollama
+from notion_client import Client as NotionClient
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+
+from src import config
+from src.clients.ollama_pool import OllamaEndpoint, OllamaPool
+from src.clients.rate_limit import TokenBucket, rate_limit_hooks
+from src.telemetry.metrics import http_latency
+
+# Notion object ids in URL paths are collapsed so metrics group by endpoint, not by page
+_ID_SEGMENT = re.compile(r"/[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}")
+
+_lock = threading.Lock()
+_ollama_client: Optional[OllamaPool] = None
+_notion_client: Optional[NotionClient] = None
+_embeddings: Dict[str, "PooledOllamaEmbeddings"] = {}
+_llms: Dict[str, "PooledOllamaLLM"] = {}
+# One limiter for every Notion call in the process, however many databases sync at once
+notion_rate_limiter: Optional[TokenBucket] = None
+
+
+def http2_available() -> bool:
+    return config.HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+
+
+def endpoint_name(service: str, request: httpx.Request) -> str:
+    path = _ID_SEGMENT.sub("/:id", request.url.path)
+    return f"{service} {request.method} {path}"
+
+
+def _latency_hooks(service: str) -> Dict[str, List[Any]]:
+    def on_request(request: httpx.Request):
+        request.extensions["notekeeper_start"] = time.perf_counter()
+
+    def on_response(response: httpx.Response):
+        start = response.request.extensions.get("notekeeper_start")
+        if start is not None:
+            http_latency.record(
+                endpoint_name(service, response.request),
+                time.perf_counter() - start,
+                error=response.status_code >= 400,
+            )
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def _limits(pool_size: int, keepalive_connections: int) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=keepalive_connections,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_ollama_client() -> OllamaPool:
+    """Shared Ollama client over every configured instance, each with a pooled keep-alive httpx session."""
+    global _ollama_client
+    with _lock:
+        if _ollama_client is None:
+            endpoints = [
+                OllamaEndpoint(host, ollama.Client(
+                    host=host,
+                    timeout=httpx.Timeout(config.OLLAMA_READ_TIMEOUT, connect=config.OLLAMA_CONNECT_TIMEOUT),
+                    limits=_limits(config.OLLAMA_POOL_SIZE, config.OLLAMA_KEEPALIVE_CONNECTIONS),
+                    http2=http2_available(),
+                    event_hooks=_latency_hooks("ollama"),
+                ))
+                for host in config.OLLAMA_HOSTS or [config.OLLAMA_HOST]
+            ]
+            _ollama_client = OllamaPool(endpoints)
+        return _ollama_client
+
+
+def get_notion_client() -> NotionClient:
+    """Shared Notion client backed by a pooled keep-alive httpx session."""
+    global _notion_client, notion_rate_limiter
+    with _lock:
+        if _notion_client is None:
+            if not config.NOTION_API_KEY:
+                raise ValueError("NOTION_API_KEY not found in environment variables")
+            notion_rate_limiter = TokenBucket(config.NOTION_RATE_LIMIT, config.NOTION_RATE_BURST)
+            # The limiter runs before the latency hook so waiting for a token is not counted as latency
+            limiter, latency = rate_limit_hooks(notion_rate_limiter), _latency_hooks("notion")
+            session = httpx.Client(
+                limits=_limits(config.NOTION_POOL_SIZE, config.NOTION_KEEPALIVE_CONNECTIONS),
+                http2=http2_available(),
+                event_hooks={event: limiter[event] + latency[event] for event in ("request", "response")},
+            )
+            _notion_client = NotionClient(
+                client=session,
+                auth=config.NOTION_API_KEY,
+                base_url=config.NOTION_BASE_URL,
+                timeout_ms=int(config.NOTION_TIMEOUT * 1000),
+            )
+        return _notion_client
+
+
+class PooledOllamaEmbeddings(Embeddings):
+    """LangChain embeddings that go through the shared Ollama client."""
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        response = get_ollama_client().embeddings(model=self.model, prompt=text)
+        return response["embedding"]
+
+
+class PooledOllamaLLM(LLM):
+    """LangChain LLM that goes through the shared Ollama client."""
+
+    model: str
+
+    @property
+    def _llm_type(self) -> str:
+        return "pooled-ollama"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        options = {"stop": stop} if stop else None
+        response = get_ollama_client().generate(model=self.model, prompt=prompt, options=options)
+        return response["response"]
+
+
+def get_embeddings(model: str = None) -> PooledOllamaEmbeddings:
+    model = model or config.EMBEDDING_MODEL
+    with _lock:
+        if model not in _embeddings:
+            _embeddings[model] = PooledOllamaEmbeddings(model)
+        return _embeddings[model]
+
+
+def get_llm(model: str = None) -> PooledOllamaLLM:
+    model = model or config.GENERATION_MODEL
+    with _lock:
+        if model not in _llms:
+            _llms[model] = PooledOllamaLLM(model=model)
+        return _llms[model]
+
+
+def get_latency_metrics() -> Dict[str, Dict[str, float]]:
+    return http_latency.snapshot()
+
+
+def close_clients():
+    """Close pooled sessions; the next get_* call opens fresh ones."""
+    global _ollama_client, _notion_client
+    with _lock:
+        if _ollama_client is not None:
+            _ollama_client.close()
+            _ollama_client = None
+        if _notion_client is not None:
+            _notion_client.client.close()
+            _notion_client = None
+        _embeddings.clear()
+        _llms.clear()
@@ -0,0 +1,195 @@
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+project_root = Path(__file__).parents[1]
+
+# Load environment variables
+config_path = project_root / "config" / ".env"
+load_dotenv(dotenv_path=config_path)
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Storage
+CHROMA_PERSIST_DIRECTORY = Path(os.getenv("CHROMA_PERSIST_DIRECTORY", str(project_root / "chroma_db")))
+
+# Models
+EMBEDDING_MODEL = os.getenv("NOTEKEEPER_EMBEDDING_MODEL", "mistral-nemo")
+GENERATION_MODEL = os.getenv("NOTEKEEPER_GENERATION_MODEL", "mistral-nemo")
+
+# Ollama HTTP client
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
+OLLAMA_POOL_SIZE = _env_int("OLLAMA_POOL_SIZE", 8)
+OLLAMA_KEEPALIVE_CONNECTIONS = _env_int("OLLAMA_KEEPALIVE_CONNECTIONS", 8)
+OLLAMA_CONNECT_TIMEOUT = _env_float("OLLAMA_CONNECT_TIMEOUT", 5.0)
+OLLAMA_READ_TIMEOUT = _env_float("OLLAMA_READ_TIMEOUT", 300.0)
+# Several Ollama instances (e.g. one per GPU), comma-separated; when set it replaces OLLAMA_HOST and
+# each request goes to the instance with the fewest requests in flight
+OLLAMA_HOSTS = [host.strip() for host in os.getenv("OLLAMA_HOSTS", "").split(",") if host.strip()]
+# Embedding requests ingest keeps in flight per instance
+OLLAMA_EMBED_CONCURRENCY = _env_int("OLLAMA_EMBED_CONCURRENCY", 1)
+# Seconds an instance that stopped responding is skipped, and between health probes of every instance
+OLLAMA_RETRY_AFTER = _env_float("OLLAMA_RETRY_AFTER", 15.0)
+OLLAMA_HEALTH_INTERVAL = _env_float("OLLAMA_HEALTH_INTERVAL", 10.0)
+
+# Notion HTTP client
+NOTION_API_KEY = os.getenv("NOTION_API_KEY")
+NOTION_BASE_URL = os.getenv("NOTION_BASE_URL", "https://api.notion.com")
+NOTION_POOL_SIZE = _env_int("NOTION_POOL_SIZE", 10)
+NOTION_KEEPALIVE_CONNECTIONS = _env_int("NOTION_KEEPALIVE_CONNECTIONS", 10)
+NOTION_TIMEOUT = _env_float("NOTION_TIMEOUT", 30.0)
+# Notion allows an average of three requests per second per integration; 0 disables the limiter
+NOTION_RATE_LIMIT = _env_float("NOTION_RATE_LIMIT", 3.0)
+NOTION_RATE_BURST = _env_int("NOTION_RATE_BURST", 3)
+
+# Shared HTTP settings
+HTTP_KEEPALIVE_EXPIRY = _env_float("HTTP_KEEPALIVE_EXPIRY", 60.0)
+HTTP2_ENABLED = _env_bool("HTTP2_ENABLED", True)
+
+# Tracing: "none", "file" (JSON lines at TRACE_FILE) or "otlp" (OTEL_EXPORTER_OTLP_ENDPOINT)
+TRACE_EXPORTER = os.getenv("NOTEKEEPER_TRACE_EXPORTER", "none").lower()
+TRACE_FILE = Path(os.getenv("NOTEKEEPER_TRACE_FILE", str(project_root / "logs" / "traces.jsonl")))
+
+# Logging
+LOG_LEVEL = os.getenv("NOTEKEEPER_LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("NOTEKEEPER_LOG_FILE")
+# Page content, prompts and answers are redacted from logs unless this is set
+LOG_CONTENT = _env_bool("NOTEKEEPER_LOG_CONTENT", False)
+# Per-item debug lines are emitted for the first and then every Nth item of a kind
+LOG_SAMPLE_EVERY = _env_int("NOTEKEEPER_LOG_SAMPLE_EVERY", 100)
+LOG_PROGRESS_INTERVAL = _env_float("NOTEKEEPER_LOG_PROGRESS_INTERVAL", 5.0)
+
+# Model residency: how long Ollama keeps each model loaded after a request
+EMBEDDING_KEEP_ALIVE = os.getenv("NOTEKEEPER_EMBEDDING_KEEP_ALIVE", "30m")
+GENERATION_KEEP_ALIVE = os.getenv("NOTEKEEPER_GENERATION_KEEP_ALIVE", "30m")
+# Comma-separated local-time ranges, e.g. "18:00-23:30,13:00-17:00"; empty means always
+PLAY_HOURS = os.getenv("NOTEKEEPER_PLAY_HOURS", "")
+# Keep-alive sent outside play hours, so idle models unload (Ollama's own default)
+OFF_HOURS_KEEP_ALIVE = os.getenv("NOTEKEEPER_OFF_HOURS_KEEP_ALIVE", "5m")
+# Seconds between keep-warm pings during play hours
+RESIDENCY_PING_INTERVAL = _env_float("NOTEKEEPER_RESIDENCY_PING_INTERVAL", 240.0)
+
+# Per-NPC summaries generated at ingest time
+NPC_SUMMARIES_ENABLED = _env_bool("NOTEKEEPER_NPC_SUMMARIES", True)
+# Concurrent summary generations per Ollama instance
+SUMMARY_WORKERS = _env_int("NOTEKEEPER_SUMMARY_WORKERS", 2)
+# Notes are summarized in batches of at most this many characters before being combined
+SUMMARY_MAP_CHARS = _env_int("NOTEKEEPER_SUMMARY_MAP_CHARS", 6000)
+
+# Query embedding cache (entries)
+QUERY_EMBEDDING_CACHE_SIZE = _env_int("NOTEKEEPER_QUERY_EMBEDDING_CACHE_SIZE", 1024)
+
+# Retrieval; tune with python -m src.ollama_utils.sweep
+RETRIEVAL_SEARCH_TYPE = os.getenv("NOTEKEEPER_RETRIEVAL_SEARCH_TYPE", "mmr")  # "mmr" or "similarity"
+RETRIEVAL_K = _env_int("NOTEKEEPER_RETRIEVAL_K", 4)
+RETRIEVAL_FETCH_K = _env_int("NOTEKEEPER_RETRIEVAL_FETCH_K", 40)
+RETRIEVAL_LAMBDA = _env_float("NOTEKEEPER_RETRIEVAL_LAMBDA", 0.5)
+# HNSW search_ef for newly created collections (0 keeps Chroma's default); fixed once a collection exists
+CHROMA_SEARCH_EF = _env_int("NOTEKEEPER_CHROMA_SEARCH_EF", 0)
+
+# Notion sync; NOTION_DATABASE_IDS (comma separated) skips discovery through the search API
+NOTION_DATABASE_IDS = [i.strip() for i in os.getenv("NOTION_DATABASE_IDS", "").split(",") if i.strip()]
+NOTION_SYNC_WORKERS = _env_int("NOTION_SYNC_WORKERS", 4)
+
+# Checkpointed ingest jobs
+INGEST_JOB_DB = Path(os.getenv("NOTEKEEPER_INGEST_JOB_DB", str(project_root / "cache" / "ingest_jobs.sqlite3")))
+INGEST_BATCH_SIZE = _env_int("NOTEKEEPER_INGEST_BATCH_SIZE", 32)
+INGEST_MAX_ATTEMPTS = _env_int("NOTEKEEPER_INGEST_MAX_ATTEMPTS", 3)
+INGEST_RETRY_BACKOFF = _env_float("NOTEKEEPER_INGEST_RETRY_BACKOFF", 1.0)
+
+# Near-duplicate chunk removal at ingest: MinHash candidates, confirmed by embedding cosine
+DEDUP_ENABLED = _env_bool("NOTEKEEPER_DEDUP", True)
+DEDUP_JACCARD = _env_float("NOTEKEEPER_DEDUP_JACCARD", 0.8)
+DEDUP_COSINE = _env_float("NOTEKEEPER_DEDUP_COSINE", 0.95)
+DEDUP_NUM_PERM = _env_int("NOTEKEEPER_DEDUP_NUM_PERM", 64)
+DEDUP_BANDS = _env_int("NOTEKEEPER_DEDUP_BANDS", 16)
+
+# Collections whose float32 embeddings (vectors x dimensions x 4 bytes) fit in this many MB are searched
+# exactly with numpy instead of HNSW, about 3,300 vectors at mistral-nemo's 5120 dimensions (0 disables)
+EXACT_SEARCH_MAX_MB = _env_float("NOTEKEEPER_EXACT_SEARCH_MAX_MB", 64.0)
+VECTOR_INDEX_DIRECTORY = Path(os.getenv("NOTEKEEPER_VECTOR_INDEX_DIRECTORY", str(project_root / "cache" / "vector_index")))
+
+# Page titles and NPC names offered as /ask autocomplete, saved after each sync
+AUTOCOMPLETE_INDEX_FILE = Path(os.getenv("NOTEKEEPER_AUTOCOMPLETE_INDEX_FILE", str(project_root / "cache" / "autocomplete.json")))
+
+# /ask latency ceiling in seconds (0 disables); each stage is also capped by its own timeout
+ASK_DEADLINE = _env_float("NOTEKEEPER_ASK_DEADLINE", 20.0)
+ASK_EMBED_TIMEOUT = _env_float("NOTEKEEPER_ASK_EMBED_TIMEOUT", 3.0)
+ASK_SEARCH_TIMEOUT = _env_float("NOTEKEEPER_ASK_SEARCH_TIMEOUT", 3.0)
+ASK_STAGE_WORKERS = _env_int("NOTEKEEPER_ASK_STAGE_WORKERS", 8)
+# Shorter streamed text than this is dropped in favour of the retrieval-only answer
+ASK_MIN_PARTIAL_CHARS = _env_int("NOTEKEEPER_ASK_MIN_PARTIAL_CHARS", 80)
+
+# Local retrieval service (python -m src.service.app). With a URL set, the bot and CLIs
+# are thin clients of it: http://127.0.0.1:8765 or unix:///path/to/notekeeper.sock
+SERVICE_URL = os.getenv("NOTEKEEPER_SERVICE_URL", "")
+SERVICE_HOST = os.getenv("NOTEKEEPER_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = _env_int("NOTEKEEPER_SERVICE_PORT", 8765)
+SERVICE_SOCKET = os.getenv("NOTEKEEPER_SERVICE_SOCKET", "")
+SERVICE_TIMEOUT = _env_float("NOTEKEEPER_SERVICE_TIMEOUT", 30.0)
+SERVICE_BATCH_WORKERS = _env_int("NOTEKEEPER_SERVICE_BATCH_WORKERS", 4)
+
+# Discord guild -> Notion databases mapping (see src/discord/guilds.py) and default per-guild /ask limits
+GUILDS_FILE = Path(os.getenv("NOTEKEEPER_GUILDS_FILE", str(project_root / "config" / "guilds.json")))
+GUILD_ASK_RATE = _env_float("NOTEKEEPER_GUILD_ASK_RATE", 0.5)
+GUILD_ASK_BURST = _env_int("NOTEKEEPER_GUILD_ASK_BURST", 5)
+
+# One-hop expansion of the selected chunks over the Notion relation graph built at ingest
+RELATION_GRAPH_DIRECTORY = Path(os.getenv("NOTEKEEPER_RELATION_GRAPH_DIRECTORY", str(project_root / "cache" / "relation_graph")))
+RELATION_EXPANSION = _env_bool("NOTEKEEPER_RELATION_EXPANSION", True)
+# Related chunks added after the selected ones, best vector score first
+RELATION_EXPANSION_K = _env_int("NOTEKEEPER_RELATION_EXPANSION_K", 2)
+
+# Per-channel conversations: follow-up /asks reuse Ollama's context and only send newly retrieved chunks
+SESSIONS_ENABLED = _env_bool("NOTEKEEPER_SESSIONS", True)
+# Seconds a conversation survives without a question
+SESSION_TTL = _env_float("NOTEKEEPER_SESSION_TTL", 900.0)
+SESSION_MAX_MB = _env_float("NOTEKEEPER_SESSION_MAX_MB", 64.0)
+# Match the generation model's num_ctx; a longer conversation starts over with a full prompt
+SESSION_MAX_CONTEXT_TOKENS = _env_int("NOTEKEEPER_SESSION_MAX_CONTEXT_TOKENS", 2048)
+
+# Optional re-ranking of the retrieved chunks before the prompt: "onnx" (a cross-encoder run with
+# onnxruntime), "ollama" (a small model asked for a relevance digit) or empty to skip it
+RERANKER = os.getenv("NOTEKEEPER_RERANKER", "").lower()
+RERANK_ONNX_MODEL_DIR = Path(os.getenv("NOTEKEEPER_RERANK_ONNX_MODEL_DIR", str(project_root / "models" / "ms-marco-MiniLM-L-6-v2")))
+RERANK_OLLAMA_MODEL = os.getenv("NOTEKEEPER_RERANK_OLLAMA_MODEL", "qwen2:0.5b")
+# MMR picks this many chunks per collection for the reranker, which keeps the best RERANK_TOP_N overall
+RERANK_CANDIDATES = _env_int("NOTEKEEPER_RERANK_CANDIDATES", 8)
+RERANK_TOP_N = _env_int("NOTEKEEPER_RERANK_TOP_N", 3)
+RERANK_BATCH_SIZE = _env_int("NOTEKEEPER_RERANK_BATCH_SIZE", 16)
+RERANK_CACHE_SIZE = _env_int("NOTEKEEPER_RERANK_CACHE_SIZE", 8192)
+ASK_RERANK_TIMEOUT = _env_float("NOTEKEEPER_ASK_RERANK_TIMEOUT", 3.0)
+
+# python -m src.database.database maintain rebuilds a collection when this share of its HNSW
+# slots are deleted vectors, or its write log holds this many entries per vector
+MAINTENANCE_TOMBSTONE_RATIO = _env_float("NOTEKEEPER_MAINTENANCE_TOMBSTONE_RATIO", 0.2)
+MAINTENANCE_LOG_RATIO = _env_float("NOTEKEEPER_MAINTENANCE_LOG_RATIO", 2.0)
+MAINTENANCE_PAGE_SIZE = _env_int("NOTEKEEPER_MAINTENANCE_PAGE_SIZE", 1000)
+# Seconds a rebuilt collection's predecessor is kept for the queries already reading it
+MAINTENANCE_RETIRE_GRACE = _env_float("NOTEKEEPER_MAINTENANCE_RETIRE_GRACE", 2.0)
+
+# python -m src.telemetry.health and /health flag a backend call slower than these (milliseconds)
+HEALTH_EMBED_MS = _env_float("NOTEKEEPER_HEALTH_EMBED_MS", 500.0)
+HEALTH_GENERATE_MS = _env_float("NOTEKEEPER_HEALTH_GENERATE_MS", 3000.0)
+HEALTH_CHROMA_COUNT_MS = _env_float("NOTEKEEPER_HEALTH_CHROMA_COUNT_MS", 50.0)
+HEALTH_CHROMA_QUERY_MS = _env_float("NOTEKEEPER_HEALTH_CHROMA_QUERY_MS", 250.0)
+HEALTH_NOTION_MS = _env_float("NOTEKEEPER_HEALTH_NOTION_MS", 2000.0)
+# ...and a cache whose hit rate is below this once it has seen HEALTH_MIN_CACHE_LOOKUPS lookups
+HEALTH_MIN_CACHE_HIT_RATE = _env_float("NOTEKEEPER_HEALTH_MIN_CACHE_HIT_RATE", 0.2)
+HEALTH_MIN_CACHE_LOOKUPS = _env_int("NOTEKEEPER_HEALTH_MIN_CACHE_LOOKUPS", 20)
@@ -3,13 +3,21 @@ from .database import (
     get_or_create_chroma_collection,
     get_existing_ids_chroma,
     store_embeddings_chroma,
-    process_and_store_embeddings_chroma
+    process_and_store_embeddings_chroma,
+    database_stats,
+    maintain_database,
 )
+from .jobs import JobStore, IngestJob, get_job_store
 
 __all__ = [
     "get_chroma_client",
     "get_or_create_chroma_collection",
     "get_existing_ids_chroma",
     "store_embeddings_chroma",
-    "process_and_store_embeddings_chroma"
+    "process_and_store_embeddings_chroma",
+    "database_stats",
+    "maintain_database",
+    "JobStore",
+    "IngestJob",
+    "get_job_store"
 ]
\ No newline at end of file
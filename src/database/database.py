@@ -1,29 +1,66 @@
 from pathlib import Path
 import chromadb
 from chromadb.config import Settings
-from typing import List, Dict, Any
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional
+import argparse
+import logging
+import pickle
 import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+from src import config
 
 project_root = Path(__file__).parents[2]
 
+logger = logging.getLogger(__name__)
+
+CHROMA_SQLITE_FILE = "chroma.sqlite3"
+# Suffixes of the collections a rebuild copies into and retires; both stay within Chroma's 63 characters
+REBUILD_SUFFIX = "-rebuild"
+RETIRED_SUFFIX = "-retired"
+
+# Creating PersistentClients for one path from several threads at once races in Chroma
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
 def get_chroma_client():
-    persist_directory = str(project_root / "chroma_db")
-    return chromadb.PersistentClient(path=persist_directory)
+    persist_directory = str(config.CHROMA_PERSIST_DIRECTORY)
+    with _clients_lock:
+        if persist_directory not in _clients:
+            _clients[persist_directory] = chromadb.PersistentClient(path=persist_directory)
+        return _clients[persist_directory]
+
+def close_chroma_client():
+    """Stop the shared client so Chroma's SQLite connections close; the next get_chroma_client reopens it."""
+    from chromadb.api.client import SharedSystemClient
+
+    with _clients_lock:
+        client = _clients.pop(str(config.CHROMA_PERSIST_DIRECTORY), None)
+        if client is not None:
+            client._system.stop()
+            # Otherwise the next PersistentClient for this path is handed the stopped system
+            SharedSystemClient.clear_system_cache()
 
 def get_or_create_chroma_collection(collection_name: str):
     client = get_chroma_client()
-    return client.get_or_create_collection(name=collection_name)
+    # search_ef is read when the collection is created; changing it later has no effect
+    metadata = {"hnsw:search_ef": config.CHROMA_SEARCH_EF} if config.CHROMA_SEARCH_EF else None
+    return client.get_or_create_collection(name=collection_name, metadata=metadata)
 
 def get_existing_ids_chroma(collection_name: str):
     collection = get_or_create_chroma_collection(collection_name)
     return collection.get(include=['documents'])['ids']
 
-def store_embeddings_chroma(collection, documents: List[str], embeddings: List[List[float]], metadata: List[Dict[str, Any]]):
+def store_embeddings_chroma(collection, documents: List[str], embeddings: List[List[float]], metadata: List[Dict[str, Any]], ids: List[str] = None):
     collection.upsert(
         documents=documents,
         embeddings=embeddings,
         metadatas=metadata,
-        ids=[f"doc_{i}" for i in range(len(documents))]
+        ids=ids or [f"doc_{i}" for i in range(len(documents))]
     )
 
 def process_and_store_embeddings_chroma(database_id: str, documents: List[str], embeddings: List[List[float]], metadata: List[Dict[str, Any]]):
@@ -36,7 +73,9 @@ def process_and_store_embeddings_chroma(database_id: str, documents: List[str],
 
 
 def reset_database():
-    persist_directory = project_root / "chroma_db"
+    persist_directory = config.CHROMA_PERSIST_DIRECTORY
+    with _clients_lock:
+        _clients.pop(str(persist_directory), None)
     if persist_directory.exists():
         shutil.rmtree(persist_directory)
         print(f"Removed existing database at {persist_directory}")
@@ -45,6 +84,291 @@ def reset_database():
     chromadb.PersistentClient(path=str(persist_directory))
     print("Initialized new Chroma database")
 
-if __name__ == "__main__":
+@dataclass
+class CollectionStats:
+    name: str
+    vectors: int
+    # Rows of Chroma's write log kept for the collection; every upsert adds one per record
+    log_entries: int
+    # Deleted vectors still taking up slots in the HNSW index
+    tombstones: int
+    disk_bytes: int
+
+    def needs_rebuild(self) -> bool:
+        slots = self.vectors + self.tombstones
+        if slots and self.tombstones / slots >= config.MAINTENANCE_TOMBSTONE_RATIO:
+            return True
+        return self.log_entries > config.MAINTENANCE_LOG_RATIO * max(self.vectors, 1)
+
+
+@dataclass
+class DatabaseStats:
+    disk_bytes: int
+    sqlite_bytes: int
+    sqlite_free_bytes: int
+    # Segment directories, log rows and embedding rows whose collection or segment no longer exists
+    orphaned_segments: int
+    orphaned_log_entries: int
+    orphaned_embeddings: int
+    collections: List[CollectionStats] = field(default_factory=list)
+
+
+@dataclass
+class MaintenanceReport:
+    before: DatabaseStats
+    after: Optional[DatabaseStats] = None
+    rebuilt: List[str] = field(default_factory=list)
+    # Collections that were written to during their rebuild, which was abandoned
+    skipped: List[str] = field(default_factory=list)
+    duration: float = 0.0
+
+    def format(self) -> str:
+        after = self.after or self.before
+        lines = [f"{'':22s} {'before':>12s} {'after':>12s}"]
+        for label, attr in [("disk bytes", "disk_bytes"), ("sqlite bytes", "sqlite_bytes"),
+                            ("sqlite free bytes", "sqlite_free_bytes"), ("orphaned segments", "orphaned_segments"),
+                            ("orphaned log entries", "orphaned_log_entries"),
+                            ("orphaned embeddings", "orphaned_embeddings")]:
+            lines.append(f"{label:22s} {getattr(self.before, attr):12d} {getattr(after, attr):12d}")
+        after_collections = {stats.name: stats for stats in after.collections}
+        lines.append("")
+        lines.append(f"{'collection':48s} {'vectors':>8s} {'log was':>8s} {'log now':>8s} {'dead was':>8s} {'dead now':>8s}")
+        for stats in self.before.collections:
+            new = after_collections.get(stats.name, stats)
+            lines.append(f"{stats.name[:48]:48s} {new.vectors:8d} {stats.log_entries:8d} {new.log_entries:8d} "
+                         f"{stats.tombstones:8d} {new.tombstones:8d}")
+        lines.append(
+            f"Rebuilt {len(self.rebuilt)} collection(s)"
+            + (f", skipped {len(self.skipped)} written to meanwhile" if self.skipped else "")
+            + f" in {self.duration:.1f}s"
+        )
+        return "\n".join(lines)
+
+
+def _directory_bytes(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(child.stat().st_size for child in path.rglob("*") if child.is_file())
+
+
+def _connect_sqlite(path: Path) -> sqlite3.Connection:
+    # Chroma's own connections may hold the write lock briefly; wait for them rather than fail
+    return sqlite3.connect(str(path), timeout=60, isolation_level=None)
+
+
+def database_stats(client=None) -> DatabaseStats:
+    """On-disk size, per-collection vector/log/tombstone counts and orphans of the Chroma database."""
+    client = client or get_chroma_client()
+    persist_directory = Path(config.CHROMA_PERSIST_DIRECTORY)
+    sqlite_path = persist_directory / CHROMA_SQLITE_FILE
+    db = _connect_sqlite(sqlite_path)
+    try:
+        page_size = db.execute("PRAGMA page_size").fetchone()[0]
+        free_bytes = db.execute("PRAGMA freelist_count").fetchone()[0] * page_size
+        segments = {row[0]: (row[1], row[2]) for row in db.execute("SELECT id, scope, collection FROM segments")}
+        log_counts = dict(db.execute("SELECT topic, COUNT(*) FROM embeddings_queue GROUP BY topic"))
+        orphaned_embeddings = db.execute(
+            "SELECT COUNT(*) FROM embeddings WHERE segment_id NOT IN (SELECT id FROM segments)"
+        ).fetchone()[0]
+    finally:
+        db.close()
+
+    collections, topics = [], set()
+    for collection in client.list_collections():
+        # Chroma's single-node topic naming: persistent://<tenant>/<database>/<collection id>
+        topic = next((t for t in log_counts if t.endswith(f"/{collection.id}")), None)
+        topics.add(topic)
+        tombstones, disk_bytes = 0, 0
+        for segment_id, (scope, collection_id) in segments.items():
+            segment_directory = persist_directory / segment_id
+            if collection_id != str(collection.id) or scope != "VECTOR" or not segment_directory.exists():
+                continue
+            disk_bytes += _directory_bytes(segment_directory)
+            metadata_file = segment_directory / "index_metadata.pickle"
+            if metadata_file.exists():
+                # Written by Chroma at each sync_threshold, so recent deletes may not be counted yet
+                with open(metadata_file, "rb") as f:
+                    data = pickle.load(f)
+                tombstones += data.total_elements_added - len(data.id_to_label)
+        collections.append(CollectionStats(
+            name=collection.name, vectors=collection.count(), log_entries=log_counts.get(topic, 0),
+            tombstones=tombstones, disk_bytes=disk_bytes,
+        ))
+
+    orphaned_segments = _orphaned_segment_directories(persist_directory, segments)
+    return DatabaseStats(
+        disk_bytes=_directory_bytes(persist_directory),
+        sqlite_bytes=sqlite_path.stat().st_size,
+        sqlite_free_bytes=free_bytes,
+        orphaned_segments=len(orphaned_segments),
+        orphaned_log_entries=sum(count for topic, count in log_counts.items() if topic not in topics),
+        orphaned_embeddings=orphaned_embeddings,
+        collections=sorted(collections, key=lambda stats: stats.name),
+    )
+
+
+def rebuild_collection(client, name: str) -> bool:
+    """Copy a collection into a fresh one and swap it in under the same name.
+
+    The copy has a compact HNSW index and a write log of one entry per record; deleting
+    the old collection drops its tombstones and its log. The original keeps serving
+    queries until the swap, two renames apart, and is deleted once the queries that
+    started on it had NOTEKEEPER_MAINTENANCE_RETIRE_GRACE seconds to finish. Returns False, keeping the original, if
+    its count changed during the copy (something wrote to it).
+    """
+    collection = client.get_collection(name)
+    for leftover in (name + REBUILD_SUFFIX, name + RETIRED_SUFFIX):
+        try:
+            client.delete_collection(leftover)
+            logger.warning(f"Removed {leftover} left behind by an interrupted rebuild")
+        except ValueError:
+            pass
+
+    count = collection.count()
+    fresh = client.create_collection(name + REBUILD_SUFFIX, metadata=collection.metadata)
+    offset = 0
+    while offset < count:
+        page = collection.get(limit=config.MAINTENANCE_PAGE_SIZE, offset=offset,
+                              include=["embeddings", "documents", "metadatas"])
+        if not page["ids"]:
+            break
+        fresh.add(ids=page["ids"], embeddings=page["embeddings"], documents=page["documents"],
+                  metadatas=page["metadatas"])
+        offset += len(page["ids"])
+
+    if collection.count() != count or fresh.count() != count:
+        logger.warning(f"{name} changed while it was being rebuilt; keeping the original")
+        client.delete_collection(fresh.name)
+        return False
+    collection.modify(name=name + RETIRED_SUFFIX)
+    fresh.modify(name=name)
+    # Queries that looked the old collection up just before the swap are still reading it
+    time.sleep(config.MAINTENANCE_RETIRE_GRACE)
+    client.delete_collection(name + RETIRED_SUFFIX)
+    logger.info(f"Rebuilt {name}: {count} vectors")
+    return True
+
+
+def _is_uuid(name: str) -> bool:
+    try:
+        uuid.UUID(name)
+    except ValueError:
+        return False
+    return True
+
+
+def _orphaned_segment_directories(persist_directory: Path, segments) -> List[Path]:
+    """Chroma's segment directories (named by segment UUID) that its segments table no longer lists.
+
+    Anything else under the persist directory is not Chroma's to clean up and is left alone.
+    """
+    if not persist_directory.exists():
+        return []
+    return [
+        child for child in persist_directory.iterdir()
+        if child.is_dir() and _is_uuid(child.name) and child.name not in segments
+    ]
+
+
+def _remove_orphans():
+    """Drop segment directories that Chroma's segments table no longer references.
+
+    The write log of a deleted collection is reported but left to Chroma, whose tables
+    are only ever changed through its API.
+    """
+    persist_directory = Path(config.CHROMA_PERSIST_DIRECTORY)
+    db = _connect_sqlite(persist_directory / CHROMA_SQLITE_FILE)
+    try:
+        segments = {row[0] for row in db.execute("SELECT id FROM segments")}
+    finally:
+        db.close()
+    for child in _orphaned_segment_directories(persist_directory, segments):
+        logger.info(f"Removing orphaned segment directory {child}")
+        shutil.rmtree(child)
+
+
+def _vacuum(path: Path):
+    if not path.exists():
+        return
+    db = _connect_sqlite(path)
+    try:
+        db.execute("VACUUM")
+        db.execute("ANALYZE")
+    finally:
+        db.close()
+
+
+def maintain_database(rebuild: Optional[bool] = None, dry_run: bool = False,
+                      vacuum: bool = False) -> MaintenanceReport:
+    """Compact the Chroma database: rebuild fragmented collections and drop orphaned segment directories.
+
+    `rebuild=None` rebuilds the collections whose tombstones or write log passed the
+    NOTEKEEPER_MAINTENANCE_* thresholds, True every collection and False none. Reads
+    keep being served throughout; run it with no sync in progress (the service holds
+    its writer lock for it). With `dry_run` only the current stats are reported.
+
+    `vacuum` also VACUUMs chroma.sqlite3, which needs Chroma's connections closed: the
+    shared client is stopped and reopened around it, so nothing else in the process may
+    be using Chroma. Only the offline CLI passes it.
+    """
+    start = time.perf_counter()
+    client = get_chroma_client()
+    report = MaintenanceReport(before=database_stats(client))
+    if dry_run:
+        report.duration = time.perf_counter() - start
+        return report
+
+    for stats in report.before.collections:
+        if rebuild is False or (rebuild is None and not stats.needs_rebuild()):
+            continue
+        if rebuild_collection(client, stats.name):
+            report.rebuilt.append(stats.name)
+        else:
+            report.skipped.append(stats.name)
+    _remove_orphans()
+    _vacuum(Path(config.INGEST_JOB_DB))
+    if vacuum:
+        close_chroma_client()
+        _vacuum(Path(config.CHROMA_PERSIST_DIRECTORY) / CHROMA_SQLITE_FILE)
+        client = get_chroma_client()
+
+    report.after = database_stats(client)
+    report.duration = time.perf_counter() - start
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chroma database maintenance")
+    subcommands = parser.add_subparsers(dest="command")
+    subcommands.add_parser("reset", help="Delete every collection (the default)")
+    maintain = subcommands.add_parser("maintain", help="Rebuild fragmented collections and drop orphaned segments")
+    maintain.add_argument("--rebuild-all", action="store_const", const=True, dest="rebuild",
+                          help="Rebuild every collection, not only fragmented ones")
+    maintain.add_argument("--no-rebuild", action="store_const", const=False, dest="rebuild",
+                          help="Only drop orphaned segments")
+    maintain.add_argument("--vacuum", action="store_true",
+                          help="Also VACUUM Chroma's SQLite file; needs the service and bot stopped")
+    maintain.add_argument("--dry-run", action="store_true", help="Only report the current stats")
+    args = parser.parse_args(argv)
+
+    if args.command == "maintain":
+        from src.service.client import get_service_client
+        from src.telemetry.logging_setup import configure_logging
+
+        configure_logging()
+        service = get_service_client()
+        if service is not None:
+            if args.vacuum:
+                parser.error("--vacuum needs Chroma to itself; stop the service and unset NOTEKEEPER_SERVICE_URL")
+            # The service owns the writer; maintaining through it keeps syncs out while it runs
+            print(service.maintain(args.rebuild, args.dry_run)["table"])
+        else:
+            print(maintain_database(args.rebuild, args.dry_run, vacuum=args.vacuum).format())
+        return
+
     reset_database()
-    print("Database reset completed successfully")
\ No newline at end of file
+    print("Database reset completed successfully")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,178 @@
+"""Stream Chroma collections to shard files and restore them, a page at a time.
+
+Usage:
+    python -m src.database.export export -o backups/ --format npy
+    python -m src.database.export export notion_8d5dc8537d04457fa92a543a83ac397b -o backups/
+    python -m src.database.export import backups/notion_8d5dc8537d04457fa92a543a83ac397b --name restored_notes
+
+Each collection becomes a directory holding manifest.json and numbered shards. With
+--format jsonl a shard is one JSON line per record (embedding included); with --format npy
+the embeddings go to a float32 .npy per shard next to a JSONL file of ids, documents and
+metadata. Memory use is bounded by --batch-size, not by collection size. Offsets are only
+stable while nothing writes to the collection, so export outside of a sync.
+"""
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+project_root = Path(__file__).parents[2]
+sys.path.append(str(project_root))
+
+from src.database.database import get_chroma_client
+from src.telemetry.logging_setup import ProgressLogger, configure_logging
+
+logger = logging.getLogger(__name__)
+
+JSONL = "jsonl"
+NPY = "npy"
+MANIFEST = "manifest.json"
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_SHARD_SIZE = 50000
+
+
+def iter_collection(collection, batch_size: int = DEFAULT_BATCH_SIZE, include: Sequence[str] = ("documents", "metadatas"),
+                    start: int = 0, stop: Optional[int] = None) -> Iterator[Dict[str, List[Any]]]:
+    """Yield `collection.get` pages of at most `batch_size` records between offsets start and stop."""
+    stop = collection.count() if stop is None else stop
+    for offset in range(start, stop, batch_size):
+        page = collection.get(limit=min(batch_size, stop - offset), offset=offset, include=list(include))
+        if not page["ids"]:
+            break
+        yield page
+
+
+def export_collection(collection, out_dir: Path, fmt: str = JSONL, batch_size: int = DEFAULT_BATCH_SIZE,
+                      shard_size: int = DEFAULT_SHARD_SIZE) -> Dict[str, Any]:
+    """Write one collection to out_dir/<name>/; returns the manifest."""
+    target = Path(out_dir) / collection.name
+    target.mkdir(parents=True, exist_ok=True)
+    count = collection.count()
+    manifest = {
+        "collection": collection.name,
+        "metadata": collection.metadata,
+        "format": fmt,
+        "count": 0,
+        "dimensions": None,
+        "shards": [],
+    }
+    progress = ProgressLogger(logger, f"Exporting {collection.name}", total=count)
+
+    for shard_index, shard_start in enumerate(range(0, count, shard_size)):
+        shard_stop = min(shard_start + shard_size, count)
+        stem = f"{collection.name}-{shard_index:05d}"
+        records_path = target / f"{stem}.jsonl"
+        embeddings_path = target / f"{stem}.npy"
+        matrix = None
+        written = 0
+        with open(records_path, "w", encoding="utf-8") as records:
+            for page in iter_collection(collection, batch_size, ("documents", "metadatas", "embeddings"),
+                                        shard_start, shard_stop):
+                embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+                manifest["dimensions"] = manifest["dimensions"] or int(embeddings.shape[1])
+                for i, record_id in enumerate(page["ids"]):
+                    record = {"id": record_id, "document": page["documents"][i], "metadata": page["metadatas"][i]}
+                    if fmt == JSONL:
+                        record["embedding"] = embeddings[i].tolist()
+                    records.write(json.dumps(record) + "\n")
+                if fmt == NPY:
+                    if matrix is None:
+                        # Written in place batch by batch, so the shard never sits in memory whole
+                        matrix = np.lib.format.open_memmap(
+                            embeddings_path, mode="w+", dtype=np.float32,
+                            shape=(shard_stop - shard_start, embeddings.shape[1]),
+                        )
+                    matrix[written:written + len(embeddings)] = embeddings
+                written += len(page["ids"])
+                progress.advance(len(page["ids"]))
+        if matrix is not None:
+            matrix.flush()
+            del matrix
+
+        shard = {"records": records_path.name, "count": written}
+        if fmt == NPY:
+            shard["embeddings"] = embeddings_path.name
+        manifest["shards"].append(shard)
+        manifest["count"] += written
+
+    progress.finish()
+    (target / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    if manifest["count"] != count:
+        logger.warning(f"{collection.name} changed during export: expected {count} records, wrote {manifest['count']}")
+    return manifest
+
+
+def _iter_shard(directory: Path, shard: Dict[str, Any], batch_size: int) -> Iterator[Dict[str, List[Any]]]:
+    embeddings = np.load(directory / shard["embeddings"], mmap_mode="r") if "embeddings" in shard else None
+    batch = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+    with open(directory / shard["records"], encoding="utf-8") as records:
+        for row, line in enumerate(records):
+            record = json.loads(line)
+            batch["ids"].append(record["id"])
+            batch["documents"].append(record["document"])
+            batch["metadatas"].append(record["metadata"])
+            batch["embeddings"].append(record["embedding"] if embeddings is None else embeddings[row].tolist())
+            if len(batch["ids"]) == batch_size:
+                yield batch
+                batch = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+    if batch["ids"]:
+        yield batch
+
+
+def import_collection(directory: Path, name: str = None, batch_size: int = DEFAULT_BATCH_SIZE, client=None):
+    """Upsert an exported collection back into Chroma; returns the collection."""
+    directory = Path(directory)
+    manifest = json.loads((directory / MANIFEST).read_text())
+    client = client or get_chroma_client()
+    collection = client.get_or_create_collection(name=name or manifest["collection"], metadata=manifest["metadata"])
+    progress = ProgressLogger(logger, f"Importing {collection.name}", total=manifest["count"])
+    for shard in manifest["shards"]:
+        for batch in _iter_shard(directory, shard, batch_size):
+            collection.upsert(
+                ids=batch["ids"],
+                documents=batch["documents"],
+                # Chroma rejects empty metadata dicts
+                metadatas=[metadata or None for metadata in batch["metadatas"]],
+                embeddings=batch["embeddings"],
+            )
+            progress.advance(len(batch["ids"]))
+    progress.finish()
+    return collection
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write collections to shard files")
+    export_parser.add_argument("collections", nargs="*", help="Collection names (default: all)")
+    export_parser.add_argument("-o", "--output", type=Path, default=project_root / "backups")
+    export_parser.add_argument("--format", choices=[JSONL, NPY], default=JSONL)
+    export_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    export_parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+
+    import_parser = subparsers.add_parser("import", help="Restore a collection from an export directory")
+    import_parser.add_argument("directory", type=Path)
+    import_parser.add_argument("--name", help="Collection to restore into (default: the exported name)")
+    import_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    client = get_chroma_client()
+    if args.command == "export":
+        names = args.collections or [collection.name for collection in client.list_collections()]
+        for name in names:
+            manifest = export_collection(client.get_collection(name), args.output, args.format,
+                                         args.batch_size, args.shard_size)
+            logger.info(f"Exported {manifest['count']} records from {name} to {args.output / name}")
+    else:
+        collection = import_collection(args.directory, args.name, args.batch_size, client)
+        logger.info(f"Imported {collection.count()} records into {collection.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from langchain_core.documents import Document
+
+from src import config
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+# Stopped by /cancel; like a failed job, the next sync resumes it from its checkpoints
+CANCELLED = "cancelled"
+
+# Chunk states
+EMBEDDED = "embedded"
+WRITTEN = "written"
+FAILED_ITEM = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    database_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    pages_fetched INTEGER NOT NULL DEFAULT 0,
+    chunks_embedded INTEGER NOT NULL DEFAULT 0,
+    chunks_written INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_database ON jobs (database_id, status);
+CREATE TABLE IF NOT EXISTS job_pages (
+    job_id TEXT NOT NULL,
+    page_id TEXT NOT NULL,
+    last_edited_time TEXT,
+    page_content TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    PRIMARY KEY (job_id, page_id)
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    PRIMARY KEY (job_id, item_id)
+);
+"""
+
+
+@dataclass
+class IngestJob:
+    job_id: str
+    database_id: str
+    status: str
+    started_at: float
+    updated_at: float
+    pages_fetched: int = 0
+    chunks_embedded: int = 0
+    chunks_written: int = 0
+    error: Optional[str] = None
+
+
+class JobStore:
+    """SQLite table of ingest jobs with per-page and per-chunk checkpoints.
+
+    Fetched pages are kept until their job finishes, so a restarted ingest skips the
+    Notion calls for them; chunks already written to Chroma are skipped by content hash.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            connection = sqlite3.connect(self.path)
+            connection.row_factory = sqlite3.Row
+            try:
+                connection.execute("PRAGMA synchronous=NORMAL")
+                yield connection
+                connection.commit()
+            finally:
+                connection.close()
+
+    def start(self, database_id: str) -> IngestJob:
+        """Resume the unfinished job for this database, or start a new one."""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE database_id = ? AND status != ? ORDER BY started_at DESC LIMIT 1",
+                (database_id, DONE),
+            ).fetchone()
+            if row is not None:
+                connection.execute("UPDATE jobs SET status = ?, error = NULL, updated_at = ? WHERE job_id = ?",
+                                   (RUNNING, time.time(), row["job_id"]))
+                return IngestJob(**{**dict(row), "status": RUNNING, "error": None})
+            now = time.time()
+            job = IngestJob(job_id=uuid.uuid4().hex, database_id=database_id, status=RUNNING,
+                            started_at=now, updated_at=now)
+            connection.execute(
+                "INSERT INTO jobs (job_id, database_id, status, started_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job.job_id, database_id, RUNNING, now, now),
+            )
+            return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._connect() as connection:
+            row = connection.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return IngestJob(**dict(row)) if row else None
+
+    def list_jobs(self, limit: int = 20) -> List[IngestJob]:
+        with self._connect() as connection:
+            rows = connection.execute("SELECT * FROM jobs ORDER BY started_at DESC LIMIT ?", (limit,)).fetchall()
+        return [IngestJob(**dict(row)) for row in rows]
+
+    def save_page(self, job_id: str, doc: Document):
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO job_pages (job_id, page_id, last_edited_time, page_content, metadata) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (job_id, doc.metadata["notion_id"], doc.metadata.get("last_edited_time"),
+                 doc.page_content, json.dumps(doc.metadata)),
+            )
+            connection.execute(
+                "UPDATE jobs SET pages_fetched = (SELECT COUNT(*) FROM job_pages WHERE job_id = ?), updated_at = ? "
+                "WHERE job_id = ?",
+                (job_id, time.time(), job_id),
+            )
+
+    def set_pages_fetched(self, job_id: str, pages: int):
+        """For jobs given their documents up front rather than fetching them page by page."""
+        with self._connect() as connection:
+            connection.execute("UPDATE jobs SET pages_fetched = ?, updated_at = ? WHERE job_id = ?",
+                               (pages, time.time(), job_id))
+
+    def load_pages(self, job_id: str) -> Dict[str, Document]:
+        """Checkpointed pages by Notion page id."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT page_id, page_content, metadata FROM job_pages WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        return {
+            row["page_id"]: Document(page_content=row["page_content"], metadata=json.loads(row["metadata"]))
+            for row in rows
+        }
+
+    def written_items(self, job_id: str) -> Dict[str, str]:
+        """Item id -> content hash for chunks this job already wrote to Chroma."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT item_id, content_hash FROM job_items WHERE job_id = ? AND state = ?", (job_id, WRITTEN)
+            ).fetchall()
+        return {row["item_id"]: row["content_hash"] for row in rows}
+
+    def mark_items(self, job_id: str, items: Dict[str, str], state: str, error: str = None):
+        """Record item id -> content hash pairs as embedded, written or failed."""
+        if not items:
+            return
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT INTO job_items (job_id, item_id, content_hash, state, attempts, error) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (job_id, item_id) DO UPDATE SET content_hash = excluded.content_hash, "
+                "state = excluded.state, error = excluded.error, attempts = job_items.attempts + excluded.attempts",
+                [(job_id, item_id, content_hash, state, int(state == FAILED_ITEM), error)
+                 for item_id, content_hash in items.items()],
+            )
+            # Counted from the item states, so a chunk retried or marked again on resume counts once
+            connection.execute(
+                "UPDATE jobs SET chunks_embedded = (SELECT COUNT(*) FROM job_items WHERE job_id = ? AND state IN (?, ?)), "
+                "chunks_written = (SELECT COUNT(*) FROM job_items WHERE job_id = ? AND state = ?), updated_at = ? "
+                "WHERE job_id = ?",
+                (job_id, EMBEDDED, WRITTEN, job_id, WRITTEN, time.time(), job_id),
+            )
+
+    def failed_items(self, job_id: str) -> Dict[str, int]:
+        """Item id -> failed attempts for chunks that are still failing."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT item_id, attempts FROM job_items WHERE job_id = ? AND state = ?", (job_id, FAILED_ITEM)
+            ).fetchall()
+        return {row["item_id"]: row["attempts"] for row in rows}
+
+    def finish(self, job_id: str, status: str = DONE, error: str = None):
+        """Close the job; finished jobs drop their page checkpoints."""
+        with self._connect() as connection:
+            connection.execute("UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                               (status, error, time.time(), job_id))
+            if status == DONE:
+                connection.execute("DELETE FROM job_pages WHERE job_id = ?", (job_id,))
+                connection.execute("DELETE FROM job_items WHERE job_id = ?", (job_id,))
+
+
+_stores: Dict[str, JobStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    path = str(config.INGEST_JOB_DB)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = JobStore(path)
+        return _stores[path]
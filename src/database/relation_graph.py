@@ -0,0 +1,131 @@
+import bisect
+import hashlib
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+# Names get_relation_names puts in place of pages it could not resolve
+PLACEHOLDER_NAMES = {"Untitled", "Error", "unknown", ""}
+
+
+@dataclass
+class RelationGraph:
+    """Undirected graph of related names in CSR form.
+
+    `nodes` is sorted; the neighbours of nodes[i] are nodes[indices[indptr[i]:indptr[i + 1]]].
+    """
+    nodes: List[str]
+    indptr: np.ndarray
+    indices: np.ndarray
+
+    @classmethod
+    def from_edges(cls, edges: Iterable[Tuple[str, str]]) -> "RelationGraph":
+        pairs = set()
+        for a, b in edges:
+            if a != b:
+                pairs.update([(a, b), (b, a)])
+        nodes = sorted({name for pair in pairs for name in pair})
+        position = {name: i for i, name in enumerate(nodes)}
+        # Sorted (source, target) rows make each node's neighbours one contiguous, sorted run
+        rows = np.array(sorted((position[a], position[b]) for a, b in pairs), dtype=np.int32).reshape(-1, 2)
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(rows[:, 0], minlength=len(nodes)), out=indptr[1:])
+        return cls(nodes, indptr, rows[:, 1].copy())
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices) // 2
+
+    def neighbors(self, name: str) -> List[str]:
+        i = bisect.bisect_left(self.nodes, name)
+        if i == len(self.nodes) or self.nodes[i] != name:
+            return []
+        return [self.nodes[j] for j in self.indices[self.indptr[i]:self.indptr[i + 1]]]
+
+    def fingerprint(self) -> str:
+        digest = hashlib.sha1("\n".join(self.nodes).encode("utf-8"))
+        digest.update(self.indptr.tobytes())
+        digest.update(self.indices.tobytes())
+        return digest.hexdigest()
+
+
+def _relation_values(properties: Dict) -> Tuple[List[str], List[str]]:
+    """(About NPC names, names from the page's other relation properties).
+
+    Relations are the only properties download.py stores as plain lists of names.
+    """
+    about = [name for name in properties.get("About NPC", []) or [] if name not in PLACEHOLDER_NAMES]
+    related = []
+    for prop_name, value in properties.items():
+        if prop_name == "About NPC" or not isinstance(value, list) or not value:
+            continue
+        if all(isinstance(item, str) for item in value):
+            related.extend(name for name in value if name not in PLACEHOLDER_NAMES)
+    return about, related
+
+
+def edges_from_docs(docs) -> Set[Tuple[str, str]]:
+    """Edges between the names a page links: NPCs it is about with each other and with its other relations.
+
+    A page about no NPC links its own title instead, so an NPC's own page connects to its allies.
+    """
+    edges = set()
+    for doc in docs:
+        about, related = _relation_values(doc.metadata.get("notion_properties", {}) or {})
+        title = doc.metadata.get("title")
+        subjects = about or ([title] if title and title not in PLACEHOLDER_NAMES else [])
+        edges.update(combinations(sorted(set(subjects)), 2))
+        edges.update((subject, name) for subject in subjects for name in related)
+    return edges
+
+
+_graphs: Dict[str, Tuple[float, RelationGraph]] = {}
+_lock = threading.Lock()
+
+
+def _path(collection_name: str) -> Path:
+    return Path(config.RELATION_GRAPH_DIRECTORY) / f"{collection_name}.npz"
+
+
+def update_graph(collection_name: str, edges: Iterable[Tuple[str, str]]) -> RelationGraph:
+    """Replace a collection's graph; the file is only rewritten when an edge changed."""
+    graph = RelationGraph.from_edges(edges)
+    current = get_graph(collection_name)
+    if current is not None and current.fingerprint() == graph.fingerprint():
+        return current
+    path = _path(collection_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez(tmp, nodes=np.array(graph.nodes, dtype=str), indptr=graph.indptr, indices=graph.indices)
+    os.replace(tmp, path)
+    with _lock:
+        _graphs.pop(collection_name, None)
+    logger.info(f"Relation graph for {collection_name}: {len(graph.nodes)} nodes, {graph.edge_count} edges")
+    return graph
+
+
+def get_graph(collection_name: str) -> Optional[RelationGraph]:
+    """The collection's graph, reloaded when another process rewrote the file."""
+    path = _path(collection_name)
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    with _lock:
+        cached = _graphs.get(collection_name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with np.load(path, allow_pickle=False) as data:
+            graph = RelationGraph(data["nodes"].tolist(), data["indptr"], data["indices"])
+        _graphs[collection_name] = (mtime, graph)
+        return graph
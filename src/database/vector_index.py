@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src import config
+from src.database.export import iter_collection
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ExactIndex:
+    """One collection's embeddings as a normalized float32 matrix, searched by brute force.
+
+    The matrix is memory-mapped from disk; ids, documents and metadata are held in memory.
+    """
+    name: str
+    matrix: np.ndarray
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    _rows_by_npc: Optional[Dict[str, List[int]]] = field(default=None, repr=False)
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+    def rows_about(self, npcs: List[str]) -> List[int]:
+        """Rows whose "About NPC" is one of `npcs`; the lookup table is built on first use."""
+        if self._rows_by_npc is None:
+            rows_by_npc = {}
+            for row, metadata in enumerate(self.metadatas):
+                if metadata.get("About NPC"):
+                    rows_by_npc.setdefault(metadata["About NPC"], []).append(row)
+            self._rows_by_npc = rows_by_npc
+        return [row for npc in npcs for row in self._rows_by_npc.get(npc, [])]
+
+    def search(self, query_embedding, k: int) -> List[Tuple[int, float]]:
+        """Exact top-k (row, cosine distance) pairs, nearest first."""
+        if not self.count or k <= 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        scores = self.matrix @ query
+        k = min(k, self.count)
+        # argpartition finds the k best in linear time; only those k are sorted
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(1.0 - scores[row])) for row in top]
+
+
+_indexes: Dict[str, ExactIndex] = {}
+_dimensions: Dict[str, int] = {}
+# Background rebuilds in flight, by collection
+_pending: Dict[str, Future] = {}
+# One build at a time per collection; searches never wait on these
+_build_locks: Dict[str, threading.Lock] = {}
+# Guards the dicts above; never held while an index is built or loaded
+_lock = threading.Lock()
+_rebuild_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vector-index")
+
+
+def _paths(name: str) -> Tuple[Path, Path]:
+    directory = Path(config.VECTOR_INDEX_DIRECTORY)
+    return directory / f"{name}.npy", directory / f"{name}.json"
+
+
+def _grow(matrix: np.ndarray, path: Path, rows: int) -> np.ndarray:
+    """The memmap at `path` enlarged to `rows` rows, keeping what was written so far."""
+    grown_path = path.with_suffix(".grown.npy")
+    grown = np.lib.format.open_memmap(grown_path, mode="w+", dtype=np.float32, shape=(rows, matrix.shape[1]))
+    grown[:matrix.shape[0]] = matrix
+    os.replace(grown_path, path)
+    return grown
+
+
+def build_index(collection) -> ExactIndex:
+    """Rebuild a collection's index files from Chroma, the source of truth, a page at a time."""
+    matrix_path, records_path = _paths(collection.name)
+    matrix_path.parent.mkdir(parents=True, exist_ok=True)
+    count = collection.count()
+    ids, documents, metadatas = [], [], []
+    matrix = None
+    tmp_matrix = matrix_path.with_suffix(".npy.tmp")
+    for page in iter_collection(collection, include=("documents", "metadatas", "embeddings")):
+        embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(tmp_matrix, mode="w+", dtype=np.float32,
+                                               shape=(count, embeddings.shape[1]))
+        if len(ids) + len(embeddings) > matrix.shape[0]:
+            # Records were added while we paged; doubling keeps the copies rare, the spare rows are dropped below
+            matrix = _grow(matrix, tmp_matrix, max(len(ids) + len(embeddings), 2 * matrix.shape[0]))
+        matrix[len(ids):len(ids) + len(embeddings)] = embeddings
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(metadata or {} for metadata in page["metadatas"])
+
+    if matrix is None:
+        matrix = np.lib.format.open_memmap(tmp_matrix, mode="w+", dtype=np.float32, shape=(0, 0))
+    matrix.flush()
+    if len(ids) != matrix.shape[0]:
+        # Records were deleted while we paged, or rows were left spare when growing; drop them
+        np.save(tmp_matrix.with_suffix(".partial.npy"), np.array(matrix[:len(ids)]))
+        del matrix
+        os.replace(tmp_matrix.with_suffix(".partial.npy"), tmp_matrix)
+    else:
+        del matrix
+    tmp_records = records_path.with_suffix(".json.tmp")
+    tmp_records.write_text(json.dumps({"ids": ids, "documents": documents, "metadatas": metadatas}))
+    # Replace both files only once they are complete so a reader never sees half an index
+    os.replace(tmp_matrix, matrix_path)
+    os.replace(tmp_records, records_path)
+    logger.info(f"Built exact index for {collection.name} with {len(ids)} vectors")
+    return _load(collection.name)
+
+
+def _load(name: str) -> Optional[ExactIndex]:
+    matrix_path, records_path = _paths(name)
+    if not matrix_path.exists() or not records_path.exists():
+        return None
+    records = json.loads(records_path.read_text())
+    matrix = np.load(matrix_path, mmap_mode="r")
+    if matrix.shape[0] != len(records["ids"]):
+        return None
+    return ExactIndex(name, matrix, records["ids"], records["documents"], records["metadatas"])
+
+
+def _build_lock(name: str) -> threading.Lock:
+    with _lock:
+        return _build_locks.setdefault(name, threading.Lock())
+
+
+def _rebuild(collection) -> ExactIndex:
+    with _build_lock(collection.name):
+        index = build_index(collection)
+    with _lock:
+        _indexes[collection.name] = index
+        if index.count:
+            _dimensions[collection.name] = index.matrix.shape[1]
+    return index
+
+
+def _schedule_rebuild(collection):
+    with _lock:
+        pending = _pending.get(collection.name)
+        if pending is not None and not pending.done():
+            return
+        future = _rebuild_pool.submit(_rebuild, collection)
+        _pending[collection.name] = future
+    future.add_done_callback(lambda done: done.exception() and logger.error(
+        f"Failed to rebuild exact index for {collection.name}: {done.exception()}"))
+
+
+def get_index(collection, count: int = None) -> Optional[ExactIndex]:
+    """The collection's exact index, or None until its first one is built; search Chroma meanwhile.
+
+    When the vector count no longer matches Chroma (a sync is writing) the stale index
+    keeps serving and a fresh one is built in the background, so queries never wait on a
+    rebuild.
+    """
+    count = collection.count() if count is None else count
+    with _lock:
+        index = _indexes.get(collection.name)
+    if index is None:
+        index = _load(collection.name)
+        if index is not None:
+            with _lock:
+                index = _indexes.setdefault(collection.name, index)
+    if index is None or index.count != count:
+        _schedule_rebuild(collection)
+    return index
+
+
+def refresh_index(collection):
+    """Rebuild after a sync so changed chunks with an unchanged count are picked up too."""
+    if not use_exact(collection, collection.count()):
+        drop_index(collection.name)
+        return
+    _rebuild(collection)
+
+
+def drop_index(name: str):
+    with _lock:
+        _indexes.pop(name, None)
+        _dimensions.pop(name, None)
+    for path in _paths(name):
+        path.unlink(missing_ok=True)
+
+
+def dimensions(collection) -> int:
+    """The collection's embedding size, from its index or one stored vector; 0 while it is empty."""
+    with _lock:
+        if collection.name in _dimensions:
+            return _dimensions[collection.name]
+    embeddings = collection.peek(1)["embeddings"]
+    if embeddings is None or not len(embeddings):
+        return 0
+    with _lock:
+        _dimensions[collection.name] = len(embeddings[0])
+    return _dimensions[collection.name]
+
+
+def use_exact(collection, count: int) -> bool:
+    """Whether the collection's float32 matrix (count x dimensions x 4 bytes) fits EXACT_SEARCH_MAX_MB."""
+    if count <= 0 or config.EXACT_SEARCH_MAX_MB <= 0:
+        return False
+    return count * dimensions(collection) * 4 <= config.EXACT_SEARCH_MAX_MB * 1024 * 1024
@@ -1,16 +1,24 @@
 import discord
 from discord import app_commands
+import asyncio
+import importlib
 import os
+import time
 from dotenv import load_dotenv
 from functools import wraps
 import sys
 from pathlib import Path
-from src.ollama_utils.answer import answer_question
-from src.notion.download import process_notion_databases
+from typing import List
 
 project_root = Path(__file__).parents[2]
 sys.path.append(str(project_root))
 
+from src.cancellation import OperationCancelled, operations
+from src.discord.guilds import load_guilds
+from src.notion import normalize_database_id
+from src.ollama_utils.autocomplete import load_title_index, title_index
+from src.service.client import ServiceError, get_service_client
+
 # Load environment variables
 config_path = project_root / "config" / ".env"
 load_dotenv(dotenv_path=config_path)
@@ -21,8 +29,110 @@ intents.message_content = True
 bot = discord.Client(intents=intents)
 tree = app_commands.CommandTree(bot)
 
-# List of approved guild IDs
-APPROVED_GUILDS = [1114617197931790376]  # Replace with your actual approved guild IDs
+# Guild id -> the Notion databases it may ask about and sync (config/guilds.json)
+GUILDS = load_guilds()
+APPROVED_GUILDS = list(GUILDS)
+
+# Heavy subsystems (langchain, chromadb, notion_client, ollama) are imported on
+# first use or pre-warmed in the background once the gateway is connected
+RETRIEVAL_ENGINE_MODULES = ("src.ollama_utils.answer", "src.notion.download")
+engine_warm = asyncio.Event()
+warm_task = None
+keep_warm_task = None
+
+def load_retrieval_engine():
+    for module in RETRIEVAL_ENGINE_MODULES:
+        importlib.import_module(module)
+
+async def warm_retrieval_engine():
+    start = time.perf_counter()
+    service = get_service_client()
+    if service is not None:
+        # The retrieval service holds the engine and keeps the models resident
+        try:
+            health = await asyncio.to_thread(service.health)
+        except Exception as e:
+            print(f"Retrieval service unavailable at {service.url}: {e}")
+            return
+        engine_warm.set()
+        print(f"Using retrieval service at {service.url} with {health['collections']} collections")
+        return
+    try:
+        await asyncio.to_thread(load_retrieval_engine)
+    except Exception as e:
+        print(f"Failed to warm retrieval engine: {e}")
+        return
+    print(f"Retrieval engine loaded after {time.perf_counter() - start:.2f}s")
+    await preload_models()
+    engine_warm.set()
+    print(f"Retrieval engine warm after {time.perf_counter() - start:.2f}s")
+
+# Load the Ollama models before the first /ask and keep them resident during play hours
+async def preload_models():
+    global keep_warm_task
+    from src.ollama_utils.residency import residency_manager
+    await asyncio.to_thread(residency_manager.preload)
+    report = await asyncio.to_thread(residency_manager.report)
+    print(f"Preloaded Ollama models:\n{report}")
+    if keep_warm_task is None:
+        keep_warm_task = asyncio.create_task(residency_manager.keep_warm())
+
+def run_answer_question(question: str, database_ids, session: str = None, operation=None):
+    service = get_service_client()
+    if service is not None:
+        # The service registers the question under the same id, so /cancel can reach it there
+        return service.answer_question(question, database_ids, session=session,
+                                       operation_id=operation.operation_id if operation else None)
+    from src.ollama_utils.answer import answer_question
+    return answer_question(question, database_ids, session=session, cancel=operation.token if operation else None)
+
+def run_forget_session(session: str) -> bool:
+    service = get_service_client()
+    if service is not None:
+        return service.forget(session)
+    from src.ollama_utils.sessions import conversation_sessions
+    return conversation_sessions.forget(session)
+
+def session_key(interaction: discord.Interaction) -> str:
+    # A thread has its own channel id, so each thread is a conversation of its own
+    return f"{interaction.guild_id}:{interaction.channel_id}"
+
+def run_process_notion_databases(database_ids=None, operation=None):
+    """Sync the given databases (all when None); returns (number of failed databases, report table)."""
+    service = get_service_client()
+    if service is not None:
+        report = service.sync(database_ids, operation_id=operation.operation_id if operation else None)
+        # The service saved the new autocomplete names; load them into this process
+        load_title_index()
+        return report["failed"], report["table"]
+    from src.notion.download import process_notion_databases
+    report = process_notion_databases(database_ids, cancel=operation.token if operation else None)
+    return len(report.failed), report.format()
+
+def run_cancel(operation) -> None:
+    operation.token.cancel()
+    service = get_service_client()
+    if service is not None:
+        service.cancel(operation.operation_id)
+
+def run_list_jobs(limit: int = 10):
+    """Recent ingest jobs, newest first, as dicts of IngestJob fields."""
+    service = get_service_client()
+    if service is not None:
+        return service.jobs(limit)
+    from dataclasses import asdict
+    from src.database.jobs import get_job_store
+    return [asdict(job) for job in get_job_store().list_jobs(limit)]
+
+def run_health_check():
+    """Backend latency self-test; returns (healthy, report table)."""
+    service = get_service_client()
+    if service is not None:
+        result = service.health_check()
+        return result["healthy"], result["table"]
+    from src.telemetry.health import run_health_check as check_backends
+    report = check_backends()
+    return report.healthy, report.format()
 
 def guild_check():
     def predicate(interaction: discord.Interaction):
@@ -33,12 +143,16 @@ def guild_check():
 
 @bot.event
 async def on_ready():
+    global warm_task
     print(f'{bot.user} has connected to Discord!')
     try:
         await tree.sync()
         print("Synced command tree")
     except Exception as e:
         print(e)
+    if warm_task is None:
+        print(f"Loaded {load_title_index()} autocomplete keys")
+        warm_task = asyncio.create_task(warm_retrieval_engine())
 
 @tree.command(name="hello", description="Get a friendly greeting from the bot")
 @guild_check()
@@ -48,24 +162,147 @@ async def hello(interaction: discord.Interaction):
 @tree.command(name="ask", description="Ask the bot a question")
 @guild_check()
 async def ask(interaction: discord.Interaction, question: str):
+    guild = GUILDS[interaction.guild_id]
+    if not guild.ask_limiter.try_acquire():
+        await interaction.response.send_message("This server is asking questions faster than I can answer. Please try again in a moment.", ephemeral=True)
+        return
     await interaction.response.defer(thinking=True)
+    operation = operations.start("ask", question, guild_id=interaction.guild_id, user=interaction.user.name,
+                                 user_id=interaction.user.id)
     
     try:
-        answer = answer_question(question, [])  # Passing an empty list for database_ids
+        # Only this guild's collections are searched; follow-ups in a channel continue its conversation
+        answer = await asyncio.to_thread(run_answer_question, question, guild.database_ids, session_key(interaction),
+                                         operation)
         await interaction.followup.send(f"Question: {question}\n\nAnswer: {answer}")
+    except OperationCancelled:
+        await interaction.followup.send(f"Question: {question}\n\n*(Cancelled.)*")
     except Exception as e:
         await interaction.followup.send(f"An error occurred while processing your question: {str(e)}")
+    finally:
+        operations.finish(operation)
+
+# Served from the in-memory title index only: Discord drops autocomplete responses after 3 seconds
+@ask.autocomplete("question")
+async def ask_question_autocomplete(interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+    guild = GUILDS.get(interaction.guild_id)
+    if guild is None:
+        return []
+    suggestions = title_index.suggest(current, databases=guild.database_ids)
+    return [app_commands.Choice(name=suggestion, value=suggestion) for suggestion in suggestions]
+
+@tree.command(name="forget", description="Start a new conversation in this channel")
+@guild_check()
+async def forget(interaction: discord.Interaction):
+    if await asyncio.to_thread(run_forget_session, session_key(interaction)):
+        await interaction.response.send_message("Okay, the next question starts a new conversation.", ephemeral=True)
+    else:
+        await interaction.response.send_message("There is no conversation to forget in this channel.", ephemeral=True)
 
 @tree.command(name="update", description="Update the database from Notion")
 @guild_check()
 async def update(interaction: discord.Interaction):
+    guild = GUILDS[interaction.guild_id]
+    if guild.database_ids == []:
+        await interaction.response.send_message("No Notion databases are configured for this server.", ephemeral=True)
+        return
+    if guild.update_lock.locked():
+        await interaction.response.send_message("An update for this server is already running.", ephemeral=True)
+        return
     await interaction.response.defer(thinking=True)
+    operation = operations.start("sync", guild.name or str(guild.guild_id), guild_id=interaction.guild_id,
+                                 user=interaction.user.name, user_id=interaction.user.id)
     
     try:
-        process_notion_databases()
-        await interaction.followup.send("Successfully updated the database from Notion.")
+        async with guild.update_lock:
+            failed, table = await asyncio.to_thread(run_process_notion_databases, guild.database_ids, operation)
+        if operation.token.cancelled:
+            summary = "Update cancelled; the next /update resumes where it stopped."
+        elif failed:
+            summary = f"Updated the database from Notion with {failed} failed database(s)."
+        else:
+            summary = "Successfully updated the database from Notion."
+        if len(table) > 1800:  # Discord messages are capped at 2000 characters
+            table = table[:1800] + "\n..."
+        await interaction.followup.send(f"{summary}\n```\n{table}\n```")
+    except ServiceError as e:
+        # The service holds one writer lock for every server; another bot or the CLI may be syncing
+        if e.status_code == 409:
+            await interaction.followup.send("An update is already running. Please try again when it finishes.")
+        else:
+            await interaction.followup.send(f"An error occurred while updating the database: {str(e)}")
     except Exception as e:
         await interaction.followup.send(f"An error occurred while updating the database: {str(e)}")
+    finally:
+        operations.finish(operation)
+
+@tree.command(name="jobs", description="List the questions and updates in progress and recent syncs")
+@guild_check()
+async def jobs(interaction: discord.Interaction):
+    now = time.time()
+    lines = ["In progress:"]
+    for operation in operations.list(interaction.guild_id):
+        state = " (cancelling)" if operation.token.cancelled else ""
+        lines.append(f"`{operation.operation_id}` {operation.kind} by {operation.user}, "
+                     f"{now - operation.started_at:.0f}s{state}: {operation.description[:80]}")
+    if len(lines) == 1:
+        lines.append("nothing")
+
+    guild = GUILDS[interaction.guild_id]
+    # Jobs recorded before ids were normalized may still carry hyphens
+    recent = [job for job in await asyncio.to_thread(run_list_jobs, 20)
+              if guild.database_ids is None or normalize_database_id(job["database_id"]) in guild.database_ids][:5]
+    if recent:
+        lines.append("\nRecent syncs:")
+        for job in recent:
+            lines.append(f"{job['database_id'][:8]} {job['status']}: {job['pages_fetched']} pages, "
+                         f"{job['chunks_written']} chunks written, {now - job['updated_at']:.0f}s ago")
+    await interaction.response.send_message("\n".join(lines), ephemeral=True)
+
+@tree.command(name="cancel", description="Cancel a question or update in progress (your latest one by default)")
+@guild_check()
+async def cancel(interaction: discord.Interaction, operation_id: str = None):
+    running = operations.list(interaction.guild_id)
+    if operation_id is not None:
+        operation = next((op for op in running if op.operation_id == operation_id), None)
+    else:
+        operation = next((op for op in reversed(running) if op.user_id == interaction.user.id), None)
+    if operation is None:
+        await interaction.response.send_message("Nothing to cancel; see /jobs for what is running.", ephemeral=True)
+        return
+    if not operation.cancellable_by(interaction.user.id, interaction.permissions.manage_guild):
+        await interaction.response.send_message("You can only cancel your own questions and updates.", ephemeral=True)
+        return
+    await asyncio.to_thread(run_cancel, operation)
+    await interaction.response.send_message(f"Cancelling `{operation.operation_id}` ({operation.kind}).", ephemeral=True)
+
+@tree.command(name="stats", description="Show per-stage latency and generation throughput")
+@app_commands.default_permissions(administrator=True)
+@guild_check()
+async def stats(interaction: discord.Interaction):
+    service = get_service_client()
+    if service is not None:
+        report = await asyncio.to_thread(service.stats)
+        await interaction.response.send_message(f"```\n{report}\n```", ephemeral=True)
+        return
+    from src.telemetry.tracing import format_stats
+    report = format_stats()
+    if engine_warm.is_set():
+        from src.ollama_utils.residency import residency_manager
+        report += "\n\n" + await asyncio.to_thread(residency_manager.report)
+    await interaction.response.send_message(f"```\n{report}\n```", ephemeral=True)
+
+@tree.command(name="health", description="Time Ollama, Chroma and Notion and show model and cache state")
+@app_commands.default_permissions(administrator=True)
+@guild_check()
+async def health(interaction: discord.Interaction):
+    # Ollama may need to load both models, which takes longer than Discord's 3 seconds
+    await interaction.response.defer(ephemeral=True)
+    healthy, report = await asyncio.to_thread(run_health_check)
+    # Discord caps messages at 2000 characters
+    if len(report) > 1900:
+        report = report[:1900] + "\n..."
+    await interaction.followup.send(f"{'Healthy' if healthy else 'Degraded'}\n```\n{report}\n```", ephemeral=True)
 
 @tree.error
 async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
@@ -79,4 +316,6 @@ async def on_app_command_error(interaction: discord.Interaction, error: app_comm
 
 # Run the bot
 if __name__ == "__main__":
+    from src.telemetry.logging_setup import configure_logging
+    configure_logging()
     bot.run(os.getenv('DISCORD_NOTEKEEPER_KEY'))
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""Which Notion databases each Discord guild may ask about and sync.
+
+The mapping lives in config/guilds.json (or NOTEKEEPER_GUILDS_FILE):
+
+    {
+        "1114617197931790376": {
+            "name": "Curse of Strahd",
+            "databases": ["8d5dc8537d04457fa92a543a83ac397b", "a7c454796df647eaa901d324c74cca67"],
+            "ask_rate": 0.5,
+            "ask_burst": 5
+        }
+    }
+
+A guild's /ask only searches the collections of its own databases and its /update only
+syncs them. Without the file, the legacy guild list is approved and sees everything.
+"""
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src import config
+from src.clients.rate_limit import TokenBucket
+from src.notion import normalize_database_id
+
+logger = logging.getLogger(__name__)
+
+# Approved before guilds.json existed; each searches and syncs every database
+LEGACY_GUILDS = [1114617197931790376]
+
+
+@dataclass
+class Guild:
+    guild_id: int
+    name: str = ""
+    # None means every database (legacy); an empty list means none
+    database_ids: Optional[List[str]] = None
+    ask_rate: float = field(default_factory=lambda: config.GUILD_ASK_RATE)
+    ask_burst: int = field(default_factory=lambda: config.GUILD_ASK_BURST)
+
+    def __post_init__(self):
+        # Per guild, so a busy group cannot use up another group's Ollama time
+        self.ask_limiter = TokenBucket(self.ask_rate, self.ask_burst)
+        # One /update per guild at a time; created lazily inside the bot's event loop
+        self._update_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def update_lock(self) -> asyncio.Lock:
+        if self._update_lock is None:
+            self._update_lock = asyncio.Lock()
+        return self._update_lock
+
+
+def load_guilds(path: Path = None) -> Dict[int, Guild]:
+    path = Path(path or config.GUILDS_FILE)
+    if not path.exists():
+        logger.info(f"No guild mapping at {path}; approving the legacy guilds for every database")
+        return {guild_id: Guild(guild_id) for guild_id in LEGACY_GUILDS}
+
+    guilds = {}
+    for guild_id, entry in json.loads(path.read_text()).items():
+        guild = Guild(
+            guild_id=int(guild_id),
+            name=entry.get("name", ""),
+            database_ids=[normalize_database_id(database_id) for database_id in entry.get("databases", [])],
+            ask_rate=float(entry.get("ask_rate", config.GUILD_ASK_RATE)),
+            ask_burst=int(entry.get("ask_burst", config.GUILD_ASK_BURST)),
+        )
+        guilds[guild.guild_id] = guild
+    logger.info(f"Loaded {len(guilds)} guilds from {path}")
+    return guilds
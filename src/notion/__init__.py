@@ -1,3 +1,22 @@
-from .download import extract_notion_docs
+import importlib
 
-__all__ = ['extract_notion_docs']
\ No newline at end of file
+# download pulls in notion_client and langchain, so it is loaded on first access
+_LAZY_EXPORTS = {
+    'extract_notion_docs': '.download',
+    'discover_databases': '.download',
+    'process_notion_databases': '.download',
+}
+
+__all__ = ['extract_notion_docs', 'discover_databases', 'process_notion_databases', 'normalize_database_id']
+
+
+def normalize_database_id(database_id: str) -> str:
+    """Notion hands out ids with and without hyphens; collection names and index keys use the bare form."""
+    return database_id.strip().replace('-', '').lower()
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        module = importlib.import_module(_LAZY_EXPORTS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,36 +3,55 @@ from dotenv import load_dotenv
 import os
 from pathlib import Path
 import sys
-from notion_client import Client
-from langchain.docstore.document import Document
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from langchain_core.documents import Document
 
 project_root = Path(__file__).parents[2]
 sys.path.append(str(project_root))
 
-# Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from src import config
+from src.cancellation import CancellationToken, OperationCancelled, check
+from src.clients import get_notion_client
+from src.notion import normalize_database_id
+from src.telemetry.logging_setup import ProgressLogger, SampledLogger, configure_logging
+from src.telemetry.tracing import span
+
+logger = logging.getLogger(__name__)
+sampled = SampledLogger(logger)
 
 # Load environment variables
 config_path = project_root / "config" / ".env"
 load_dotenv(dotenv_path=config_path)
 
-def extract_notion_docs(database_id: str):
-    logging.info(f"Starting extract_notion_docs for database {database_id}")
-    logging.info(f"Extracting Notion docs for database {database_id}")
+def extract_notion_docs(database_id: str, cached_pages: Dict[str, Document] = None,
+                        on_page: Callable[[Document], None] = None, cancel: CancellationToken = None):
+    """Fetch every page of a database as a Document.
+
+    Pages in `cached_pages` whose last_edited_time still matches are reused without
+    fetching their blocks or relations; `on_page` is called for each newly fetched page.
+    `cancel` is checked before each page is fetched.
+    """
+    logger.info(f"Extracting Notion docs for database {database_id}")
+    cached_pages = cached_pages or {}
 
     NOTION_API_KEY = os.getenv("NOTION_API_KEY")
     if not NOTION_API_KEY:
-        logging.error("NOTION_API_KEY not found in environment variables")
+        logger.error("NOTION_API_KEY not found in environment variables")
         return None
     
-    notion = Client(auth=NOTION_API_KEY)
+    notion = get_notion_client()
     
     try:
         docs = []
+        progress = ProgressLogger(logger, f"Extracting database {database_id}")
         has_more = True
         next_cursor = None
 
         while has_more:
+            check(cancel)
             response = notion.databases.query(
                 database_id=database_id,
                 start_cursor=next_cursor
@@ -41,7 +60,14 @@ def extract_notion_docs(database_id: str):
             for page in response['results']:
                 page_id = page['id']
                 properties = page['properties']
+
+                cached = cached_pages.get(page_id)
+                if cached is not None and cached.metadata.get('last_edited_time') == page.get('last_edited_time'):
+                    docs.append(cached)
+                    progress.advance()
+                    continue
                 
+                check(cancel)
                 # Extract content
                 content = extract_page_content(notion, page_id)
                 
@@ -49,6 +75,7 @@ def extract_notion_docs(database_id: str):
                 metadata = {
                     'notion_id': page_id,
                     'notion_url': page['url'],
+                    'last_edited_time': page.get('last_edited_time'),
                     'notion_properties': {}
                 }
 
@@ -65,22 +92,23 @@ def extract_notion_docs(database_id: str):
                     else:
                         metadata['notion_properties'][prop_name] = prop_value[prop_type]
 
-                logging.info(f"Processing page {page_id}")
-                logging.info(f"Metadata before processing: {metadata}")
-                
+                sampled.debug("page", f"Processed page {page_id} with {len(metadata['notion_properties'])} properties and {len(content)} chars of content")
+
                 doc = Document(page_content=content, metadata=metadata)
                 docs.append(doc)
-
-                logging.info(f"Metadata after processing: {metadata}")
+                if on_page is not None:
+                    on_page(doc)
+                progress.advance()
                 
             has_more = response['has_more']
             next_cursor = response['next_cursor']
 
-        logging.info(f"Successfully extracted {len(docs)} documents from Notion")
+        progress.finish()
+        logger.info(f"Successfully extracted {len(docs)} documents from Notion")
         return docs
 
     except Exception as e:
-        logging.error(f"An error occurred while extracting Notion docs: {e}")
+        logger.error(f"An error occurred while extracting Notion docs: {e}")
         return None
 
 def extract_page_content(notion, page_id):
@@ -105,9 +133,141 @@ def get_relation_names(notion, relation_ids):
             else:
                 names.append('Untitled')
         except Exception as e:
-            logging.error(f"Error retrieving related page {relation_id}: {e}")
+            logger.error(f"Error retrieving related page {relation_id}: {e}")
             names.append('Error')
     return names
 
-# The rest of your file remains unchanged
+
+@dataclass
+class DatabaseSyncResult:
+    database_id: str
+    title: str = ""
+    pages: int = 0
+    duration: float = 0.0
+    error: Optional[str] = None
+    cancelled: bool = False
+
+
+@dataclass
+class SyncReport:
+    results: List[DatabaseSyncResult] = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def failed(self) -> List[DatabaseSyncResult]:
+        return [result for result in self.results if result.error and not result.cancelled]
+
+    @property
+    def cancelled(self) -> List[DatabaseSyncResult]:
+        return [result for result in self.results if result.cancelled]
+
+    @property
+    def pages(self) -> int:
+        return sum(result.pages for result in self.results)
+
+    def format(self) -> str:
+        lines = [f"{'database':32s} {'pages':>6s} {'seconds':>8s}  status"]
+        for result in self.results:
+            name = (result.title or result.database_id)[:32]
+            status = "cancelled" if result.cancelled else f"failed: {result.error}" if result.error else "ok"
+            lines.append(f"{name:32s} {result.pages:6d} {result.duration:8.1f}  {status}")
+        synced = len(self.results) - len(self.failed) - len(self.cancelled)
+        lines.append(
+            f"Synced {synced}/{len(self.results)} databases"
+            + (f" ({len(self.cancelled)} cancelled)" if self.cancelled else "")
+            + f", {self.pages} pages in {self.duration:.1f}s"
+        )
+        return "\n".join(lines)
+
+
+def discover_databases(notion=None) -> List[Dict[str, str]]:
+    """Every database shared with the integration, as {"id", "title"} dicts."""
+    notion = notion or get_notion_client()
+    databases = []
+    next_cursor = None
+    while True:
+        response = notion.search(
+            filter={"property": "object", "value": "database"},
+            start_cursor=next_cursor,
+        )
+        for result in response['results']:
+            title = "".join(part.get('plain_text', '') for part in result.get('title', []))
+            databases.append({'id': result['id'], 'title': title})
+        if not response['has_more']:
+            break
+        next_cursor = response['next_cursor']
+    logger.info(f"Discovered {len(databases)} Notion databases")
+    return databases
+
+
+def sync_database(database_id: str, title: str = "", cancel: CancellationToken = None) -> DatabaseSyncResult:
+    """Extract and ingest one database; errors and cancellation are recorded on the result rather than raised."""
+    from src.database.jobs import CANCELLED
+    from src.ollama_utils.ingest import process_and_store_embeddings
+
+    result = DatabaseSyncResult(database_id=database_id, title=title)
+    start = time.perf_counter()
+    try:
+        check(cancel)
+        with span("sync.database", database_id=database_id):
+            # Extraction happens inside the checkpointed ingest job so a restart can resume it
+            job = process_and_store_embeddings(database_id, cancel=cancel)
+        result.pages = job.pages_fetched
+        result.cancelled = job.status == CANCELLED
+        # A cancelled database stopped on request; it did not fail
+        result.error = None if result.cancelled else job.error
+    except OperationCancelled:
+        result.cancelled = True
+    except Exception as e:
+        logger.error(f"Sync failed for database {database_id}: {e}")
+        result.error = str(e)
+    result.duration = time.perf_counter() - start
+    logger.info(f"Database {title or database_id}: {result.pages} pages in {result.duration:.1f}s"
+                f"{' (cancelled)' if result.cancelled else ' (failed)' if result.error else ''}")
+    return result
+
+
+def process_notion_databases(database_ids: List[str] = None, max_workers: int = None,
+                             cancel: CancellationToken = None) -> SyncReport:
+    """Sync databases concurrently; every Notion call shares the client's global rate limiter.
+
+    With no ids, uses NOTION_DATABASE_IDS or else every database the integration can see.
+    Once `cancel` is set, databases in progress stop at their next page or batch and the
+    rest are not started; each is reported as cancelled.
+    """
+    start = time.perf_counter()
+    if database_ids:
+        databases = [{'id': database_id, 'title': ''} for database_id in database_ids]
+    elif config.NOTION_DATABASE_IDS:
+        databases = [{'id': database_id, 'title': ''} for database_id in config.NOTION_DATABASE_IDS]
+    else:
+        databases = discover_databases()
+    # One collection, job and autocomplete key per database however its id was written
+    databases = [{**database, 'id': normalize_database_id(database['id'])} for database in databases]
+
+    if not databases:
+        logger.warning("No Notion databases to sync")
+        return SyncReport()
+
+    workers = max(1, min(max_workers or config.NOTION_SYNC_WORKERS, len(databases)))
+    logger.info(f"Syncing {len(databases)} databases with {workers} workers")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda database: sync_database(database['id'], database['title'], cancel), databases))
+
+    report = SyncReport(results=results, duration=time.perf_counter() - start)
+    logger.info(f"Sync finished: {len(results) - len(report.failed) - len(report.cancelled)}/{len(results)} databases"
+                f"{f' ({len(report.cancelled)} cancelled)' if report.cancelled else ''}, "
+                f"{report.pages} pages in {report.duration:.1f}s")
+    return report
+
+
+if __name__ == "__main__":
+    from src.service.client import get_service_client
+
+    configure_logging()
+    service = get_service_client()
+    if service is not None:
+        print(service.sync(sys.argv[1:])["table"])
+    else:
+        print(process_notion_databases(sys.argv[1:]).format())
 
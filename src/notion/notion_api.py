@@ -8,14 +8,14 @@ from typing import List
 from langchain_core.documents import Document
 import sys
 from pathlib import Path
-from notion_client import Client
 
 project_root = Path(__file__).parents[2]
 sys.path.append(str(project_root))
 from ollama_utils.ingest import process_and_store_embeddings
+from src.clients import get_notion_client
+from src.telemetry.logging_setup import SampledLogger, configure_logging
 
-# Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+sampled = SampledLogger(logging.getLogger(__name__))
 
 # Load environment variables
 config_path = project_root / "config" / ".env"
@@ -42,8 +42,8 @@ def extract_notion_docs(database_id: str):
         docs = loader.load()
         logging.info(f"Successfully loaded {len(docs)} documents from Notion")
 
-        # Initialize Notion client for additional API calls
-        notion = Client(auth=NOTION_API_KEY)
+        # Shared Notion client for additional API calls
+        notion = get_notion_client()
 
         for doc in docs:
             if 'properties' in doc.metadata:
@@ -66,7 +66,7 @@ def extract_notion_docs(database_id: str):
             # Add the entire properties object to the metadata
             doc.metadata['notion_properties'] = doc.metadata.get('properties', {})
 
-            logging.info(f"Document metadata after processing: {doc.metadata}")
+            sampled.debug("document", f"Processed document with metadata keys: {sorted(doc.metadata)}")
 
         return docs
     except requests.exceptions.HTTPError as e:
@@ -79,6 +79,7 @@ def extract_notion_docs(database_id: str):
 
 # Usage example:
 if __name__ == "__main__":
+    configure_logging()
     logging.info("Starting API key verification")
     
     NOTION_API_KEY = os.getenv("NOTION_API_KEY")
@@ -87,7 +88,7 @@ if __name__ == "__main__":
         sys.exit(1)
     
     try:
-        notion = Client(auth=NOTION_API_KEY)
+        notion = get_notion_client()
         # Try to list users, which requires a valid API key
         notion.users.list()
         logging.info("Notion API key is valid")
@@ -1,4 +1,15 @@
-from .ingest import process_and_store_embeddings
-from .answer import answer_question
+import importlib
 
-__all__ = ['process_and_store_embeddings', 'answer_question']
\ No newline at end of file
+# Submodules pull in langchain, chromadb and ollama, so they are loaded on first access
+_LAZY_EXPORTS = {
+    'process_and_store_embeddings': '.ingest',
+    'answer_question': '.answer',
+}
+
+__all__ = ['process_and_store_embeddings', 'answer_question']
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        module = importlib.import_module(_LAZY_EXPORTS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,23 +1,23 @@
 import sys
 from pathlib import Path
 import random
-import ollama_utils
 from chromadb.api.models.Collection import Collection
-from src.database.database import get_collection
 
 project_root = Path(__file__).parents[2]
 sys.path.append(str(project_root))
 
+from src.database.database import get_chroma_client
+from src.clients import get_ollama_client
+from src.service.client import get_service_client
+
 def get_random_embedding(collection: Collection):
-    # Get all embeddings from the collection
-    all_embeddings = collection.get()
-    
-    # Choose a random embedding
-    random_index = random.randint(0, len(all_embeddings['embeddings']) - 1)
-    return all_embeddings['embeddings'][random_index], all_embeddings['documents'][random_index]
+    # Fetch only the randomly chosen record rather than the whole collection
+    random_index = random.randint(0, collection.count() - 1)
+    record = collection.get(limit=1, offset=random_index, include=['embeddings', 'documents'])
+    return record['embeddings'][0], record['documents'][0]
 
 def explain_embedding(embedding: list, document: str):
-    client = ollama_utils.Client()
+    client = get_ollama_client()
     prompt = f"""
     Given the following embedding vector and the corresponding document text, 
     please explain in natural language what this embedding might represent:
@@ -33,8 +33,9 @@ def explain_embedding(embedding: list, document: str):
 
 def main():
     # Assuming we're using the 'notion_8d5dc8537d04457fa92a543a83ac397b' collection
-    collection_name = "8d5dc8537d04457fa92a543a83ac397b"
-    collection = get_collection(collection_name)
+    collection_name = "notion_8d5dc8537d04457fa92a543a83ac397b"
+    # Read through the service when it runs, so this never opens Chroma beside its writer
+    collection = (get_service_client() or get_chroma_client()).get_collection(collection_name)
     
     embedding, document = get_random_embedding(collection)
     explanation = explain_embedding(embedding, document)
@@ -7,8 +7,11 @@ import sys
 project_root = Path(__file__).parents[2]
 sys.path.append(str(project_root))
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+from src import config
+from src.database.export import iter_collection
+from src.service.client import get_service_client
+from src.telemetry.logging_setup import configure_logging
+
 logger = logging.getLogger(__name__)
 
 chroma_client = None
@@ -16,14 +19,14 @@ chroma_client = None
 def get_chroma_client():
     global chroma_client
     if chroma_client is None:
-        persist_directory = str(project_root / "chroma_db")
+        persist_directory = str(config.CHROMA_PERSIST_DIRECTORY)
         chroma_client = chromadb.PersistentClient(path=persist_directory)
     return chroma_client
 
 def list_chroma_collections():
     try:
-        # Initialize Chroma client
-        client = get_chroma_client()
+        # Read through the service when it runs, so this never opens Chroma beside its writer
+        client = get_service_client() or get_chroma_client()
         
         # Get all collection names
         collections = client.list_collections()
@@ -41,6 +44,7 @@ def list_chroma_collections():
         return []
 
 if __name__ == "__main__":
+    configure_logging()
     collections = list_chroma_collections()
     
     if not collections:
@@ -53,24 +57,26 @@ if __name__ == "__main__":
         for collection in collections:
             logger.info(f"Dumping documents from collection: {collection.name}")
             
-            # Get all documents in the collection
-            documents = collection.get(include=["documents", "metadatas"])
-            
-            # Sort documents by name if available, otherwise by ID
-            sorted_docs = sorted(
-                zip(documents["ids"], documents["documents"], documents["metadatas"]),
-                key=lambda x: x[2].get("name", x[0])  # Sort by name if available, otherwise by ID
-            )
+            # Sort keys only (name if available, otherwise ID); documents are fetched a page at a time below
+            sort_keys = []
+            for page in iter_collection(collection, include=["metadatas"]):
+                for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+                    sort_keys.append(((metadata or {}).get("name", doc_id), doc_id))
+            sorted_ids = [doc_id for _, doc_id in sorted(sort_keys)]
             
             f.write(f"Collection: {collection.name}\n")
             f.write("=" * 50 + "\n\n")
             
-            for doc_id, content, metadata in sorted_docs:
-                f.write(f"Document ID: {doc_id}\n")
-                f.write(f"Metadata: {metadata}\n")
-                f.write("Content:\n")
-                f.write(content + "\n")
-                f.write("-" * 50 + "\n\n")
+            for start in range(0, len(sorted_ids), 500):
+                page = collection.get(ids=sorted_ids[start:start + 500], include=["documents", "metadatas"])
+                records = dict(zip(page["ids"], zip(page["documents"], page["metadatas"])))
+                for doc_id in sorted_ids[start:start + 500]:
+                    content, metadata = records[doc_id]
+                    f.write(f"Document ID: {doc_id}\n")
+                    f.write(f"Metadata: {metadata}\n")
+                    f.write("Content:\n")
+                    f.write(content + "\n")
+                    f.write("-" * 50 + "\n\n")
             
             f.write("\n\n")
     
@@ -1,34 +1,57 @@
-import chromadb
-from chromadb.config import Settings
-import ollama
-from typing import List, Dict
+from typing import List, Dict, Optional, Sequence
 import logging
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_chroma import Chroma
-from langchain.chains import RetrievalQA
-from langchain_community.llms import Ollama
-from langchain.retrievers import EnsembleRetriever, ContextualCompressionRetriever
-from langchain.retrievers.document_compressors import LLMChainExtractor
 import json
 from pathlib import Path
 import sys
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 project_root = Path(__file__).parents[2]
 sys.path.append(str(project_root))
 
+from src import config
+from src.cancellation import CancellationToken, check
+from src.clients import get_ollama_client
+from src.database import database
+from src.notion import normalize_database_id
+from src.ollama_utils.deadline import Deadline, DeadlineExceeded
+from src.ollama_utils.retrieval import (
+    FOLLOW_UP_PROMPT_TEMPLATE,
+    AnswerResult,
+    RetrievedChunk,
+    build_prompt,
+    embed_query,
+    expand_related,
+    generate,
+    generate_streaming,
+    page_list,
+    prefer_summaries,
+    search_collections,
+    select_chunks,
+)
+from src.ollama_utils.rerank import get_reranker, rerank
+from src.ollama_utils.sessions import conversation_sessions
+from src.telemetry.metrics import degradations
+from src.telemetry.tracing import span, tokens_per_second
+from src.telemetry.logging_setup import configure_logging, redact
+
+# MMR picks RETRIEVAL_K chunks per collection out of the RETRIEVAL_FETCH_K nearest
+RETRIEVAL_K = config.RETRIEVAL_K
+RETRIEVAL_FETCH_K = config.RETRIEVAL_FETCH_K
+
+NO_INFORMATION_ANSWER = "Sorry, I couldn't find any relevant information to answer that question."
+TIMEOUT_ANSWER = "Sorry, I couldn't answer that in time. Please try again in a moment."
+RETRIEVAL_ONLY_INTRO = "I couldn't write an answer in time, but these notes look relevant:"
+PARTIAL_ANSWER_SUFFIX = "\n\n*(Answer cut short to reply in time.)*"
+
 # Global variable for Chroma client
 chroma_client = None
 
 def get_chroma_client():
     global chroma_client
     if chroma_client is None:
-        persist_directory = str(project_root / "chroma_db")
-        chroma_client = chromadb.PersistentClient(path=persist_directory)
+        # Share the ingest path's client so answering and syncing see the same collections
+        chroma_client = database.get_chroma_client()
     return chroma_client
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -51,104 +74,164 @@ def query_all_collections(query: str, n_results: int = 5) -> List[Dict]:
 
 def generate_ollama_response(context: str, question: str) -> str:
     prompt = f"Context: {context}\n\nQuestion: {question}\n\nAnswer:"
-    client = ollama.Client()
+    client = get_ollama_client()
     response = client.generate(model='mistral-nemo', prompt=prompt)
     return response['response']
 
-def answer_question(question: str, database_ids: List[str] = None) -> str:
-    try:
-        # Initialize Ollama embeddings
-        embeddings = OllamaEmbeddings(model="mistral-nemo")
-        
-        # Test embedding generation
-        test_embedding = embeddings.embed_query("Test query")
-        logger.info(f"Test embedding generated. Length: {len(test_embedding)}")
-        
+def retrieval_only_answer(chunks: Sequence[RetrievedChunk]) -> str:
+    """The best matching Notion pages, for when there is no time left to generate."""
+    lines = page_list(chunks)
+    if not lines:
+        return TIMEOUT_ANSWER
+    return "\n".join([RETRIEVAL_ONLY_INTRO, *lines])
+
+def degraded_result(reason: str, answer: str, timings: Dict[str, float],
+                    chunks: Sequence[RetrievedChunk] = ()) -> AnswerResult:
+    degradations.increment(reason)
+    logger.warning(f"Answer degraded ({reason}) after {sum(timings.values()):.2f}s of stages")
+    return AnswerResult(answer, chunks=list(chunks), timings=timings, degraded=reason)
+
+def scoped_collections(collection_names: Sequence[str], database_ids: Optional[Sequence[str]]) -> List[str]:
+    """The notion_<database id> collections of the given databases; every collection when None.
+
+    Ids are compared normalized, so collections created under a hyphenated id still match.
+    """
+    if database_ids is None:
+        return list(collection_names)
+    wanted = {normalize_database_id(database_id) for database_id in database_ids}
+    return [
+        name for name in collection_names
+        if name.startswith("notion_") and normalize_database_id(name[len("notion_"):]) in wanted
+    ]
+
+def answer_question_with_details(question: str, database_ids: List[str] = None,
+                                 deadline: Optional[float] = None, session: Optional[str] = None,
+                                 cancel: CancellationToken = None) -> AnswerResult:
+    """Answer a question and return the retrieved chunks and per-stage timings.
+
+    Only the collections of `database_ids` are searched (all of them when None), and their
+    query embeddings are cached in a partition of their own. Unlike answer_question, errors
+    are raised rather than turned into an apology. With a `deadline` in seconds, embedding
+    and search are bounded by their own timeouts and by what is left of it, and generation
+    streams until the deadline: a late answer is cut short, or replaced by links to the
+    best matching pages, and counted in the degradations.
+
+    A `session` key (one per Discord channel) makes the question part of a conversation:
+    a follow-up is embedded together with the earlier questions, and only the chunks not
+    already sent are put in its prompt, which continues from the previous answer's Ollama
+    context instead of being processed from scratch.
+
+    `cancel` is checked between stages and while generation streams; OperationCancelled
+    is raised rather than an answer returned.
+    """
+    timings = {}
+    budget = Deadline(deadline)
+    conversation = conversation_sessions.get(session) if session and config.SESSIONS_ENABLED else None
+    with span("ask", timings, question_chars=len(question), follow_up=conversation is not None) as current:
         # Use the global Chroma client
         client = get_chroma_client()
-        
-        # Initialize Ollama LLM
-        llm = Ollama(model="mistral-nemo")
-        
-        # Get all collection names
-        collection_names = client.list_collections()
-        
+
+        # Get the names of the collections this question may see
+        collection_names = scoped_collections(
+            [collection.name for collection in client.list_collections()], database_ids
+        )
+        partition = None if database_ids is None else tuple(sorted(database_ids))
+
         if not collection_names:
             logger.warning("No collections found. Returning default message.")
-            return "Sorry, I couldn't find any relevant information to answer that question."
-        
-        # Create a list to store retrievers for each collection
-        retrievers = []
-        
-        for collection_name in collection_names:
+            return AnswerResult(NO_INFORMATION_ANSWER, timings=timings)
+
+        try:
+            retrieval_text = question if conversation is None else conversation.retrieval_text(question)
+            query_embedding = budget.run("embed", embed_query, retrieval_text, timings=timings, partition=partition,
+                                         cap=config.ASK_EMBED_TIMEOUT)
+            candidates = budget.run("search", search_collections, client, query_embedding, collection_names,
+                                    RETRIEVAL_FETCH_K, timings=timings, cap=config.ASK_SEARCH_TIMEOUT)
+        except DeadlineExceeded as e:
+            current.set_attribute("ask.degraded", f"{e.stage}.timeout")
+            return degraded_result(f"{e.stage}.timeout", TIMEOUT_ANSWER, timings)
+        check(cancel)
+        candidates = prefer_summaries(candidates)
+        reranker = get_reranker()
+        retrieved_docs = select_chunks(
+            query_embedding, candidates, config.RERANK_CANDIDATES if reranker else RETRIEVAL_K,
+            config.RETRIEVAL_LAMBDA, timings=timings, search_type=config.RETRIEVAL_SEARCH_TYPE,
+        )
+        if reranker is not None and retrieved_docs:
             try:
-                collection = client.get_collection(name=collection_name.name)
-                doc_count = collection.count()
-                logger.info(f"Collection '{collection_name.name}' exists with {doc_count} documents")
-                
-                if doc_count > 0:
-                    vectorstore = Chroma(
-                        client=client,
-                        collection_name=collection_name.name,
-                        embedding_function=embeddings
-                    )
-                    retriever = vectorstore.as_retriever(
-                        search_type="mmr",
-                        search_kwargs={"k": 4, "fetch_k": 40}
-                    )
-                    retrievers.append(retriever)
-            except ValueError:
-                logger.error(f"Error accessing collection '{collection_name.name}'.")
-        
-        if not retrievers:
-            logger.warning("No valid collections found. Returning default message.")
-            return "Sorry, I couldn't find any relevant information to answer that question."
-        
-        # Create an EnsembleRetriever with all the individual retrievers
-        ensemble_retriever = EnsembleRetriever(retrievers=retrievers, weights=[1]*len(retrievers))
-        
-        # Retrieve documents using the ensemble retriever
-        retrieved_docs = ensemble_retriever.get_relevant_documents(question)
+                retrieved_docs = budget.run("rerank", rerank, question, retrieved_docs, config.RERANK_TOP_N, reranker,
+                                            timings=timings, cap=config.ASK_RERANK_TIMEOUT)
+            except DeadlineExceeded:
+                # Fall back to the retrieval order, trimmed to what re-ranking would have kept
+                degradations.increment("rerank.timeout")
+                retrieved_docs = retrieved_docs[:config.RERANK_TOP_N]
+        if config.RELATION_EXPANSION and retrieved_docs:
+            try:
+                retrieved_docs += budget.run("expand", expand_related, client, query_embedding, retrieved_docs,
+                                             config.RELATION_EXPANSION_K, timings=timings, cap=config.ASK_SEARCH_TIMEOUT)
+            except DeadlineExceeded:
+                # Related chunks are a bonus; answer from the selected ones
+                degradations.increment("expand.timeout")
         logger.info(f"Number of retrieved documents: {len(retrieved_docs)}")
+        check(cancel)
 
         # Log retrieved documents
-        for i, doc in enumerate(retrieved_docs):
-            logger.info(f"Retrieved document {i+1} content: {doc.page_content[:100]}...")  # Log first 100 chars
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, doc in enumerate(retrieved_docs):
+                logger.debug(f"Retrieved document {i+1} ({doc.id}): {redact(doc.document[:100])}")
 
-        if not retrieved_docs:
+        if not retrieved_docs and conversation is None:
             logger.warning("No documents retrieved. Returning default message.")
-            return "Sorry, I couldn't find any relevant information to answer that question."
-
-        # Use stuff chain type for processing
-        qa_chain = RetrievalQA.from_chain_type(
-            llm=llm,
-            chain_type="stuff",
-            retriever=ensemble_retriever,
-            return_source_documents=True
-        )
+            return AnswerResult(NO_INFORMATION_ANSWER, timings=timings)
+
+        if conversation is None:
+            # Stuff as much retrieved context as fits into a single prompt
+            prompt, sent_ids = build_prompt(question, retrieved_docs, timings=timings)
+            context = None
+        else:
+            # The earlier chunks are already in the conversation's context
+            new_docs = [doc for doc in retrieved_docs if doc.id not in conversation.chunk_ids]
+            current.set_attribute("ask.new_chunks", len(new_docs))
+            prompt, sent_ids = build_prompt(question, new_docs, timings=timings, template=FOLLOW_UP_PROMPT_TEMPLATE)
+            context = list(conversation.context)
+        if budget.expires_at is None and cancel is None:
+            response = generate(prompt, timings=timings, context=context)
+        else:
+            reason = None
+            try:
+                response, finished = generate_streaming(prompt, budget, timings=timings, context=context, cancel=cancel)
+            except Exception as e:
+                logger.error(f"Generation failed, answering from retrieval only: {e}")
+                response, finished, reason = {"response": ""}, False, "generate.error"
+            if not finished:
+                partial = response["response"].strip()
+                if reason is None and len(partial) >= config.ASK_MIN_PARTIAL_CHARS:
+                    reason, answer = "generate.partial", partial + PARTIAL_ANSWER_SUFFIX
+                else:
+                    reason, answer = reason or "generate.retrieval_only", retrieval_only_answer(retrieved_docs)
+                current.set_attribute("ask.degraded", reason)
+                return degraded_result(reason, answer, timings, retrieved_docs)
 
-        # Generate answer with as much context as possible
-        max_context_length = 3500
-        context = ""
-        for doc in retrieved_docs:
-            if len(context) + len(doc.page_content) <= max_context_length:
-                context += doc.page_content + "\n\n"
-            else:
-                break
-
-        result = qa_chain.invoke({
-            "query": question,
-            "context": context
-        })
-
-        # Log the full prompt sent to the LLM
-        logger.info(f"Full prompt sent to LLM: {result['source_documents']}")
-        
         # Log the raw LLM output
-        logger.info(f"Raw LLM output: {result['result']}")
-        
-        return result["result"]
+        logger.debug(f"Raw LLM output: {redact(response['response'])}")
+
+        if session and config.SESSIONS_ENABLED:
+            # Only the chunks that fit into the prompt are in the context; the rest can be sent next turn
+            conversation_sessions.record(session, question, sent_ids, response.get("context"), previous=conversation)
 
+    return AnswerResult(
+        answer=response["response"],
+        chunks=retrieved_docs,
+        timings=timings,
+        tokens_per_second=tokens_per_second(response),
+        follow_up=conversation is not None,
+    )
+
+def answer_question(question: str, database_ids: List[str] = None, session: Optional[str] = None,
+                    cancel: CancellationToken = None) -> str:
+    try:
+        return answer_question_with_details(question, database_ids, deadline=config.ASK_DEADLINE, session=session,
+                                            cancel=cancel).answer
     except Exception as e:
         logger.error(f"Error occurred while answering question: {str(e)}")
         return "Sorry, I couldn't find an answer to that question."
@@ -173,6 +256,7 @@ def extract_metadata(text):
 
 # Example usage:
 if __name__ == "__main__":
+    configure_logging()
     database_ids = ["a7c454796df647eaa901d324c74cca67", "8d5dc8537d04457fa92a543a83ac397b"]
     
     
@@ -0,0 +1,159 @@
+"""In-memory prefix index of page titles and NPC names for `/ask` autocomplete.
+
+Discord gives autocomplete 3 seconds, so lookups only bisect a sorted array held in
+memory and never touch Ollama, Chroma or Notion. Each sync replaces the names of the
+database it fetched and saves the index, so a restarted bot can load it without syncing.
+"""
+import bisect
+import json
+import logging
+import re
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+MAX_CHOICES = 25  # Discord's limit for autocomplete choices
+MAX_CHOICE_LENGTH = 100  # and for each choice's name and value
+# How many trailing words of the question are tried as the fragment being typed
+MAX_FRAGMENT_WORDS = 3
+# Distinct names read per lookup; bounds the cost of a one-letter prefix
+MAX_SCAN = 200
+
+
+def normalize(text: str) -> str:
+    """Casefolded, accent-free, punctuation-free form used for matching."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r"[^\w]+", " ", text.casefold()).strip()
+
+
+def _keys(name: str) -> List[Tuple[str, str, int]]:
+    """A name is found by a prefix of any of its words: "Lord Varis" by "lo" and by "va".
+
+    Entries are (key, name, word position); position 0 is a match from the start of the name.
+    """
+    words = normalize(name).split()
+    return [(" ".join(words[i:]), name, i) for i in range(len(words))]
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names: Dict[str, Set[str]] = {}
+        # Sorted entries from _keys, replaced as a whole so readers never need the lock
+        self._entries: List[Tuple[str, str, int]] = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def update(self, database_id: str, names: Iterable[str]):
+        """Replace one database's names, inserting and removing only what changed."""
+        names = {name.strip() for name in names if name and name.strip()}
+        with self._lock:
+            previous = self._names.get(database_id, set())
+            others = set().union(*(held for other, held in self._names.items() if other != database_id))
+            added = sorted(entry for name in names - previous - others for entry in _keys(name))
+            removed = {entry for name in previous - names - others for entry in _keys(name)}
+            if not added and not removed:
+                self._names[database_id] = names
+                return
+            entries = [entry for entry in self._entries if entry not in removed] if removed else list(self._entries)
+            for entry in added:
+                position = bisect.bisect_left(entries, entry)
+                if position == len(entries) or entries[position] != entry:
+                    entries.insert(position, entry)
+            self._names[database_id] = names
+            self._entries = entries
+        logger.info(f"Autocomplete index for {database_id}: {len(names)} names "
+                    f"(+{len(added)} / -{len(removed)} keys)")
+
+    def lookup(self, prefix: str, limit: int = MAX_CHOICES, databases: Optional[Sequence[str]] = None) -> List[str]:
+        """Names with a word starting with `prefix`, whole-name matches first.
+
+        With `databases`, only names from those databases are returned.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        entries = self._entries
+        allowed = None if databases is None else [self._names.get(database_id, set()) for database_id in databases]
+        matches = {}
+        for i in range(bisect.bisect_left(entries, (prefix,)), len(entries)):
+            key, name, position = entries[i]
+            if not key.startswith(prefix):
+                break
+            if allowed is not None and not any(name in names for names in allowed):
+                continue
+            matches[name] = min(position, matches.get(name, position))
+            if len(matches) >= MAX_SCAN:
+                break
+        ranked = sorted(matches, key=lambda name: (matches[name] > 0, len(name), name))
+        return ranked[:limit]
+
+    def suggest(self, question: str, limit: int = MAX_CHOICES, databases: Optional[Sequence[str]] = None) -> List[str]:
+        """Completions of the question with its trailing words replaced by a known name."""
+        words = question.split()
+        if not words or question[-1:].isspace():
+            return []
+        suggestions = []
+        # Longest fragment first, so "Lord Va" completes the full name before "Va" alone
+        for size in range(min(MAX_FRAGMENT_WORDS, len(words)), 0, -1):
+            head = " ".join(words[:-size])
+            for name in self.lookup(" ".join(words[-size:]), limit, databases):
+                suggestion = f"{head} {name}" if head else name
+                if suggestion not in suggestions and len(suggestion) <= MAX_CHOICE_LENGTH:
+                    suggestions.append(suggestion)
+            if len(suggestions) >= limit:
+                break
+        return suggestions[:limit]
+
+    def save(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            payload = {database_id: sorted(names) for database_id, names in self._names.items()}
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(payload))
+        tmp.replace(path)
+
+    def load(self, path: Path) -> bool:
+        path = Path(path)
+        if not path.exists():
+            return False
+        for database_id, names in json.loads(path.read_text()).items():
+            self.update(database_id, names)
+        return True
+
+
+title_index = PrefixIndex()
+
+
+def names_from_docs(docs) -> Set[str]:
+    """Page titles and `About NPC` names of fetched Notion documents."""
+    names = set()
+    for doc in docs:
+        names.add(doc.metadata.get("title") or "")
+        names.update(doc.metadata.get("notion_properties", {}).get("About NPC", []) or [])
+    return names
+
+
+def update_from_sync(database_id: str, docs):
+    title_index.update(database_id, names_from_docs(docs))
+    try:
+        title_index.save(config.AUTOCOMPLETE_INDEX_FILE)
+    except OSError as e:
+        logger.error(f"Failed to save autocomplete index: {e}")
+
+
+def load_title_index() -> int:
+    """Load the index saved by the last sync; returns the number of keys."""
+    try:
+        title_index.load(config.AUTOCOMPLETE_INDEX_FILE)
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to load autocomplete index: {e}")
+    return len(title_index)
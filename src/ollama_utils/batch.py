@@ -0,0 +1,135 @@
+"""Answer a file of questions through the retrieval + generation pipeline.
+
+Usage:
+    python -m src.ollama_utils.batch questions.jsonl -o answers.jsonl --concurrency 4
+
+Each input line is either a JSON object with a "question" key (plus optional "id" and
+"database_ids") or a bare JSON string. Each output line holds the answer, the retrieved
+chunk ids and per-stage timings in seconds. With NOTEKEEPER_SERVICE_URL set the questions
+are answered by the local service instead of in this process.
+"""
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+project_root = Path(__file__).parents[2]
+sys.path.append(str(project_root))
+
+from src.ollama_utils.answer import answer_question_with_details, get_chroma_client
+from src.ollama_utils.rerank import score_cache
+from src.ollama_utils.retrieval import query_embedding_cache
+from src.service.client import get_service_client
+from src.telemetry.logging_setup import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+def read_questions(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"question": item}
+            item.setdefault("id", line_number)
+            yield item
+
+
+def answer_remote(service, item: Dict[str, Any]) -> Dict[str, Any]:
+    # Same unbounded answering as in-process: a batch has no live user waiting
+    result = service.ask(item["question"], item.get("database_ids"), deadline=0)
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    return dict(
+        answer=result["answer"],
+        retrieved_ids=[chunk["id"] for chunk in result["chunks"]],
+        timings=result["timings"],
+        tokens_per_second=result["tokens_per_second"],
+    )
+
+
+def answer_one(item: Dict[str, Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    record = {"id": item["id"], "question": item["question"]}
+    try:
+        service = get_service_client()
+        if service is not None:
+            record.update(answer_remote(service, item))
+        else:
+            result = answer_question_with_details(item["question"], item.get("database_ids"))
+            record.update(
+                answer=result.answer,
+                retrieved_ids=result.chunk_ids,
+                timings=result.timings,
+                tokens_per_second=result.tokens_per_second,
+            )
+    except Exception as e:
+        logger.error(f"Question {item['id']} failed: {e}")
+        record["error"] = str(e)
+    record["elapsed"] = time.perf_counter() - start
+    return record
+
+
+def run_batch(questions: List[Dict[str, Any]], output, concurrency: int = 4) -> Dict[str, Any]:
+    """Answer questions concurrently, writing one JSON line per answer as it completes."""
+    # Open the shared Chroma client once before the workers race to create it
+    if get_service_client() is None:
+        get_chroma_client()
+    write_lock = threading.Lock()
+    failures = 0
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [pool.submit(answer_one, item) for item in questions]
+        for future in as_completed(futures):
+            record = future.result()
+            failures += "error" in record
+            with write_lock:
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "questions": len(questions),
+        "failures": failures,
+        "elapsed": elapsed,
+        "questions_per_minute": len(questions) / elapsed * 60 if elapsed else 0.0,
+        "embedding_cache": query_embedding_cache.stats(),
+        "rerank_cache": score_cache.stats(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", type=Path, help="JSONL file of questions")
+    parser.add_argument("-o", "--output", type=Path, help="JSONL answers file (default: stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Questions answered in parallel")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    questions = list(read_questions(args.questions))
+    logger.info(f"Answering {len(questions)} questions with concurrency {args.concurrency}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            summary = run_batch(questions, output, args.concurrency)
+    else:
+        summary = run_batch(questions, sys.stdout, args.concurrency)
+
+    logger.info(
+        f"Answered {summary['questions']} questions ({summary['failures']} failed) in {summary['elapsed']:.1f}s, "
+        f"{summary['questions_per_minute']:.1f} questions/minute"
+    )
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,29 @@
 import chromadb
-from chromadb.config import Settings
-import ollama_utils
 from typing import List, Dict
 import logging
-from langchain_community.embeddings import OllamaEmbeddings
 from langchain_chroma import Chroma
 from langchain.chains import RetrievalQA
-from langchain_community.llms import Ollama
-from langchain.retrievers import EnsembleRetriever, ContextualCompressionRetriever
-from langchain.retrievers.document_compressors import LLMChainExtractor
 import json
 from pathlib import Path
 import sys
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 project_root = Path(__file__).parents[2]
 sys.path.append(str(project_root))
 
+from src import config
+from src.clients import get_ollama_client, get_embeddings, get_llm
+from src.telemetry.logging_setup import configure_logging, redact
+
 # Global variable for Chroma client
 chroma_client = None
 
 def get_chroma_client():
     global chroma_client
     if chroma_client is None:
-        persist_directory = str(project_root / "chroma_db")
+        persist_directory = str(config.CHROMA_PERSIST_DIRECTORY)
         chroma_client = chromadb.PersistentClient(path=persist_directory)
     return chroma_client
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -51,24 +46,20 @@ def query_all_collections(query: str, n_results: int = 5) -> List[Dict]:
 
 def generate_ollama_response(context: str, question: str) -> str:
     prompt = f"Context: {context}\n\nQuestion: {question}\n\nAnswer:"
-    client = ollama_utils.Client()
+    client = get_ollama_client()
     response = client.generate(model='mistral-nemo', prompt=prompt)
     return response['response']
 
 def answer_question(question: str, database_ids: List[str]) -> str:
     try:
-        # Initialize Ollama embeddings
-        embeddings = OllamaEmbeddings(model="mistral-nemo")
-        
-        # Test embedding generation
-        test_embedding = embeddings.embed_query("Test query")
-        logger.info(f"Test embedding generated. Length: {len(test_embedding)}")
+        # Shared Ollama embeddings backed by the pooled client
+        embeddings = get_embeddings("mistral-nemo")
         
         # Use the global Chroma client
         client = get_chroma_client()
         
-        # Initialize Ollama LLM
-        llm = Ollama(model="mistral-nemo")
+        # Shared Ollama LLM backed by the pooled client
+        llm = get_llm("mistral-nemo")
         
         # Use only the specified collection
         collection_name = "notion_8d5dc8537d04457fa92a543a83ac397b"
@@ -100,8 +91,9 @@ def answer_question(question: str, database_ids: List[str]) -> str:
         logger.info(f"Number of retrieved documents: {len(retrieved_docs)}")
 
         # Log retrieved documents
-        for i, doc in enumerate(retrieved_docs):
-            logger.info(f"Retrieved document {i+1} content: {doc.page_content[:100]}...")  # Log first 100 chars
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, doc in enumerate(retrieved_docs):
+                logger.debug(f"Retrieved document {i+1} content: {redact(doc.page_content[:100])}")
 
         if not retrieved_docs:
             logger.warning("No documents retrieved. Returning default message.")
@@ -129,11 +121,9 @@ def answer_question(question: str, database_ids: List[str]) -> str:
             "context": context
         })
 
-        # Log the full prompt sent to the LLM
-        logger.info(f"Full prompt sent to LLM: {result['source_documents']}")
-        
-        # Log the raw LLM output
-        logger.info(f"Raw LLM output: {result['result']}")
+        # Log the sources and raw LLM output
+        logger.debug(f"Source documents sent to LLM: {len(result['source_documents'])}")
+        logger.debug(f"Raw LLM output: {redact(result['result'])}")
         
         return result["result"]
 
@@ -161,6 +151,7 @@ def extract_metadata(text):
 
 # Example usage:
 if __name__ == "__main__":
+    configure_logging()
     database_ids = ["a7c454796df647eaa901d324c74cca67", "8d5dc8537d04457fa92a543a83ac397b"]
     
     # Check if collections exist
@@ -3,13 +3,14 @@ from pathlib import Path
 import sys
 from typing import List, Dict, Any, Tuple
 from langchain_core.documents import Document
-import ollama_utils
 import logging
 
 project_root = Path(__file__).parents[2]
 sys.path.append(str(project_root))
 
 from src.database.database import store_embeddings, get_existing_ids
+from src.clients import get_ollama_client
+from src.telemetry.logging_setup import ProgressLogger, SampledLogger, configure_logging, redact
 
 
 # Remove the following functions:
@@ -25,25 +26,30 @@ def load_docs_from_cache(database_id: str) -> List[Document]:
             return pickle.load(f)
     return []
 
-logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+sampled = SampledLogger(logger)
 
 def create_embeddings(docs: List[Document]) -> Tuple[List[List[float]], List[int]]:
-    client = ollama_utils.Client()
+    client = get_ollama_client()
     embeddings = []
     valid_indices = []
+    progress = ProgressLogger(logger, "Creating embeddings", total=len(docs))
     for i, doc in enumerate(docs):
         try:
-            logging.info(f"Attempting to create embedding for document {i} with content: {doc.page_content[:100]}...")
+            sampled.debug("embed", f"Creating embedding for document {i} with content: {redact(doc.page_content[:100])}")
             response = client.embeddings(model='mistral-nemo', prompt=doc.page_content)
             embedding = response['embedding']
             if embedding:
                 embeddings.append(embedding)
                 valid_indices.append(i)
-                logging.info(f"Successfully created embedding for document {i}")
+                progress.advance()
             else:
-                logging.warning(f"Empty embedding received for document {i}. Skipping this document.")
+                sampled.warning("empty", f"Empty embedding received for document {i}. Skipping this document.")
+                progress.advance(failed=1)
         except Exception as e:
-            logging.error(f"Error creating embedding for document {i}: {str(e)}")
+            sampled.error("embed_error", f"Error creating embedding for document {i}: {str(e)}")
+            progress.advance(failed=1)
+    progress.finish()
     
     if not embeddings:
         raise ValueError("No valid embeddings were created")
@@ -64,7 +70,7 @@ def ensure_valid_metadata(docs: List[Document]) -> List[Document]:
         if 'name' in doc.metadata:
             doc.page_content = doc.metadata['name']
         else:
-            logging.warning(f"Document {i} has no 'name' in metadata. Content remains unchanged.")
+            sampled.warning("no_name", f"Document {i} has no 'name' in metadata. Content remains unchanged.")
 
         
         valid_docs.append(doc)
@@ -104,6 +110,7 @@ def process_and_store_embeddings(database_id: str, docs: List[Document] = None):
 
 # Example usage:
 if __name__ == "__main__":
+    configure_logging()
     process_and_store_embeddings("8d5dc8537d04457fa92a543a83ac397b")
     process_and_store_embeddings("a7c454796df647eaa901d324c74cca67")
 
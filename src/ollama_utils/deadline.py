@@ -0,0 +1,53 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Optional
+
+from src import config
+
+# Stages run here so the caller can stop waiting at the deadline; a call that overruns
+# keeps its worker until Ollama or Chroma returns, and its result is discarded
+stage_pool = ThreadPoolExecutor(max_workers=max(1, config.ASK_STAGE_WORKERS), thread_name_prefix="ask-stage")
+
+
+class DeadlineExceeded(TimeoutError):
+    def __init__(self, stage: str):
+        super().__init__(f"{stage} did not finish before the deadline")
+        self.stage = stage
+
+
+class Deadline:
+    """Wall-clock budget shared by the stages of one request; `seconds=None` or 0 means no limit."""
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.expires_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def timeout(self, cap: Optional[float] = None) -> Optional[float]:
+        """Seconds a stage may take: what is left, but no more than its own cap. None without a deadline."""
+        remaining = self.remaining()
+        if remaining is None or not cap:
+            return remaining
+        return min(cap, remaining)
+
+    def run(self, stage: str, fn: Callable[..., Any], *args, cap: Optional[float] = None, **kwargs) -> Any:
+        """Call fn, raising DeadlineExceeded if it has not returned within timeout(cap)."""
+        timeout = self.timeout(cap)
+        if timeout is None:
+            return fn(*args, **kwargs)
+        if timeout <= 0:
+            raise DeadlineExceeded(stage)
+        # Copy the context so the stage's span stays a child of the request's span
+        future = stage_pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise DeadlineExceeded(stage) from None
@@ -0,0 +1,188 @@
+import json
+import logging
+import re
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+# Mersenne prime for the MinHash permutations; hashes are reduced below it so products fit in 64 bits
+_PRIME = (1 << 31) - 1
+SHINGLE_CHARS = 5
+# Chroma's default HNSW M; each stored vector keeps about 2 * M neighbour links of 4 bytes
+HNSW_M = 16
+
+
+@dataclass
+class DedupReport:
+    chunks: int = 0
+    candidate_pairs: int = 0
+    removed: int = 0
+    # Candidates whose embedding was already in Chroma for the same text
+    reused: int = 0
+    bytes_saved: int = 0
+    clusters: List[List[str]] = field(default_factory=list)
+
+
+def shingles(text: str, size: int = SHINGLE_CHARS) -> Set[int]:
+    normalized = re.sub(r"\s+", " ", text.lower()).strip()
+    if len(normalized) <= size:
+        return {zlib.crc32(normalized.encode("utf-8"))}
+    return {zlib.crc32(normalized[i:i + size].encode("utf-8")) for i in range(len(normalized) - size + 1)}
+
+
+def minhash_signatures(texts: Sequence[str], num_perm: int = None, seed: int = 1) -> np.ndarray:
+    """(len(texts), num_perm) MinHash signatures over character shingles."""
+    num_perm = num_perm or config.DEDUP_NUM_PERM
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, size=num_perm, dtype=np.int64)
+    b = rng.integers(0, _PRIME, size=num_perm, dtype=np.int64)
+    signatures = np.empty((len(texts), num_perm), dtype=np.int64)
+    for row, text in enumerate(texts):
+        hashes = np.fromiter(shingles(text), dtype=np.int64) % _PRIME
+        signatures[row] = ((np.outer(hashes, a) + b) % _PRIME).min(axis=0)
+    return signatures
+
+
+def candidate_pairs(signatures: np.ndarray, bands: int = None) -> Set[Tuple[int, int]]:
+    """Pairs that share at least one LSH band of their signatures."""
+    bands = bands or config.DEDUP_BANDS
+    rows = signatures.shape[1] // bands
+    pairs = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        for index, key in enumerate(map(bytes, signatures[:, band * rows:(band + 1) * rows])):
+            buckets[key].append(index)
+        for members in buckets.values():
+            for i, first in enumerate(members):
+                for second in members[i + 1:]:
+                    pairs.add((first, second))
+    return pairs
+
+
+def _clusters(count: int, edges: Sequence[Tuple[int, int]]) -> List[List[int]]:
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for first, second in edges:
+        parent[find(first)] = find(second)
+    groups = defaultdict(list)
+    for i in range(count):
+        groups[find(i)].append(i)
+    return [sorted(members) for members in groups.values() if len(members) > 1]
+
+
+def merge_provenance(keep: Document, duplicates: Sequence[Document], duplicate_ids: Sequence[str]) -> Document:
+    """The kept chunk's metadata plus the NPCs, ids and pages of the chunks folded into it."""
+    metadata = dict(keep.metadata)
+    merged_npcs = [doc.metadata.get("About NPC") for doc in duplicates if doc.metadata.get("About NPC")]
+    metadata["merged_npcs"] = json.dumps(merged_npcs)
+    metadata["merged_ids"] = json.dumps(list(duplicate_ids))
+    metadata["document_count"] = max(doc.metadata.get("document_count", 0) for doc in [keep, *duplicates])
+    if "pages" in metadata:
+        pages = {}
+        for doc in [keep, *duplicates]:
+            for page in json.loads(doc.metadata.get("pages") or "[]"):
+                pages.setdefault(page["url"], page)
+        metadata["pages"] = json.dumps(list(pages.values()))
+    return Document(page_content=keep.page_content, metadata=metadata)
+
+
+def deduplicate(ids: List[str], docs: List[Document],
+                embed: Callable[[List[Document]], Tuple[List[List[float]], List[int]]],
+                jaccard: float = None, cosine: float = None,
+                stored: Callable[[List[str]], Dict[str, Tuple[str, List[float]]]] = None,
+                ) -> Tuple[List[str], List[Document], Dict[str, List[float]], DedupReport]:
+    """Collapse near-duplicate chunks before they are written.
+
+    MinHash LSH over character shingles finds candidate pairs cheaply; only chunks in a
+    candidate pair are embedded, and a pair is merged when both its estimated Jaccard
+    similarity and its embedding cosine similarity clear the thresholds. `stored` maps ids
+    to the (document, embedding) already in Chroma; a candidate whose text is unchanged
+    reuses that embedding rather than being embedded again. Returns the surviving ids and
+    documents, the embeddings computed for them by id, and a report.
+    """
+    jaccard = config.DEDUP_JACCARD if jaccard is None else jaccard
+    cosine = config.DEDUP_COSINE if cosine is None else cosine
+    report = DedupReport(chunks=len(docs))
+    if len(docs) < 2:
+        return ids, docs, {}, report
+
+    signatures = minhash_signatures([doc.page_content for doc in docs])
+    pairs = [
+        (first, second) for first, second in sorted(candidate_pairs(signatures))
+        if np.mean(signatures[first] == signatures[second]) >= jaccard
+    ]
+    report.candidate_pairs = len(pairs)
+    if not pairs:
+        return ids, docs, {}, report
+
+    candidates = sorted({index for pair in pairs for index in pair})
+    previous = stored([ids[i] for i in candidates]) if stored else {}
+    embedded = {
+        i: previous[ids[i]][1] for i in candidates
+        if ids[i] in previous and previous[ids[i]][0] == docs[i].page_content
+    }
+    to_embed = [i for i in candidates if i not in embedded]
+    report.reused = len(embedded)
+    if to_embed:
+        try:
+            vectors, valid = embed([docs[i] for i in to_embed])
+        except ValueError:
+            # No candidate could be embedded; keep everything and let the store stage retry
+            vectors, valid = [], []
+        embedded.update((to_embed[j], vector) for j, vector in zip(valid, vectors))
+    matrix = {}
+    if embedded:
+        indices = list(embedded)
+        normalized = np.array([embedded[i] for i in indices], dtype=np.float32)
+        normalized /= np.maximum(np.linalg.norm(normalized, axis=1, keepdims=True), 1e-12)
+        matrix = dict(zip(indices, normalized))
+
+    confirmed = [
+        (first, second) for first, second in pairs
+        if first in matrix and second in matrix and float(matrix[first] @ matrix[second]) >= cosine
+    ]
+
+    dimensions = len(next(iter(embedded.values()))) if embedded else 0
+    removed: Set[int] = set()
+    merged: Dict[int, Document] = {}
+    for members in _clusters(len(docs), confirmed):
+        # Keep the longest text so nothing a shorter near-duplicate said is lost
+        keep = max(members, key=lambda i: (len(docs[i].page_content), -i))
+        duplicates = [i for i in members if i != keep]
+        merged[keep] = merge_provenance(docs[keep], [docs[i] for i in duplicates], [ids[i] for i in duplicates])
+        removed.update(duplicates)
+        report.clusters.append([ids[keep]] + [ids[i] for i in duplicates])
+        for i in duplicates:
+            report.bytes_saved += (
+                dimensions * 4 + 2 * HNSW_M * 4
+                + len(docs[i].page_content.encode("utf-8"))
+                + len(json.dumps(docs[i].metadata, default=str))
+            )
+    report.removed = len(removed)
+
+    kept_ids, kept_docs = [], []
+    for i, (item_id, doc) in enumerate(zip(ids, docs)):
+        if i in removed:
+            continue
+        kept_ids.append(item_id)
+        kept_docs.append(merged.get(i, doc))
+    # Reused vectors are handed on too: a merged chunk's text is unchanged but its metadata is not
+    embeddings = {ids[i]: vector for i, vector in embedded.items() if i not in removed}
+    if report.removed:
+        logger.info(f"Deduplicated {report.removed} of {report.chunks} chunks "
+                    f"({report.candidate_pairs} candidate pairs), saving about {report.bytes_saved / 1024:.1f} KiB")
+    return kept_ids, kept_docs, embeddings, report
@@ -1,16 +1,30 @@
+import hashlib
+import json
 import pickle
 from pathlib import Path
 import sys
-from typing import List, Dict, Any, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 from langchain_core.documents import Document
 import logging
-import ollama
 
 project_root = Path(__file__).parents[2]
 sys.path.append(str(project_root))
 
 from src.database.database import store_embeddings_chroma, get_existing_ids_chroma, get_or_create_chroma_collection
+from src.database import relation_graph, vector_index
+from src.database.jobs import CANCELLED, DONE, EMBEDDED, FAILED, FAILED_ITEM, WRITTEN, IngestJob, get_job_store
 from src.notion.download import extract_notion_docs  # Add this import
+from src import config
+from src.cancellation import CancellationToken, OperationCancelled, check
+from src.clients import get_ollama_client
+from src.telemetry.tracing import span
+from src.ollama_utils.autocomplete import update_from_sync
+from src.ollama_utils.dedup import deduplicate
+from src.ollama_utils.residency import EMBEDDING, keep_alive_for
+from src.ollama_utils.summaries import build_npc_summaries, page_links, remove_orphaned_summaries
+from src.telemetry.logging_setup import ProgressLogger, SampledLogger, configure_logging, redact
 
 # Remove the following functions:
 # - get_chroma_client()
@@ -25,35 +39,42 @@ def load_docs_from_cache(database_id: str) -> List[Document]:
             return pickle.load(f)
     return []
 
-# Configure logging at the beginning of the file
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-
-# Explicitly set the root logger's level to INFO
-logging.getLogger().setLevel(logging.INFO)
-
-def create_embeddings(docs: List[Document]) -> Tuple[List[List[float]], List[int]]:
-    client = ollama.Client()
-    embeddings = []
-    valid_indices = []
-    for i, doc in enumerate(docs):
+logger = logging.getLogger(__name__)
+sampled = SampledLogger(logger)
+
+def create_embeddings(docs: List[Document], progress: Optional[ProgressLogger] = None,
+                      cancel: CancellationToken = None) -> Tuple[List[List[float]], List[int]]:
+    client = get_ollama_client()
+    # Callers embedding in batches pass one ProgressLogger and finish it themselves
+    owns_progress = progress is None
+    progress = progress or ProgressLogger(logger, "Creating embeddings", total=len(docs))
+
+    def embed(i: int, doc: Document) -> Optional[List[float]]:
+        check(cancel)
         try:
-            logging.info(f"Attempting to create embedding for document {i} with content: {doc.page_content[:100]}...")
-            response = client.embeddings(model='mistral-nemo', prompt=doc.page_content)
+            sampled.debug("embed", f"Creating embedding for document {i} with content: {redact(doc.page_content[:100])}")
+            response = client.embeddings(model=config.EMBEDDING_MODEL, prompt=doc.page_content, keep_alive=keep_alive_for(EMBEDDING))
             embedding = response['embedding']
             if embedding:
-                embeddings.append(embedding)
-                valid_indices.append(i)
-                logging.info(f"Successfully created embedding for document {i}")
-            else:
-                logging.warning(f"Empty embedding received for document {i}. Skipping this document.")
+                progress.advance()
+                return embedding
+            sampled.warning("empty", f"Empty embedding received for document {i}. Skipping this document.")
         except Exception as e:
-            logging.error(f"Error creating embedding for document {i}: {str(e)}")
+            sampled.error("embed_error", f"Error creating embedding for document {i}: {str(e)}")
+        progress.advance(failed=1)
+        return None
+
+    # Enough requests in flight to keep every Ollama instance busy; the client sends each to the least loaded
+    workers = max(1, config.OLLAMA_EMBED_CONCURRENCY) * len(client.endpoints)
+    if workers > 1 and len(docs) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(docs)), thread_name_prefix="embed") as pool:
+            results = list(pool.map(embed, range(len(docs)), docs))
+    else:
+        results = [embed(i, doc) for i, doc in enumerate(docs)]
+    embeddings = [embedding for embedding in results if embedding]
+    valid_indices = [i for i, embedding in enumerate(results) if embedding]
+    if owns_progress:
+        progress.finish()
     
     if not embeddings:
         raise ValueError("No valid embeddings were created")
@@ -74,27 +95,84 @@ def ensure_valid_metadata(docs: List[Document]) -> List[Document]:
         if 'name' in doc.metadata:
             doc.page_content = doc.metadata['name']
         else:
-            logging.warning(f"Document {i} has no 'name' in metadata. Content remains unchanged.")
+            sampled.warning("no_name", f"Document {i} has no 'name' in metadata. Content remains unchanged.")
 
         
         valid_docs.append(doc)
     return valid_docs
 
-def process_and_store_embeddings(database_id: str, docs: List[Document] = None):
+def synthesized_id(npc: str) -> str:
+    """Stable Chroma id for an NPC's synthesized document, so retried writes overwrite rather than duplicate."""
+    return f"npc_{hashlib.sha1(npc.encode('utf-8')).hexdigest()[:16]}"
+
+def content_hash(doc: Document) -> str:
+    payload = json.dumps({"content": doc.page_content, "metadata": doc.metadata}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def process_and_store_embeddings(database_id: str, docs: List[Document] = None,
+                                 cancel: CancellationToken = None) -> IngestJob:
+    """Ingest a database as a checkpointed job.
+
+    An interrupted job is resumed on the next call: checkpointed pages are not fetched from
+    Notion again and chunks already written to Chroma are not embedded again. A cancelled
+    job stops at its next page, document or batch boundary and is left to be resumed the
+    same way; every batch it wrote is complete.
+    """
     logging.info(f"Starting process_and_store_embeddings for database {database_id}")
-    
+    job_store = get_job_store()
+    job = job_store.start(database_id)
+
+    try:
+        failed = _ingest(job, database_id, docs, cancel)
+    except OperationCancelled:
+        logging.info(f"Ingest job {job.job_id} for database {database_id} was cancelled")
+        job_store.finish(job.job_id, CANCELLED, "cancelled")
+        return job_store.get(job.job_id)
+    except Exception as e:
+        job_store.finish(job.job_id, FAILED, str(e))
+        raise
+    finally:
+        refresh_exact_index(database_id)
+    if failed:
+        job_store.finish(job.job_id, FAILED, f"{failed} chunks failed after {config.INGEST_MAX_ATTEMPTS} attempts")
+    else:
+        job_store.finish(job.job_id, DONE)
+    return job_store.get(job.job_id)
+
+def _ingest(job: IngestJob, database_id: str, docs: Optional[List[Document]],
+            cancel: CancellationToken = None) -> int:
+    """Run the ingest steps for a job; returns the number of chunks that could not be written."""
+    job_store = get_job_store()
     if docs is None:
+        cached_pages = job_store.load_pages(job.job_id)
+        if cached_pages:
+            logging.info(f"Resuming job {job.job_id} with {len(cached_pages)} checkpointed pages")
         logging.info(f"Extracting Notion docs for database {database_id}")
-        docs = extract_notion_docs(database_id)
+        with span("ingest.extract", database_id=database_id):
+            docs = extract_notion_docs(
+                database_id,
+                cached_pages=cached_pages,
+                on_page=lambda doc: job_store.save_page(job.job_id, doc),
+                cancel=cancel,
+            )
+        if docs is None:
+            raise RuntimeError(f"Extraction failed for database {database_id}")
         logging.info(f"Extracted {len(docs)} documents from Notion")
+    else:
+        job_store.set_pages_fetched(job.job_id, len(docs))
     
+    # ensure_valid_metadata replaces page_content with the title; summaries need the page body
+    bodies = {id(doc): doc.page_content for doc in docs}
     docs = ensure_valid_metadata(docs)
     logging.info(f"Processed {len(docs)} documents with valid metadata")
+    update_from_sync(database_id, docs)
+    with span("ingest.graph", database_id=database_id):
+        relation_graph.update_graph(f"notion_{database_id}", relation_graph.edges_from_docs(docs))
 
     # Log metadata for debugging
-    logging.info("Sample of document metadata:")
-    for i, doc in enumerate(docs[:5]):  # Log first 5 documents
-        logging.info(f"Document {i} metadata: {doc.metadata}")
+    if logger.isEnabledFor(logging.DEBUG):
+        for i, doc in enumerate(docs[:5]):  # Log first 5 documents
+            logger.debug(f"Document {i} metadata keys: {sorted(doc.metadata)}")
 
     # Group documents by 'About NPC' metadata
     npc_groups = {}
@@ -108,62 +186,180 @@ def process_and_store_embeddings(database_id: str, docs: List[Document] = None):
             npc_groups[npc].append(doc)
 
     logging.info(f"Created {len(npc_groups)} NPC groups")
-    logging.info(f"NPC groups: {list(npc_groups.keys())}")
+    logger.debug(f"NPC groups: {list(npc_groups.keys())}")
 
     # Create synthesized documents
+    synthesized_ids = []
     synthesized_docs = []
     for npc, npc_docs in npc_groups.items():
         content = "\n".join([doc.page_content for doc in npc_docs])
         metadata = {
             "About NPC": npc,
             "document_count": len(npc_docs),
-            "source": "synthesized"
+            "source": "synthesized",
+            "pages": page_links(npc_docs)
         }
+        synthesized_ids.append(synthesized_id(npc))
         synthesized_docs.append(Document(page_content=content, metadata=metadata))
 
     logging.info(f"Created {len(synthesized_docs)} synthesized documents")
 
     # Log synthesized document metadata
-    logging.info("Sample of synthesized document metadata:")
-    for i, doc in enumerate(synthesized_docs[:5]):  # Log first 5 synthesized documents
-        logging.info(f"Synthesized Document {i} metadata: {doc.metadata}")
+    if logger.isEnabledFor(logging.DEBUG):
+        for i, doc in enumerate(synthesized_docs[:5]):  # Log first 5 synthesized documents
+            logger.debug(f"Synthesized Document {i} metadata: {doc.metadata}")
 
-    # Additional logging to show how many documents were processed vs. skipped
+    # One line showing how many documents were processed vs. skipped
     total_docs = len(docs)
     processed_docs = sum(len(npc_docs) for npc_docs in npc_groups.values())
     skipped_docs = total_docs - processed_docs
-    logging.info(f"Total documents: {total_docs}")
-    logging.info(f"Processed documents: {processed_docs}")
-    logging.info(f"Skipped documents (no 'About NPC'): {skipped_docs}")
-
-    embeddings, valid_indices = create_embeddings(synthesized_docs)
-    if not embeddings:
-        logging.error("No valid embeddings were created")
-        return
+    logging.info(f"Documents: {total_docs} total, {processed_docs} grouped, {skipped_docs} skipped (no 'About NPC')")
 
-    valid_docs = [synthesized_docs[i] for i in valid_indices]
-    documents = [doc.page_content for doc in valid_docs]
-    metadata = [doc.metadata for doc in valid_docs]
-    
     collection_name = f"notion_{database_id}"
     collection = get_or_create_chroma_collection(collection_name)
-    
-    store_embeddings_chroma(
-        collection=collection,
-        documents=documents,
-        embeddings=embeddings,
-        metadata=metadata
-    )
-    
-    logging.info(f"Stored {len(embeddings)} embeddings for database {database_id}")
-    if len(synthesized_docs) > len(embeddings):
-        logging.warning(f"Skipped {len(synthesized_docs) - len(embeddings)} documents due to empty embeddings")
+
+    precomputed = {}
+    if config.DEDUP_ENABLED:
+        with span("ingest.dedup", database_id=database_id, documents=len(synthesized_docs)) as current:
+            synthesized_ids, synthesized_docs, precomputed, dedup_report = deduplicate(
+                synthesized_ids, synthesized_docs, lambda batch: create_embeddings(batch, cancel=cancel),
+                stored=lambda item_ids: stored_embeddings(collection, item_ids),
+            )
+            current.set_attribute("dedup.removed", dedup_report.removed)
+            current.set_attribute("dedup.reused", dedup_report.reused)
+            current.set_attribute("dedup.bytes_saved", dedup_report.bytes_saved)
+
+    failed = store_checkpointed(job, collection, synthesized_ids, synthesized_docs, precomputed, cancel)
+    if failed == len(synthesized_docs) and synthesized_docs:
+        raise ValueError("No valid embeddings were created")
+    remove_stale_synthesized(collection, synthesized_ids)
+
+    if config.NPC_SUMMARIES_ENABLED:
+        store_npc_summaries(database_id, collection, npc_groups, bodies, cancel)
+    return failed
+
+def stored_embeddings(collection, ids: List[str]) -> Dict[str, Tuple[str, List[float]]]:
+    """Id -> (document, embedding) for the ids already in the collection, e.g. written before a resume."""
+    stored = collection.get(ids=list(ids), include=["documents", "embeddings"])
+    return {
+        item_id: (document, [float(value) for value in embedding])
+        for item_id, document, embedding in zip(stored["ids"], stored["documents"], stored["embeddings"])
+    }
+
+def store_checkpointed(job: IngestJob, collection, ids: List[str], docs: List[Document],
+                       precomputed: Dict[str, List[float]] = None, cancel: CancellationToken = None) -> int:
+    """Embed and upsert in batches, checkpointing each chunk; returns how many still failed after retries.
+
+    `precomputed` holds embeddings by id that an earlier stage already fetched. Cancellation
+    is honoured between batches, so a batch's upsert and its checkpoint are never split.
+    """
+    precomputed = precomputed or {}
+    job_store = get_job_store()
+    written = job_store.written_items(job.job_id)
+    hashes = [content_hash(doc) for doc in docs]
+    pending = [i for i in range(len(docs)) if written.get(ids[i]) != hashes[i]]
+    if len(pending) < len(docs):
+        logging.info(f"Skipping {len(docs) - len(pending)} chunks already written by job {job.job_id}")
+
+    failed = 0
+    progress = ProgressLogger(logger, "Creating embeddings", total=len(pending))
+    for start in range(0, len(pending), max(1, config.INGEST_BATCH_SIZE)):
+        check(cancel)
+        remaining = pending[start:start + max(1, config.INGEST_BATCH_SIZE)]
+        for attempt in range(1, config.INGEST_MAX_ATTEMPTS + 1):
+            to_embed = [i for i in remaining if ids[i] not in precomputed]
+            vectors = {i: precomputed[ids[i]] for i in remaining if ids[i] in precomputed}
+            if to_embed:
+                with span("ingest.embed", database_id=job.database_id, documents=len(to_embed), attempt=attempt):
+                    try:
+                        embeddings, valid_indices = create_embeddings([docs[i] for i in to_embed], progress)
+                    except ValueError:
+                        embeddings, valid_indices = [], []
+                vectors.update((to_embed[j], embedding) for j, embedding in zip(valid_indices, embeddings))
+            done = [i for i in remaining if i in vectors]
+            embeddings = [vectors[i] for i in done]
+            if done:
+                items = {ids[i]: hashes[i] for i in done}
+                job_store.mark_items(job.job_id, items, EMBEDDED)
+                with span("ingest.store", database_id=job.database_id, documents=len(done)):
+                    store_embeddings_chroma(
+                        collection=collection,
+                        documents=[docs[i].page_content for i in done],
+                        embeddings=embeddings,
+                        metadata=[docs[i].metadata for i in done],
+                        ids=[ids[i] for i in done]
+                    )
+                job_store.mark_items(job.job_id, items, WRITTEN)
+            done_set = set(done)
+            remaining = [i for i in remaining if i not in done_set]
+            if not remaining:
+                break
+            if attempt < config.INGEST_MAX_ATTEMPTS:
+                backoff = config.INGEST_RETRY_BACKOFF * attempt
+                if cancel is None:
+                    time.sleep(backoff)
+                elif cancel.wait(backoff):
+                    cancel.check()
+        if remaining:
+            job_store.mark_items(job.job_id, {ids[i]: hashes[i] for i in remaining}, FAILED_ITEM, "embedding failed")
+            failed += len(remaining)
+    progress.finish()
+
+    logging.info(f"Stored {len(pending) - failed} embeddings for database {job.database_id}")
+    if failed:
+        logging.warning(f"{failed} chunks failed after {config.INGEST_MAX_ATTEMPTS} attempts; the next run retries them")
+    return failed
+
+def refresh_exact_index(database_id: str):
+    """Rebuild the in-memory search index from what this sync left in Chroma."""
+    try:
+        with span("ingest.index", database_id=database_id):
+            vector_index.refresh_index(get_or_create_chroma_collection(f"notion_{database_id}"))
+    except Exception as e:
+        logging.error(f"Failed to refresh exact index for database {database_id}: {e}")
+
+def remove_stale_synthesized(collection, ids: List[str]):
+    """Delete synthesized documents for NPCs that no longer have notes, including pre-checkpoint doc_N ids."""
+    existing = collection.get(where={"source": "synthesized"}, include=[])["ids"]
+    stale = sorted(set(existing) - set(ids))
+    if stale:
+        collection.delete(ids=stale)
+        logging.info(f"Removed {len(stale)} stale synthesized documents")
+
+def store_npc_summaries(database_id: str, collection, npc_groups: Dict[str, List[Document]], bodies: Dict[int, str],
+                        cancel: CancellationToken = None):
+    with span("ingest.summarize", database_id=database_id, groups=len(npc_groups)):
+        summary_ids, summary_docs = build_npc_summaries(collection, npc_groups, bodies, cancel)
+    # Otherwise a renamed NPC's old summary keeps outranking the notes it was built from
+    remove_orphaned_summaries(collection, npc_groups)
+    if not summary_docs:
+        return
+
+    with span("ingest.embed", database_id=database_id, documents=len(summary_docs)):
+        embeddings, valid_indices = create_embeddings(summary_docs, cancel=cancel)
+    valid_docs = [summary_docs[i] for i in valid_indices]
+
+    with span("ingest.store", database_id=database_id, documents=len(valid_docs)):
+        store_embeddings_chroma(
+            collection=collection,
+            documents=[doc.page_content for doc in valid_docs],
+            embeddings=embeddings,
+            metadata=[doc.metadata for doc in valid_docs],
+            ids=[summary_ids[i] for i in valid_indices]
+        )
+    logging.info(f"Stored {len(valid_docs)} NPC summaries for database {database_id}")
 
 # Example usage:
 if __name__ == "__main__":
+    from src.notion.download import process_notion_databases
+    from src.service.client import get_service_client
+
+    configure_logging()
     logging.info("Script started")
-    ingest_list = ["8d5dc8537d04457fa92a543a83ac397b"]
-    for dbase in ingest_list:
-        logging.info(f"Processing database: {dbase}")
-        process_and_store_embeddings(database_id=dbase)
-    logging.info("Script finished")
+    # Database ids on the command line, otherwise NOTION_DATABASE_IDS or every shared database
+    service = get_service_client()
+    if service is not None:
+        table = service.sync(sys.argv[1:])["table"]
+    else:
+        table = process_notion_databases(sys.argv[1:]).format()
+    logging.info(f"Script finished\n{table}")
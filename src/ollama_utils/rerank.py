@@ -0,0 +1,132 @@
+import hashlib
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src import config
+from src.clients import get_ollama_client
+from src.ollama_utils.cache import LRUCache
+from src.ollama_utils.residency import GENERATION, keep_alive_for
+from src.ollama_utils.retrieval import RetrievedChunk
+from src.telemetry.tracing import span
+
+logger = logging.getLogger(__name__)
+
+RERANK_PROMPT_TEMPLATE = """Does the passage help answer the question? Reply with a single digit from 0 (not at all) to 9 (answers it fully).
+
+Question: {question}
+
+Passage: {passage}
+
+Relevance:"""
+
+# (reranker, question hash, chunk hash) -> score; a chunk's score only changes with its text
+score_cache = LRUCache(config.RERANK_CACHE_SIZE)
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class OnnxCrossEncoder:
+    """Cross-encoder exported to ONNX, e.g. ms-marco-MiniLM-L-6-v2: `model_dir` holds model.onnx and tokenizer.json."""
+
+    def __init__(self, model_dir: Path, max_length: int = 512):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        self.name = f"onnx:{model_dir.name}"
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self.session = onnxruntime.InferenceSession(str(model_dir / "model.onnx"), providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def score(self, question: str, passages: Sequence[str]) -> List[float]:
+        encodings = self.tokenizer.encode_batch([(question, passage) for passage in passages])
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        logits = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+        # One relevance logit per pair, or (irrelevant, relevant) for two-label models
+        return logits.reshape(len(passages), -1)[:, -1].astype(float).tolist()
+
+
+class OllamaReranker:
+    """Asks a small Ollama model for a 0-9 relevance digit per pair; a batch runs as parallel requests."""
+
+    def __init__(self, model: str, batch_size: int):
+        self.name = f"ollama:{model}"
+        self.model = model
+        self.pool = ThreadPoolExecutor(max_workers=max(1, batch_size), thread_name_prefix="rerank")
+
+    def _score_one(self, question: str, passage: str) -> float:
+        response = get_ollama_client().generate(
+            model=self.model,
+            prompt=RERANK_PROMPT_TEMPLATE.format(question=question, passage=passage),
+            options={"temperature": 0, "num_predict": 2},
+            keep_alive=keep_alive_for(GENERATION),
+        )
+        digit = re.search(r"\d", response["response"])
+        return float(digit.group()) if digit else 0.0
+
+    def score(self, question: str, passages: Sequence[str]) -> List[float]:
+        return list(self.pool.map(lambda passage: self._score_one(question, passage), passages))
+
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker():
+    """The configured reranker (NOTEKEEPER_RERANKER "onnx" or "ollama"), or None when re-ranking is off."""
+    global _reranker
+    if not config.RERANKER:
+        return None
+    with _reranker_lock:
+        if _reranker is None:
+            if config.RERANKER == "onnx":
+                _reranker = OnnxCrossEncoder(config.RERANK_ONNX_MODEL_DIR)
+            elif config.RERANKER == "ollama":
+                _reranker = OllamaReranker(config.RERANK_OLLAMA_MODEL, config.RERANK_BATCH_SIZE)
+            else:
+                raise ValueError(f"Unknown reranker {config.RERANKER!r}; expected 'onnx' or 'ollama'")
+            logger.info(f"Re-ranking with {_reranker.name}")
+        return _reranker
+
+
+def rerank(question: str, chunks: Sequence[RetrievedChunk], top_n: int, reranker=None,
+           batch_size: Optional[int] = None, timings: Dict[str, float] = None) -> List[RetrievedChunk]:
+    """The `top_n` chunks the reranker scores highest for the question, best first.
+
+    Scores are cached by question and chunk text, so only pairs not seen before are scored,
+    `batch_size` at a time.
+    """
+    reranker = reranker or get_reranker()
+    batch_size = batch_size or config.RERANK_BATCH_SIZE
+    with span("ask.rerank", timings, reranker=reranker.name, candidates=len(chunks)) as current:
+        question_digest = _digest(question)
+        keys = [(reranker.name, question_digest, _digest(chunk.document)) for chunk in chunks]
+        scores = [score_cache.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        current.set_attribute("rerank.cached", len(chunks) - len(missing))
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            for i, score in zip(batch, reranker.score(question, [chunks[i].document for i in batch])):
+                scores[i] = score
+                score_cache.put(keys[i], score)
+        # Stable sort keeps the retrieval order among equal scores
+        order = sorted(range(len(chunks)), key=lambda i: -scores[i])[:top_n]
+        ranked = []
+        for i in order:
+            chunks[i].rerank_score = scores[i]
+            ranked.append(chunks[i])
+        return ranked
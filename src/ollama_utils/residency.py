@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, time as clock_time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from src import config
+from src.clients import get_ollama_client
+from src.clients.ollama_pool import OllamaPool
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING = "embedding"
+GENERATION = "generation"
+# A call slower than this to start had to load the model; a warm model answers well within it
+COLD_LOAD_SECONDS = 0.5
+
+
+def keep_alive_for(role: str, now: Optional[datetime] = None):
+    """The role's keep_alive during play hours, OFF_HOURS_KEEP_ALIVE outside them."""
+    if not in_play_hours(parse_play_hours(config.PLAY_HOURS), now):
+        return config.OFF_HOURS_KEEP_ALIVE
+    return config.EMBEDDING_KEEP_ALIVE if role == EMBEDDING else config.GENERATION_KEEP_ALIVE
+
+
+def parse_play_hours(spec: str) -> List[Tuple[clock_time, clock_time]]:
+    """Parse "18:00-23:30,13-17" into (start, end) pairs; ranges may wrap past midnight."""
+    ranges = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        start, end = part.split("-")
+        ranges.append((_parse_clock(start), _parse_clock(end)))
+    return ranges
+
+
+def _parse_clock(value: str) -> clock_time:
+    hours, _, minutes = value.strip().partition(":")
+    return clock_time(int(hours) % 24, int(minutes or 0))
+
+
+def in_play_hours(ranges: List[Tuple[clock_time, clock_time]], now: Optional[datetime] = None) -> bool:
+    if not ranges:
+        return True
+    current = (now or datetime.now()).time()
+    for start, end in ranges:
+        if start <= end and start <= current < end:
+            return True
+        if start > end and (current >= start or current < end):
+            return True
+    return False
+
+
+@dataclass
+class ModelStats:
+    model: str
+    role: str
+    keep_alive: Any
+    loads: int = 0
+    # Keep-warm pings; one only counts as a load too when the model had actually been unloaded
+    pings: int = 0
+    last_load_seconds: float = 0.0
+    last_inference_seconds: float = 0.0
+    last_preload_at: Optional[float] = None
+
+
+class ModelResidencyManager:
+    """Keeps the embedding and generation models loaded in Ollama.
+
+    Models are preloaded when the bot connects, every request carries the configured
+    keep_alive, and during play hours a background loop pings the models before
+    Ollama would unload them.
+    """
+
+    def __init__(self, models: Mapping[str, str] = None):
+        self.models = dict(models or {EMBEDDING: config.EMBEDDING_MODEL, GENERATION: config.GENERATION_MODEL})
+        self.play_hours = parse_play_hours(config.PLAY_HOURS)
+        self.stats: Dict[str, ModelStats] = {
+            role: ModelStats(model=model, role=role, keep_alive=keep_alive_for(role))
+            for role, model in self.models.items()
+        }
+        self._lock = threading.Lock()
+
+    def preload(self, ping: bool = False) -> Dict[str, ModelStats]:
+        """Load every model with its keep_alive on every Ollama instance; returns the per-role load stats.
+
+        With `ping` this is a keep-warm call, recorded as a load only if the model was cold.
+        """
+        client = get_ollama_client()
+        # Any instance may serve the next request, so each one needs the models loaded
+        clients = [endpoint.client for endpoint in client.endpoints] if isinstance(client, OllamaPool) else [client]
+        for role, model in self.models.items():
+            for client in clients:
+                start = time.perf_counter()
+                try:
+                    if role == EMBEDDING:
+                        # Embedding responses carry no timings, so wall time stands in for load time
+                        client.embeddings(model=model, prompt="", keep_alive=keep_alive_for(role))
+                        self._record_load(role, time.perf_counter() - start, ping)
+                    else:
+                        # An empty prompt loads the model without generating anything
+                        response = client.generate(model=model, prompt="", keep_alive=keep_alive_for(role))
+                        self._record_load(role, (response.get("load_duration") or 0) / 1e9 or time.perf_counter() - start,
+                                          ping)
+                except Exception as e:
+                    logger.error(f"Failed to preload {role} model {model}: {e}")
+        return self.stats
+
+    def _record_load(self, role: str, seconds: float, ping: bool = False):
+        with self._lock:
+            stats = self.stats[role]
+            stats.last_preload_at = time.time()
+            if ping:
+                stats.pings += 1
+                if seconds <= COLD_LOAD_SECONDS:
+                    return
+            stats.loads += 1
+            stats.last_load_seconds = seconds
+
+    def record_response(self, role: str, response: Mapping[str, Any]):
+        """Split a live generate response into model load time and inference time."""
+        if role not in self.stats:
+            return
+        load = (response.get("load_duration") or 0) / 1e9
+        inference = ((response.get("prompt_eval_duration") or 0) + (response.get("eval_duration") or 0)) / 1e9
+        with self._lock:
+            stats = self.stats[role]
+            if load > COLD_LOAD_SECONDS:
+                # Ollama had to reload the model for a user-facing request
+                stats.loads += 1
+                stats.last_load_seconds = load
+                logger.warning(f"{stats.model} was cold for a request; load took {load:.2f}s")
+            if inference:
+                stats.last_inference_seconds = inference
+
+    def loaded_models(self) -> List[str]:
+        try:
+            return [model["name"] for model in get_ollama_client().ps().get("models", [])]
+        except Exception as e:
+            logger.error(f"Failed to list loaded models: {e}")
+            return []
+
+    async def keep_warm(self):
+        """Ping the models on a schedule while inside play hours."""
+        while True:
+            await asyncio.sleep(config.RESIDENCY_PING_INTERVAL)
+            if in_play_hours(self.play_hours):
+                await asyncio.to_thread(self.preload, True)
+
+    def report(self) -> str:
+        loaded = self.loaded_models()
+        lines = [f"{'role':11s} {'model':20s} {'loaded':>6s} {'keep':>5s} {'loads':>5s} {'pings':>5s} "
+                 f"{'load s':>7s} {'infer s':>8s}"]
+        for stats in self.stats.values():
+            is_loaded = any(name.split(":")[0] == stats.model.split(":")[0] for name in loaded)
+            lines.append(
+                f"{stats.role:11s} {stats.model:20s} {'yes' if is_loaded else 'no':>6s} {str(stats.keep_alive):>5s} "
+                f"{stats.loads:5d} {stats.pings:5d} {stats.last_load_seconds:7.2f} {stats.last_inference_seconds:8.2f}"
+            )
+        client = get_ollama_client()
+        if isinstance(client, OllamaPool) and len(client.endpoints) > 1:
+            lines.append("")
+            lines.append(client.format())
+        return "\n".join(lines)
+
+
+residency_manager = ModelResidencyManager()
@@ -0,0 +1,420 @@
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src import config
+from src.cancellation import CancellationToken, OperationCancelled
+from src.clients import get_ollama_client
+from src.database import relation_graph, vector_index
+from src.ollama_utils.cache import LRUCache
+from src.ollama_utils.deadline import Deadline, stage_pool
+from src.ollama_utils.residency import EMBEDDING, GENERATION, keep_alive_for, residency_manager
+from src.telemetry.tracing import record_generation, span
+
+logger = logging.getLogger(__name__)
+
+# Same instructions as LangChain's default "stuff" QA prompt, which answer_question used to go through
+QA_PROMPT_TEMPLATE = """Use the following pieces of context to answer the question at the end. If you don't know the answer, just say that you don't know, don't try to make up an answer.
+
+{context}
+
+Question: {question}
+Helpful Answer:"""
+
+# Sent with the previous turn's Ollama context, which already holds the earlier prompt and answer
+FOLLOW_UP_PROMPT_TEMPLATE = """Use the context from earlier in this conversation, and any new context below, to answer the follow-up question. If you don't know the answer, just say that you don't know, don't try to make up an answer.
+
+{context}
+
+Follow-up Question: {question}
+Helpful Answer:"""
+
+MAX_CONTEXT_LENGTH = 3500
+
+# Query embeddings keyed by (model, question); repeated and batch questions skip the embed call
+query_embedding_cache = LRUCache(config.QUERY_EMBEDDING_CACHE_SIZE)
+# One more cache per partition (the databases a guild's questions are scoped to), so a busy
+# guild cannot evict another guild's entries
+_partition_caches: Dict[Hashable, LRUCache] = {}
+_partition_lock = threading.Lock()
+
+
+@dataclass
+class RetrievedChunk:
+    id: str
+    collection: str
+    document: str
+    metadata: Dict[str, Any]
+    embedding: List[float]
+    distance: float = 0.0
+    # The selected chunk's NPC this one was reached from by relation expansion
+    related_to: Optional[str] = None
+    # Set when the reranker picked this chunk; higher is more relevant
+    rerank_score: Optional[float] = None
+
+
+@dataclass
+class AnswerResult:
+    answer: str
+    chunks: List[RetrievedChunk] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+    tokens_per_second: Optional[float] = None
+    # Why the answer is not a complete generation, e.g. "generate.partial"; None when it is
+    degraded: Optional[str] = None
+    # Whether this answered a follow-up from its conversation's context
+    follow_up: bool = False
+
+    @property
+    def chunk_ids(self) -> List[str]:
+        return [chunk.id for chunk in self.chunks]
+
+
+def embedding_cache(partition: Hashable = None) -> LRUCache:
+    if partition is None:
+        return query_embedding_cache
+    with _partition_lock:
+        if partition not in _partition_caches:
+            _partition_caches[partition] = LRUCache(config.QUERY_EMBEDDING_CACHE_SIZE)
+        return _partition_caches[partition]
+
+
+def embed_query(question: str, model: str = None, timings: Dict[str, float] = None,
+                partition: Hashable = None) -> List[float]:
+    model = model or config.EMBEDDING_MODEL
+    cache = embedding_cache(partition)
+    with span("ask.embed", timings) as current:
+        cached = cache.get((model, question))
+        current.set_attribute("cache.hit", cached is not None)
+        if cached is not None:
+            return cached
+        response = get_ollama_client().embeddings(model=model, prompt=question, keep_alive=keep_alive_for(EMBEDDING))
+        cache.put((model, question), response["embedding"])
+        return response["embedding"]
+
+
+def _get_collection(client, name: str):
+    """None when the collection was deleted since it was listed.
+
+    A maintenance rebuild swaps a fresh collection in under the same name with two
+    renames, so a miss is retried once after the swap has had time to finish.
+    """
+    for attempt in range(2):
+        try:
+            return client.get_collection(name=name)
+        except ValueError:
+            if attempt == 0:
+                time.sleep(0.05)
+    return None
+
+
+def search_collections(client, query_embedding: List[float], collection_names: Sequence[str],
+                       fetch_k: int, timings: Dict[str, float] = None,
+                       exact: Optional[bool] = None) -> Dict[str, List[RetrievedChunk]]:
+    """Nearest `fetch_k` chunks per collection, with their embeddings for MMR.
+
+    Collections small enough for the exact index are searched by brute force over a
+    memory-mapped matrix; larger ones (or exact=False), and small ones whose first index is
+    still being built, go through Chroma's HNSW index.
+    """
+    results = {}
+    with span("ask.search", timings, collections=len(collection_names)) as current:
+        backends = []
+        for name in collection_names:
+            collection = _get_collection(client, name)
+            if collection is None:
+                logger.warning(f"Collection {name} disappeared before it could be searched")
+                continue
+            count = collection.count()
+            if count == 0:
+                continue
+            index = None
+            if exact is not False and vector_index.use_exact(collection, count):
+                index = vector_index.get_index(collection, count)
+            if index is not None:
+                backends.append("exact")
+                results[name] = _search_exact(collection, index, query_embedding, fetch_k)
+            else:
+                backends.append("chroma")
+                results[name] = _search_chroma(collection, count, query_embedding, fetch_k)
+        current.set_attribute("search.backends", ",".join(sorted(set(backends))))
+    return results
+
+
+def _search_exact(collection, index: vector_index.ExactIndex, query_embedding: List[float],
+                  fetch_k: int) -> List[RetrievedChunk]:
+    return [
+        RetrievedChunk(
+            id=index.ids[row],
+            collection=collection.name,
+            document=index.documents[row],
+            metadata=index.metadatas[row],
+            embedding=index.matrix[row],
+            distance=distance,
+        )
+        for row, distance in index.search(query_embedding, fetch_k)
+    ]
+
+
+def _search_chroma(collection, count: int, query_embedding: List[float], fetch_k: int) -> List[RetrievedChunk]:
+    response = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=min(fetch_k, count),
+        include=["documents", "metadatas", "embeddings", "distances"],
+    )
+    return [
+        RetrievedChunk(
+            id=chunk_id,
+            collection=collection.name,
+            document=document,
+            metadata=metadata or {},
+            embedding=embedding,
+            distance=distance,
+        )
+        for chunk_id, document, metadata, embedding, distance in zip(
+            response["ids"][0],
+            response["documents"][0],
+            response["metadatas"][0],
+            response["embeddings"][0],
+            response["distances"][0],
+        )
+    ]
+
+
+def prefer_summaries(candidates: Dict[str, List[RetrievedChunk]]) -> Dict[str, List[RetrievedChunk]]:
+    """Drop raw synthesized NPC documents when the precomputed summary for that NPC was also found."""
+    preferred = {}
+    for name, chunks in candidates.items():
+        summarized = {chunk.metadata.get("About NPC") for chunk in chunks if chunk.metadata.get("source") == "summary"}
+        preferred[name] = [
+            chunk for chunk in chunks
+            if not (chunk.metadata.get("source") == "synthesized" and chunk.metadata.get("About NPC") in summarized)
+        ]
+    return preferred
+
+
+def maximal_marginal_relevance(query_embedding: Sequence[float], embeddings: Sequence[Sequence[float]],
+                               k: int, lambda_mult: float = 0.5) -> List[int]:
+    """Indices of `k` embeddings balancing similarity to the query against redundancy."""
+    if not len(embeddings) or k <= 0:
+        return []
+    matrix = np.array(embeddings, dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    query = np.array(query_embedding, dtype=np.float32)
+    query /= max(float(np.linalg.norm(query)), 1e-12)
+
+    query_similarity = matrix @ query
+    selected = [int(np.argmax(query_similarity))]
+    # Highest similarity of each candidate to anything already selected
+    redundancy = matrix @ matrix[selected[0]]
+    while len(selected) < min(k, len(matrix)):
+        scores = lambda_mult * query_similarity - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, matrix @ matrix[best])
+    return selected
+
+
+def select_chunks(query_embedding: List[float], candidates: Dict[str, List[RetrievedChunk]], k: int,
+                  lambda_mult: float = 0.5, timings: Dict[str, float] = None,
+                  search_type: str = "mmr") -> List[RetrievedChunk]:
+    """MMR (or plain nearest-first for "similarity") within each collection, then interleave the rankings."""
+    with span("ask.mmr", timings, search_type=search_type):
+        rankings = []
+        for chunks in candidates.values():
+            if search_type == "similarity":
+                # Chroma already returns candidates nearest first
+                rankings.append(chunks[:k])
+                continue
+            indices = maximal_marginal_relevance(query_embedding, [chunk.embedding for chunk in chunks], k, lambda_mult)
+            rankings.append([chunks[i] for i in indices])
+
+        selected, seen = [], set()
+        for rank in range(max((len(ranking) for ranking in rankings), default=0)):
+            for ranking in rankings:
+                if rank < len(ranking) and ranking[rank].document not in seen:
+                    seen.add(ranking[rank].document)
+                    selected.append(ranking[rank])
+        return selected
+
+
+def _fetch_about(collection, npcs: List[str]) -> List[RetrievedChunk]:
+    count = collection.count()
+    index = vector_index.get_index(collection, count) if vector_index.use_exact(collection, count) else None
+    if index is not None:
+        return [
+            RetrievedChunk(id=index.ids[row], collection=collection.name, document=index.documents[row],
+                           metadata=index.metadatas[row], embedding=index.matrix[row])
+            for row in index.rows_about(npcs)
+        ]
+    response = collection.get(where={"About NPC": {"$in": npcs}}, include=["documents", "metadatas", "embeddings"])
+    return [
+        RetrievedChunk(id=chunk_id, collection=collection.name, document=document,
+                       metadata=metadata or {}, embedding=embedding)
+        for chunk_id, document, metadata, embedding in zip(
+            response["ids"], response["documents"], response["metadatas"], response["embeddings"]
+        )
+    ]
+
+
+def expand_related(client, query_embedding: List[float], selected: Sequence[RetrievedChunk], k: int,
+                   timings: Dict[str, float] = None) -> List[RetrievedChunk]:
+    """Up to k chunks one relation hop from the selected ones, one per NPC, nearest to the query first.
+
+    Neighbours come from the relation graph built at ingest rather than from a wider fetch_k.
+    """
+    if k <= 0 or not selected:
+        return []
+    with span("ask.expand", timings) as current:
+        seeds = {chunk.metadata.get("About NPC") for chunk in selected}
+        seen_ids = {chunk.id for chunk in selected}
+        by_collection: Dict[str, List[RetrievedChunk]] = {}
+        for chunk in selected:
+            by_collection.setdefault(chunk.collection, []).append(chunk)
+
+        neighbours = []
+        for name, chunks in by_collection.items():
+            graph = relation_graph.get_graph(name)
+            if graph is None:
+                continue
+            related = {}
+            for chunk in chunks:
+                npc = chunk.metadata.get("About NPC")
+                for neighbour in graph.neighbors(npc) if npc else []:
+                    if neighbour not in seeds:
+                        related.setdefault(neighbour, npc)
+            if not related:
+                continue
+            collection = _get_collection(client, name)
+            if collection is None:
+                continue
+            found = prefer_summaries({name: _fetch_about(collection, sorted(related))})[name]
+            for chunk in found:
+                if chunk.id not in seen_ids:
+                    chunk.related_to = related[chunk.metadata["About NPC"]]
+                    neighbours.append(chunk)
+
+        if neighbours:
+            query = np.asarray(query_embedding, dtype=np.float32)
+            query /= max(float(np.linalg.norm(query)), 1e-12)
+            matrix = np.array([chunk.embedding for chunk in neighbours], dtype=np.float32)
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            for chunk, score in zip(neighbours, matrix @ query):
+                chunk.distance = float(1.0 - score)
+            neighbours.sort(key=lambda chunk: chunk.distance)
+
+        expanded, npcs = [], set()
+        for chunk in neighbours:
+            if chunk.metadata["About NPC"] not in npcs:
+                npcs.add(chunk.metadata["About NPC"])
+                expanded.append(chunk)
+            if len(expanded) == k:
+                break
+        current.set_attribute("expand.related", len(expanded))
+        return expanded
+
+
+def build_prompt(question: str, chunks: Sequence[RetrievedChunk], max_context_length: int = MAX_CONTEXT_LENGTH,
+                 timings: Dict[str, float] = None, template: str = QA_PROMPT_TEMPLATE) -> Tuple[str, List[str]]:
+    """The prompt, and the ids of the chunks that fit into its context (the rest are cut)."""
+    with span("ask.prompt", timings) as current:
+        context = ""
+        included = []
+        for chunk in chunks:
+            if len(context) + len(chunk.document) <= max_context_length:
+                context += chunk.document + "\n\n"
+                included.append(chunk.id)
+            else:
+                break
+        current.set_attribute("prompt.context_chars", len(context))
+        current.set_attribute("prompt.chunks_cut", len(chunks) - len(included))
+        return template.format(context=context.strip(), question=question), included
+
+
+def generate(prompt: str, model: str = None, timings: Dict[str, float] = None,
+             context: Sequence[int] = None) -> Dict[str, Any]:
+    with span("ask.generate", timings) as current:
+        response = get_ollama_client().generate(
+            model=model or config.GENERATION_MODEL, prompt=prompt, context=context, keep_alive=keep_alive_for(GENERATION)
+        )
+        record_generation(response, current)
+        residency_manager.record_response(GENERATION, response)
+        return response
+
+
+def generate_streaming(prompt: str, deadline: Deadline, model: str = None,
+                       timings: Dict[str, float] = None, context: Sequence[int] = None,
+                       cancel: CancellationToken = None) -> Tuple[Dict[str, Any], bool]:
+    """Stream a generation until it finishes or the deadline passes.
+
+    Returns the response (its "response" holds whatever streamed so far, and only a finished
+    one has a "context") and whether generation finished. Errors from Ollama are raised, and
+    so is OperationCancelled as soon as `cancel` is set; the stream is then closed at the
+    next token.
+    """
+    pieces: List[str] = []
+    final: Dict[str, Any] = {}
+    stop = threading.Event()
+
+    def consume():
+        stream = get_ollama_client().generate(
+            model=model or config.GENERATION_MODEL, prompt=prompt, context=context,
+            keep_alive=keep_alive_for(GENERATION), stream=True,
+        )
+        try:
+            for chunk in stream:
+                pieces.append(chunk.get("response", ""))
+                if chunk.get("done"):
+                    final.update(chunk)
+                    return
+                if stop.is_set() or (cancel is not None and cancel.cancelled):
+                    return
+        finally:
+            # Closing the stream drops the connection, which makes Ollama stop generating
+            stream.close()
+
+    with span("ask.generate", timings) as current:
+        future = stage_pool.submit(consume)
+        done = threading.Event()
+        future.add_done_callback(lambda _: done.set())
+        if cancel is not None:
+            cancel.on_cancel(done.set)
+        finished = done.wait(deadline.remaining())
+        if cancel is not None and cancel.cancelled and not final:
+            stop.set()
+            current.set_attribute("generate.cancelled", True)
+            raise OperationCancelled()
+        if finished:
+            future.result()
+        else:
+            stop.set()
+        response = dict(final, response="".join(pieces))
+        current.set_attribute("generate.finished", finished)
+        if finished:
+            record_generation(response, current)
+            residency_manager.record_response(GENERATION, response)
+        return response, finished
+
+
+def page_list(chunks: Sequence[RetrievedChunk], limit: int = 5) -> List[str]:
+    """Markdown links to the Notion pages behind the chunks, best match first."""
+    lines, seen = [], set()
+    for chunk in chunks:
+        pages = json.loads(chunk.metadata.get("pages") or "[]")
+        if not pages and chunk.metadata.get("About NPC"):
+            # Chunks written before pages were recorded only know their NPC
+            pages = [{"title": chunk.metadata["About NPC"], "url": None}]
+        for page in pages:
+            key = page["url"] or page["title"]
+            if key in seen:
+                continue
+            seen.add(key)
+            lines.append(f"- [{page['title']}]({page['url']})" if page["url"] else f"- {page['title']}")
+            if len(lines) >= limit:
+                return lines
+    return lines
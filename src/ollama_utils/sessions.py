@@ -0,0 +1,108 @@
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, Sequence, Tuple
+
+from src import config
+
+# Earlier questions kept to embed a follow-up with; "where does she live?" alone finds nothing
+QUESTION_TURNS = 2
+
+
+@dataclass(frozen=True)
+class Session:
+    """What one channel's conversation has already put in front of the model."""
+    questions: Tuple[str, ...]
+    # Chunks already in the prompt the context was built from; follow-ups only send the others
+    chunk_ids: FrozenSet[str]
+    # Ollama's token state after the last answer, passed back as `context` to skip re-reading it
+    context: array
+    expires_at: float
+    turns: int = 1
+
+    @property
+    def size(self) -> int:
+        """Approximate bytes held, for the store's memory cap."""
+        return (self.context.itemsize * len(self.context)
+                + sum(len(chunk_id) for chunk_id in self.chunk_ids)
+                + sum(len(question) for question in self.questions))
+
+    def retrieval_text(self, question: str) -> str:
+        return "\n".join([*self.questions, question])
+
+
+class SessionStore:
+    """Conversation sessions by key (guild and channel), expiring after `ttl` seconds idle.
+
+    The least recently used sessions are dropped once together they hold more than
+    `max_bytes`, and a session whose context grew past `max_context_tokens` (the model's
+    context window) is ended so the next question starts over with a full prompt.
+    """
+
+    def __init__(self, ttl: float, max_bytes: int, max_context_tokens: int,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_context_tokens = max_context_tokens
+        self.clock = clock
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Session]:
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                return None
+            if session.expires_at <= self.clock():
+                self._remove(key)
+                return None
+            self._sessions.move_to_end(key)
+            return session
+
+    def record(self, key: str, question: str, chunk_ids: Iterable[str], context: Optional[Sequence[int]],
+               previous: Optional[Session] = None) -> Optional[Session]:
+        """Start or continue the session after an answer; returns None when it was ended instead."""
+        with self._lock:
+            self._remove(key)
+            if not context or len(context) > self.max_context_tokens:
+                return None
+            questions = (*previous.questions, question) if previous else (question,)
+            session = Session(
+                questions=questions[-QUESTION_TURNS:],
+                chunk_ids=frozenset(chunk_ids) | (previous.chunk_ids if previous else frozenset()),
+                context=array("i", context),
+                expires_at=self.clock() + self.ttl,
+                turns=previous.turns + 1 if previous else 1,
+            )
+            if session.size > self.max_bytes:
+                return None
+            self._sessions[key] = session
+            self._bytes += session.size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._sessions)))
+            return session
+
+    def forget(self, key: str) -> bool:
+        with self._lock:
+            return self._remove(key)
+
+    def _remove(self, key: str) -> bool:
+        session = self._sessions.pop(key, None)
+        if session is None:
+            return False
+        self._bytes -= session.size
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"sessions": len(self._sessions), "bytes": self._bytes}
+
+
+conversation_sessions = SessionStore(
+    ttl=config.SESSION_TTL,
+    max_bytes=int(config.SESSION_MAX_MB * 1024 * 1024),
+    max_context_tokens=config.SESSION_MAX_CONTEXT_TOKENS,
+)
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from src import config
+from src.cancellation import CancellationToken, check
+from src.clients import get_ollama_client
+from src.ollama_utils.residency import GENERATION, keep_alive_for
+from src.telemetry.logging_setup import ProgressLogger
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SOURCE = "summary"
+
+MAP_PROMPT = """The following are campaign notes that mention {npc}.
+Write a concise summary of everything they say about {npc}: who they are, where they are, what they want, and how they relate to other characters. Use only the notes.
+
+{notes}
+
+Summary of {npc}:"""
+
+REDUCE_PROMPT = """The following are partial summaries about {npc}, each written from a different set of campaign notes.
+Combine them into one concise summary of {npc}, keeping every distinct fact and dropping repetition.
+
+{notes}
+
+Summary of {npc}:"""
+
+
+def summary_id(npc: str) -> str:
+    return f"summary_{hashlib.sha1(npc.encode('utf-8')).hexdigest()[:16]}"
+
+
+def source_versions(docs: Sequence[Document], bodies: Dict[int, str]) -> Dict[str, str]:
+    """Page id -> last edited time (or a content hash when Notion gave no edit time)."""
+    versions = {}
+    for doc in docs:
+        page_id = doc.metadata.get("notion_id") or hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+        version = doc.metadata.get("last_edited_time")
+        if not version or version == "unknown":
+            version = hashlib.sha1(bodies.get(id(doc), doc.page_content).encode("utf-8")).hexdigest()
+        versions[page_id] = version
+    return versions
+
+
+def page_links(docs: Sequence[Document]) -> str:
+    """JSON list of {"title", "url"} for the Notion pages behind a chunk, stored as chunk metadata."""
+    links, seen = [], set()
+    for doc in docs:
+        url = doc.metadata.get("notion_url")
+        if url and url != "unknown" and url not in seen:
+            seen.add(url)
+            links.append({"title": doc.metadata.get("title") or doc.page_content, "url": url})
+    return json.dumps(links)
+
+
+def inputs_hash(versions: Dict[str, str]) -> str:
+    return hashlib.sha256(json.dumps(versions, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def split_notes(notes: Sequence[str], max_chars: int) -> List[str]:
+    """Pack notes into batches of at most max_chars (a single longer note is truncated)."""
+    batches, current = [], ""
+    for note in notes:
+        note = note[:max_chars]
+        if current and len(current) + len(note) + 2 > max_chars:
+            batches.append(current)
+            current = ""
+        current = f"{current}\n\n{note}" if current else note
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _generate(prompt: str) -> str:
+    response = get_ollama_client().generate(
+        model=config.GENERATION_MODEL, prompt=prompt, keep_alive=keep_alive_for(GENERATION)
+    )
+    return response["response"].strip()
+
+
+def summarize_npc(npc: str, notes: Sequence[str], max_chars: int = None) -> str:
+    """Hierarchical map-reduce: summarize batches of notes, then combine the partial summaries."""
+    max_chars = max_chars or config.SUMMARY_MAP_CHARS
+    batches = split_notes(notes, max_chars)
+    if not batches:
+        return ""
+    partials = [_generate(MAP_PROMPT.format(npc=npc, notes=batch)) for batch in batches]
+    while len(partials) > 1:
+        # Capping partials at half a batch guarantees each round at least halves their number
+        partials = [p[:max_chars // 2 - 2] for p in partials]
+        partials = [
+            _generate(REDUCE_PROMPT.format(npc=npc, notes=batch))
+            for batch in split_notes(partials, max_chars)
+        ]
+    return partials[0]
+
+
+def stale_summaries(collection, npc_versions: Dict[str, Dict[str, str]]) -> List[str]:
+    """NPCs whose stored summary is missing or was built from different page versions."""
+    ids = {summary_id(npc): npc for npc in npc_versions}
+    existing = collection.get(ids=list(ids), include=["metadatas"]) if ids else {"ids": [], "metadatas": []}
+    stored = {
+        ids[item_id]: (metadata or {}).get("inputs_hash")
+        for item_id, metadata in zip(existing["ids"], existing["metadatas"])
+    }
+    return [npc for npc, versions in npc_versions.items() if stored.get(npc) != inputs_hash(versions)]
+
+
+def remove_orphaned_summaries(collection, npcs) -> List[str]:
+    """Delete the summaries of NPCs that no longer have notes, e.g. after a rename; returns their ids."""
+    keep = {summary_id(npc) for npc in npcs}
+    existing = collection.get(where={"source": SUMMARY_SOURCE}, include=[])["ids"]
+    orphaned = sorted(set(existing) - keep)
+    if orphaned:
+        collection.delete(ids=orphaned)
+        logger.info(f"Removed {len(orphaned)} summaries of NPCs without notes")
+    return orphaned
+
+
+def build_npc_summaries(collection, npc_groups: Dict[str, List[Document]],
+                        bodies: Dict[int, str], cancel: CancellationToken = None) -> Tuple[List[str], List[Document]]:
+    """Summaries for NPC groups whose inputs changed since the last ingest.
+
+    `bodies` maps id(doc) to the page body, since ingest replaces page_content with the title.
+    Returns (ids, documents) ready to embed and upsert. `cancel` is checked before each NPC.
+    """
+    npc_versions = {npc: source_versions(docs, bodies) for npc, docs in npc_groups.items()}
+    stale = stale_summaries(collection, npc_versions)
+    logger.info(f"{len(stale)} of {len(npc_groups)} NPC summaries need regenerating")
+    if not stale:
+        return [], []
+
+    progress = ProgressLogger(logger, "Summarizing NPCs", total=len(stale))
+
+    def summarize(npc: str):
+        check(cancel)
+        notes = [
+            f"{doc.page_content}\n{bodies.get(id(doc), '')}".strip()
+            for doc in npc_groups[npc]
+        ]
+        try:
+            summary = summarize_npc(npc, notes)
+            progress.advance()
+            return summary
+        except Exception as e:
+            logger.error(f"Failed to summarize {npc}: {e}")
+            progress.advance(failed=1)
+            return None
+
+    # SUMMARY_WORKERS per Ollama instance, so more instances summarize proportionally faster
+    workers = max(1, config.SUMMARY_WORKERS) * len(get_ollama_client().endpoints)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        summaries = list(pool.map(summarize, stale))
+    progress.finish()
+
+    ids, documents = [], []
+    for npc, summary in zip(stale, summaries):
+        if not summary:
+            continue
+        versions = npc_versions[npc]
+        ids.append(summary_id(npc))
+        documents.append(Document(page_content=summary, metadata={
+            "About NPC": npc,
+            "document_count": len(npc_groups[npc]),
+            "source": SUMMARY_SOURCE,
+            "inputs_hash": inputs_hash(versions),
+            "source_versions": json.dumps(versions, sort_keys=True),
+            "pages": page_links(npc_groups[npc]),
+        }))
+    return ids, documents
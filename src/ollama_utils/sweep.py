@@ -0,0 +1,292 @@
+"""Sweep retrieval parameters against a labeled question set.
+
+Usage:
+    python -m src.ollama_utils.sweep labels.jsonl --recall-target 0.8 -o sweep.json
+    python -m src.ollama_utils.sweep labels.jsonl --k 2 4 8 --fetch-k 20 40 --search-ef 0 50 100
+
+Each label line is {"question": "...", "relevant": [...]} where a relevant entry is a
+chunk id, a Notion page id or an NPC name. Every configuration is scored for recall@k
+and MRR over what answer_question would put in the prompt, with p50/p95 latency of the
+search + selection stages (the query embedding is computed once per question and not timed).
+
+Chroma fixes HNSW search_ef when a collection is created, so non-zero --search-ef values
+are measured on in-memory copies of the collections; 0 means the stored collections as-is.
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+project_root = Path(__file__).parents[2]
+sys.path.append(str(project_root))
+
+from src import config
+from src.ollama_utils.answer import get_chroma_client
+from src.ollama_utils.retrieval import RetrievedChunk, embed_query, prefer_summaries, search_collections, select_chunks
+from src.telemetry.logging_setup import configure_logging
+from src.telemetry.metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_TYPES = ["mmr", "similarity"]
+DEFAULT_KS = [2, 4, 8]
+DEFAULT_FETCH_KS = [10, 20, 40, 80]
+DEFAULT_LAMBDAS = [0.3, 0.5, 0.7]
+DEFAULT_SEARCH_EFS = [0]
+COPY_BATCH_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class SweepConfig:
+    search_type: str
+    k: int
+    fetch_k: int
+    lambda_mult: Optional[float] = None
+    search_ef: int = 0
+
+    @property
+    def label(self) -> str:
+        lambda_part = f" lambda={self.lambda_mult}" if self.search_type == "mmr" else ""
+        ef_part = f" ef={self.search_ef}" if self.search_ef else ""
+        return f"{self.search_type} k={self.k} fetch_k={self.fetch_k}{lambda_part}{ef_part}"
+
+
+@dataclass
+class SweepResult:
+    config: SweepConfig
+    recall: float
+    mrr: float
+    p50: float
+    p95: float
+    mean_chunks: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self.config), "recall": self.recall, "mrr": self.mrr,
+                "p50_s": self.p50, "p95_s": self.p95, "mean_chunks": self.mean_chunks}
+
+
+def read_labels(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if not item.get("relevant"):
+                logger.warning(f"Skipping unlabeled question: {item.get('question')!r}")
+                continue
+            yield item
+
+
+def build_grid(search_types: Sequence[str], ks: Sequence[int], fetch_ks: Sequence[int],
+               lambdas: Sequence[float], search_efs: Sequence[int]) -> List[SweepConfig]:
+    grid = []
+    for search_ef in search_efs:
+        for search_type in search_types:
+            # Similarity search ignores lambda, so it only needs one configuration per (k, fetch_k)
+            type_lambdas = lambdas if search_type == "mmr" else [None]
+            for k in ks:
+                for fetch_k in fetch_ks:
+                    if fetch_k < k:
+                        continue
+                    grid.extend(SweepConfig(search_type, k, fetch_k, lambda_mult, search_ef) for lambda_mult in type_lambdas)
+    return grid
+
+
+def chunk_labels(chunk: RetrievedChunk) -> Set[str]:
+    """Everything a label file may use to name this chunk."""
+    labels = {chunk.id}
+    for key in ("notion_id", "About NPC"):
+        if chunk.metadata.get(key):
+            labels.add(str(chunk.metadata[key]))
+    # NPC summaries stand in for every page they were built from
+    if chunk.metadata.get("source_versions"):
+        labels.update(json.loads(chunk.metadata["source_versions"]))
+    return labels
+
+
+def score(chunks: Sequence[RetrievedChunk], relevant: Set[str]) -> Tuple[float, float]:
+    """(recall, reciprocal rank of the first relevant chunk) for one question."""
+    found, reciprocal_rank = set(), 0.0
+    for rank, chunk in enumerate(chunks, start=1):
+        matches = chunk_labels(chunk) & relevant
+        if matches and not reciprocal_rank:
+            reciprocal_rank = 1.0 / rank
+        found |= matches
+    return len(found) / len(relevant), reciprocal_rank
+
+
+def copy_collections(source_client, names: Sequence[str], search_ef: int):
+    """In-memory copies of the collections built with the given HNSW search_ef."""
+    import chromadb
+    from chromadb.config import Settings
+
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+    copies = []
+    for name in names:
+        source = source_client.get_collection(name=name)
+        metadata = {**(source.metadata or {}), "hnsw:search_ef": search_ef}
+        copy_name = f"sweep_ef{search_ef}_{name}"[:63]
+        try:
+            client.delete_collection(copy_name)
+        except ValueError:
+            pass
+        target = client.create_collection(name=copy_name, metadata=metadata)
+        for offset in range(0, source.count(), COPY_BATCH_SIZE):
+            batch = source.get(limit=COPY_BATCH_SIZE, offset=offset, include=["embeddings", "documents", "metadatas"])
+            target.add(ids=batch["ids"], embeddings=batch["embeddings"],
+                       documents=batch["documents"], metadatas=batch["metadatas"])
+        copies.append(copy_name)
+    return client, copies
+
+
+def evaluate(sweep_config: SweepConfig, client, collection_names: Sequence[str], labels: Sequence[Dict[str, Any]],
+             query_embeddings: Sequence[List[float]], repeat: int = 1) -> SweepResult:
+    recalls, reciprocal_ranks, samples, chunk_counts = [], [], [], []
+    for item, query_embedding in zip(labels, query_embeddings):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            # HNSW search_ef is only meaningful for Chroma, so the copies never use the exact index
+            candidates = prefer_summaries(search_collections(
+                client, query_embedding, collection_names, sweep_config.fetch_k,
+                exact=False if sweep_config.search_ef else None,
+            ))
+            chunks = select_chunks(
+                query_embedding, candidates, sweep_config.k,
+                sweep_config.lambda_mult if sweep_config.lambda_mult is not None else 0.5,
+                search_type=sweep_config.search_type,
+            )
+            samples.append(time.perf_counter() - start)
+        recall, reciprocal_rank = score(chunks, set(item["relevant"]))
+        recalls.append(recall)
+        reciprocal_ranks.append(reciprocal_rank)
+        chunk_counts.append(len(chunks))
+
+    count = len(labels) or 1
+    return SweepResult(
+        config=sweep_config,
+        recall=sum(recalls) / count,
+        mrr=sum(reciprocal_ranks) / count,
+        p50=percentile(samples, 50),
+        p95=percentile(samples, 95),
+        mean_chunks=sum(chunk_counts) / count,
+    )
+
+
+def run_sweep(labels: Sequence[Dict[str, Any]], grid: Sequence[SweepConfig], repeat: int = 1,
+              client=None) -> List[SweepResult]:
+    client = client or get_chroma_client()
+    collection_names = [collection.name for collection in client.list_collections()]
+    if not collection_names:
+        raise ValueError("No collections found; ingest a database before sweeping")
+
+    # The embedding is identical for every configuration, so compute it once per question
+    query_embeddings = [embed_query(item["question"]) for item in labels]
+
+    results = []
+    for search_ef in sorted({c.search_ef for c in grid}):
+        if search_ef:
+            logger.info(f"Copying {len(collection_names)} collections with search_ef={search_ef}")
+            target_client, target_names = copy_collections(client, collection_names, search_ef)
+        else:
+            target_client, target_names = client, collection_names
+        try:
+            for sweep_config in (c for c in grid if c.search_ef == search_ef):
+                results.append(evaluate(sweep_config, target_client, target_names, labels, query_embeddings, repeat))
+                logger.debug(f"{sweep_config.label}: recall {results[-1].recall:.3f}")
+        finally:
+            if search_ef:
+                for name in target_names:
+                    target_client.delete_collection(name)
+    return results
+
+
+def pick_cheapest(results: Sequence[SweepResult], recall_target: float) -> Optional[SweepResult]:
+    """Fewest chunks in the prompt, then lowest p95, among configurations meeting the target.
+
+    Prompt size drives generation time, which dwarfs retrieval latency.
+    """
+    passing = [r for r in results if r.recall >= recall_target]
+    if not passing:
+        return None
+    return min(passing, key=lambda r: (r.mean_chunks, r.p95, r.config.fetch_k, -r.mrr))
+
+
+def format_table(results: Sequence[SweepResult], best: Optional[SweepResult] = None) -> str:
+    lines = [f"  {'configuration':44s} {'recall':>7s} {'mrr':>6s} {'chunks':>6s} {'p50 ms':>8s} {'p95 ms':>8s}"]
+    for result in sorted(results, key=lambda r: (-r.recall, r.p95)):
+        marker = "*" if result is best else " "
+        lines.append(
+            f"{marker} {result.config.label:44s} {result.recall:7.3f} {result.mrr:6.3f} {result.mean_chunks:6.1f} "
+            f"{result.p50 * 1000:8.2f} {result.p95 * 1000:8.2f}"
+        )
+    return "\n".join(lines)
+
+
+def recommended_settings(result: SweepResult) -> Dict[str, str]:
+    settings = {
+        "NOTEKEEPER_RETRIEVAL_SEARCH_TYPE": result.config.search_type,
+        "NOTEKEEPER_RETRIEVAL_K": str(result.config.k),
+        "NOTEKEEPER_RETRIEVAL_FETCH_K": str(result.config.fetch_k),
+    }
+    if result.config.lambda_mult is not None:
+        settings["NOTEKEEPER_RETRIEVAL_LAMBDA"] = str(result.config.lambda_mult)
+    if result.config.search_ef:
+        settings["NOTEKEEPER_CHROMA_SEARCH_EF"] = str(result.config.search_ef)
+    return settings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("labels", type=Path, help="JSONL file of questions with relevant ids")
+    parser.add_argument("--search-type", nargs="+", default=DEFAULT_SEARCH_TYPES, choices=DEFAULT_SEARCH_TYPES)
+    parser.add_argument("--k", nargs="+", type=int, default=DEFAULT_KS)
+    parser.add_argument("--fetch-k", nargs="+", type=int, default=DEFAULT_FETCH_KS)
+    parser.add_argument("--lambda", dest="lambdas", nargs="+", type=float, default=DEFAULT_LAMBDAS)
+    parser.add_argument("--search-ef", nargs="+", type=int, default=DEFAULT_SEARCH_EFS,
+                        help="HNSW search_ef values; 0 uses the collections as stored")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per question and configuration")
+    parser.add_argument("--recall-target", type=float, default=0.8)
+    parser.add_argument("-o", "--output", type=Path, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    labels = list(read_labels(args.labels))
+    grid = build_grid(args.search_type, args.k, args.fetch_k, args.lambdas, args.search_ef)
+    logger.info(f"Sweeping {len(grid)} configurations over {len(labels)} labeled questions")
+
+    results = run_sweep(labels, grid, args.repeat)
+    best = pick_cheapest(results, args.recall_target)
+
+    print(format_table(results, best))
+    if best:
+        print(f"\nCheapest configuration with recall >= {args.recall_target}: {best.config.label}")
+        for name, value in recommended_settings(best).items():
+            print(f"{name}={value}")
+    else:
+        print(f"\nNo configuration reached recall {args.recall_target}")
+
+    if args.output:
+        report = {
+            "recall_target": args.recall_target,
+            "questions": len(labels),
+            "current": {
+                "search_type": config.RETRIEVAL_SEARCH_TYPE,
+                "k": config.RETRIEVAL_K,
+                "fetch_k": config.RETRIEVAL_FETCH_K,
+                "lambda_mult": config.RETRIEVAL_LAMBDA,
+            },
+            "best": best.to_dict() if best else None,
+            "results": [result.to_dict() for result in results],
+        }
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Wrote {args.output}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
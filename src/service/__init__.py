@@ -0,0 +1,7 @@
+from .client import ServiceClient, ServiceError, get_service_client
+
+__all__ = [
+    "ServiceClient",
+    "ServiceError",
+    "get_service_client"
+]
@@ -0,0 +1,277 @@
+"""Local retrieval service: owns the Chroma writer and the warm caches, shared by every bot process.
+
+Usage:
+    python -m src.service.app                      # http://NOTEKEEPER_SERVICE_HOST:NOTEKEEPER_SERVICE_PORT
+    NOTEKEEPER_SERVICE_SOCKET=/tmp/notekeeper.sock python -m src.service.app
+
+Clients (the bot, the ingest and batch CLIs, the debug scripts) talk to it through
+src.service.client when NOTEKEEPER_SERVICE_URL is set. Syncs and ingests are serialized so
+only one writer ever touches Chroma; reads go through the same process and so see its
+writes, its query embedding cache and its exact vector indexes.
+"""
+import asyncio
+import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+project_root = Path(__file__).parents[2]
+sys.path.append(str(project_root))
+
+from src import config
+from src.cancellation import OperationCancelled, operations
+from src.database.database import get_chroma_client
+from src.ollama_utils.answer import answer_question_with_details
+from src.ollama_utils.residency import residency_manager
+from src.ollama_utils.sessions import conversation_sessions
+from src.telemetry.logging_setup import configure_logging
+from src.telemetry.tracing import format_stats
+
+logger = logging.getLogger(__name__)
+
+# Held for the whole of a sync or ingest; Chroma only ever has this one writer
+_writer_lock = threading.Lock()
+_keep_warm_task = None
+
+
+class AskRequest(BaseModel):
+    question: str
+    database_ids: Optional[List[str]] = None
+    # Seconds; None uses NOTEKEEPER_ASK_DEADLINE and 0 disables it
+    deadline: Optional[float] = None
+    # Conversation key, e.g. "<guild id>:<channel id>"; follow-ups continue its context
+    session: Optional[str] = None
+    # Chosen by the client so it can cancel the question through /operations/{id}/cancel
+    operation_id: Optional[str] = None
+
+
+class AskBatchRequest(BaseModel):
+    questions: List[AskRequest]
+
+
+class SyncRequest(BaseModel):
+    database_ids: Optional[List[str]] = None
+    operation_id: Optional[str] = None
+
+
+class IngestRequest(BaseModel):
+    database_id: str
+
+
+class MaintainRequest(BaseModel):
+    # None rebuilds the fragmented collections only; see maintain_database
+    rebuild: Optional[bool] = None
+    dry_run: bool = False
+
+
+class GetRequest(BaseModel):
+    ids: Optional[List[str]] = None
+    limit: Optional[int] = None
+    offset: Optional[int] = None
+    include: List[str] = ["documents", "metadatas"]
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _answer(request: AskRequest) -> Dict[str, Any]:
+    deadline = config.ASK_DEADLINE if request.deadline is None else request.deadline
+    operation = operations.start("ask", request.question, operation_id=request.operation_id)
+    try:
+        result = answer_question_with_details(request.question, request.database_ids, deadline=deadline,
+                                              session=request.session, cancel=operation.token)
+    except OperationCancelled:
+        return {"question": request.question, "cancelled": True}
+    except Exception as e:
+        logger.error(f"Error occurred while answering question: {e}")
+        return {"question": request.question, "error": str(e)}
+    finally:
+        operations.finish(operation)
+    return {
+        "question": request.question,
+        "answer": result.answer,
+        "degraded": result.degraded,
+        "follow_up": result.follow_up,
+        # Embeddings stay in the service; clients get what they need to cite and debug
+        "chunks": [
+            {"id": chunk.id, "collection": chunk.collection, "document": chunk.document,
+             "metadata": chunk.metadata, "distance": float(chunk.distance), "related_to": chunk.related_to,
+             "rerank_score": chunk.rerank_score}
+            for chunk in result.chunks
+        ],
+        "timings": result.timings,
+        "tokens_per_second": result.tokens_per_second,
+    }
+
+
+def _write(fn, *args):
+    if not _writer_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A sync is already running")
+    try:
+        return fn(*args)
+    finally:
+        _writer_lock.release()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _keep_warm_task
+    get_chroma_client()
+    try:
+        await asyncio.to_thread(residency_manager.preload)
+        _keep_warm_task = asyncio.create_task(residency_manager.keep_warm())
+    except Exception as e:
+        # Ollama may come up after the service; the first request loads the models instead
+        logger.error(f"Failed to preload Ollama models: {e}")
+    yield
+    if _keep_warm_task is not None:
+        _keep_warm_task.cancel()
+
+
+app = FastAPI(title="NoteKeeper", lifespan=lifespan)
+
+
+@app.get("/health")
+def health():
+    collections = get_chroma_client().list_collections()
+    return {
+        "status": "ok",
+        "collections": len(collections),
+        "writing": _writer_lock.locked(),
+        "models": residency_manager.loaded_models(),
+        "sessions": conversation_sessions.stats(),
+    }
+
+
+@app.get("/health/check")
+def health_check():
+    from src.telemetry.health import run_health_check
+
+    report = run_health_check()
+    return {"report": asdict(report), "healthy": report.healthy, "table": report.format()}
+
+
+@app.post("/ask")
+def ask(request: AskRequest):
+    return _answer(request)
+
+
+@app.post("/ask/batch")
+def ask_batch(request: AskBatchRequest):
+    with ThreadPoolExecutor(max_workers=max(1, config.SERVICE_BATCH_WORKERS)) as pool:
+        return {"results": list(pool.map(_answer, request.questions))}
+
+
+@app.delete("/sessions/{session}")
+def forget_session(session: str):
+    return {"forgotten": conversation_sessions.forget(session)}
+
+
+@app.post("/sync")
+def sync(request: SyncRequest):
+    from src.notion.download import process_notion_databases
+
+    operation = operations.start("sync", ", ".join(request.database_ids or ["all databases"]),
+                                 operation_id=request.operation_id)
+    try:
+        report = _write(process_notion_databases, request.database_ids, None, operation.token)
+    finally:
+        operations.finish(operation)
+    return {
+        "results": [asdict(result) for result in report.results],
+        "duration": report.duration,
+        "failed": len(report.failed),
+        "cancelled": operation.token.cancelled,
+        "cancelled_databases": len(report.cancelled),
+        "pages": report.pages,
+        "table": report.format(),
+    }
+
+
+@app.post("/ingest")
+def ingest(request: IngestRequest):
+    from src.ollama_utils.ingest import process_and_store_embeddings
+
+    return asdict(_write(process_and_store_embeddings, request.database_id))
+
+
+@app.post("/maintenance")
+def maintenance(request: MaintainRequest):
+    from src.database.database import maintain_database
+
+    # Under the writer lock no sync can change a collection while it is copied
+    report = _write(maintain_database, request.rebuild, request.dry_run)
+    return {"report": asdict(report), "table": report.format()}
+
+
+@app.get("/operations")
+def list_operations():
+    return [
+        {"operation_id": operation.operation_id, "kind": operation.kind, "description": operation.description,
+         "started_at": operation.started_at, "cancelled": operation.token.cancelled}
+        for operation in operations.list()
+    ]
+
+
+@app.post("/operations/{operation_id}/cancel")
+def cancel_operation(operation_id: str):
+    return {"cancelled": operations.cancel(operation_id)}
+
+
+@app.get("/jobs")
+def jobs(limit: int = 20):
+    from src.database.jobs import get_job_store
+
+    return [asdict(job) for job in get_job_store().list_jobs(limit)]
+
+
+@app.get("/stats")
+def stats():
+    return {"text": format_stats() + "\n\n" + residency_manager.report()}
+
+
+@app.get("/collections")
+def collections():
+    return [{"name": collection.name, "count": collection.count(), "metadata": collection.metadata}
+            for collection in get_chroma_client().list_collections()]
+
+
+@app.post("/collections/{name}/get")
+def get_records(name: str, request: GetRequest):
+    """Read-only Collection.get, a page at a time; the debug scripts read through this."""
+    try:
+        collection = get_chroma_client().get_collection(name)
+    except ValueError:
+        raise HTTPException(status_code=404, detail=f"Collection {name} does not exist")
+    page = collection.get(ids=request.ids, limit=request.limit, offset=request.offset, include=request.include)
+    return _jsonable({key: page.get(key) for key in ["ids", *request.include]})
+
+
+def main():
+    configure_logging()
+    if config.SERVICE_SOCKET:
+        uvicorn.run(app, uds=str(config.SERVICE_SOCKET), log_config=None)
+    else:
+        uvicorn.run(app, host=config.SERVICE_HOST, port=config.SERVICE_PORT, log_config=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+
+from src import config
+from src.cancellation import OperationCancelled
+
+
+class ServiceError(RuntimeError):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"NoteKeeper service returned {status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+class RemoteCollection:
+    """Read-only stand-in for a Chroma Collection, served by the service (count and get only)."""
+
+    def __init__(self, service: "ServiceClient", name: str, count: int = None, metadata: Dict[str, Any] = None):
+        self.service = service
+        self.name = name
+        self.metadata = metadata
+        self._count = count
+
+    def count(self) -> int:
+        if self._count is None:
+            self._count = next(c["count"] for c in self.service.collections() if c["name"] == self.name)
+        return self._count
+
+    def get(self, ids: Sequence[str] = None, limit: int = None, offset: int = None,
+            include: Sequence[str] = ("documents", "metadatas")) -> Dict[str, List[Any]]:
+        return self.service._post(f"/collections/{self.name}/get", {
+            "ids": list(ids) if ids is not None else None,
+            "limit": limit,
+            "offset": offset,
+            "include": list(include),
+        })
+
+
+class ServiceClient:
+    """Thin client of src.service.app; `url` is http://host:port or unix:///path/to.sock."""
+
+    def __init__(self, url: str, http: httpx.Client = None):
+        self.url = url
+        if http is None:
+            if url.startswith("unix://"):
+                # The host part is ignored when the transport is a Unix socket
+                http = httpx.Client(transport=httpx.HTTPTransport(uds=url[len("unix://"):]), base_url="http://notekeeper")
+            else:
+                http = httpx.Client(base_url=url)
+        self.http = http
+
+    def _request(self, method: str, path: str, timeout: Optional[float] = None, **kwargs) -> Any:
+        response = self.http.request(method, path, timeout=timeout, **kwargs)
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text
+            raise ServiceError(response.status_code, str(detail))
+        return response.json()
+
+    def _post(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        return self._request("POST", path, timeout=timeout or config.SERVICE_TIMEOUT, json=payload)
+
+    def health(self) -> Dict[str, Any]:
+        return self._request("GET", "/health", timeout=config.SERVICE_TIMEOUT)
+
+    def health_check(self) -> Dict[str, Any]:
+        """Backend latency self-test as {"report", "healthy", "table"}; see src.telemetry.health."""
+        return self._request("GET", "/health/check", timeout=None)
+
+    def ask(self, question: str, database_ids: List[str] = None, deadline: float = None,
+            session: str = None, operation_id: str = None) -> Dict[str, Any]:
+        """{"answer", "degraded", "chunks", "timings", ...}, or {"error"} if answering raised, or {"cancelled"}."""
+        payload = {"question": question, "database_ids": database_ids, "deadline": deadline, "session": session,
+                   "operation_id": operation_id}
+        return self._post("/ask", payload, timeout=self._ask_timeout(deadline))
+
+    def ask_batch(self, questions: List[Dict[str, Any]], deadline: float = None) -> List[Dict[str, Any]]:
+        payload = {"questions": [
+            {"question": item["question"], "database_ids": item.get("database_ids"), "deadline": deadline,
+             "session": item.get("session")}
+            for item in questions
+        ]}
+        # A batch has no overall deadline, only one per question
+        return self._request("POST", "/ask/batch", timeout=None, json=payload)["results"]
+
+    def answer_question(self, question: str, database_ids: List[str] = None, session: str = None,
+                        operation_id: str = None) -> str:
+        result = self.ask(question, database_ids, session=session, operation_id=operation_id)
+        if result.get("cancelled"):
+            raise OperationCancelled()
+        if "error" in result:
+            return "Sorry, I couldn't find an answer to that question."
+        return result["answer"]
+
+    def forget(self, session: str) -> bool:
+        """End a conversation; False if there was none."""
+        return self._request("DELETE", f"/sessions/{session}", timeout=config.SERVICE_TIMEOUT)["forgotten"]
+
+    def sync(self, database_ids: List[str] = None, operation_id: str = None) -> Dict[str, Any]:
+        """Sync report as {"results", "failed", "cancelled", "cancelled_databases", "pages", "duration", "table"}; raises ServiceError 409 while one runs."""
+        return self._request("POST", "/sync", timeout=None,
+                             json={"database_ids": database_ids or None, "operation_id": operation_id})
+
+    def cancel(self, operation_id: str) -> bool:
+        """Cancel a question or sync started with this operation id; False if it is not running."""
+        return self._request("POST", f"/operations/{operation_id}/cancel", timeout=config.SERVICE_TIMEOUT)["cancelled"]
+
+    def operations(self) -> List[Dict[str, Any]]:
+        return self._request("GET", "/operations", timeout=config.SERVICE_TIMEOUT)
+
+    def jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Recent ingest jobs, newest first, as IngestJob fields."""
+        return self._request("GET", "/jobs", timeout=config.SERVICE_TIMEOUT, params={"limit": limit})
+
+    def ingest(self, database_id: str) -> Dict[str, Any]:
+        return self._request("POST", "/ingest", timeout=None, json={"database_id": database_id})
+
+    def maintain(self, rebuild: bool = None, dry_run: bool = False) -> Dict[str, Any]:
+        """Maintenance report as {"report", "table"}; raises ServiceError 409 while a sync runs."""
+        return self._request("POST", "/maintenance", timeout=None, json={"rebuild": rebuild, "dry_run": dry_run})
+
+    def stats(self) -> str:
+        return self._request("GET", "/stats", timeout=config.SERVICE_TIMEOUT)["text"]
+
+    def collections(self) -> List[Dict[str, Any]]:
+        return self._request("GET", "/collections", timeout=config.SERVICE_TIMEOUT)
+
+    # The two methods below match chromadb's client so read-only code accepts either
+    def list_collections(self) -> List[RemoteCollection]:
+        return [RemoteCollection(self, c["name"], c["count"], c["metadata"]) for c in self.collections()]
+
+    def get_collection(self, name: str) -> RemoteCollection:
+        return RemoteCollection(self, name)
+
+    def _ask_timeout(self, deadline: Optional[float]) -> Optional[float]:
+        deadline = config.ASK_DEADLINE if deadline is None else deadline
+        # The service enforces the deadline; leave it room to send the degraded answer back
+        return deadline + config.SERVICE_TIMEOUT if deadline else None
+
+
+_lock = threading.Lock()
+_service_client: Optional[ServiceClient] = None
+
+
+def get_service_client() -> Optional[ServiceClient]:
+    """Shared client of the local service, or None when NOTEKEEPER_SERVICE_URL is unset (run in-process)."""
+    global _service_client
+    if not config.SERVICE_URL:
+        return None
+    with _lock:
+        if _service_client is None or _service_client.url != config.SERVICE_URL:
+            _service_client = ServiceClient(config.SERVICE_URL)
+        return _service_client
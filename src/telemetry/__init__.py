@@ -0,0 +1,14 @@
+from .metrics import Counter, LatencyHistogram, degradations, http_latency, percentile
+from .logging_setup import configure_logging, redact, SampledLogger, ProgressLogger
+
+__all__ = [
+    'Counter',
+    'LatencyHistogram',
+    'degradations',
+    'http_latency',
+    'percentile',
+    'configure_logging',
+    'redact',
+    'SampledLogger',
+    'ProgressLogger',
+]
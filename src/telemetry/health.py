@@ -0,0 +1,228 @@
+"""Backend self-test for triaging a slow /ask.
+
+Usage:
+    python -m src.telemetry.health          # through the service when NOTEKEEPER_SERVICE_URL is set
+
+Times a minimal embed and generate call against each Ollama instance, a count and a
+top-k query on every Chroma collection and a Notion users.list (the call notion_api.py
+uses to check the key), and reports each against its NOTEKEEPER_HEALTH_* threshold alongside which models
+were loaded and the cache hit rates.
+"""
+import logging
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+project_root = Path(__file__).parents[2]
+sys.path.append(str(project_root))
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+OK = "ok"
+SLOW = "slow"
+FAILED = "failed"
+
+
+@dataclass
+class BackendCheck:
+    name: str
+    threshold_ms: float
+    latency_ms: Optional[float] = None
+    error: Optional[str] = None
+    detail: str = ""
+
+    @property
+    def status(self) -> str:
+        if self.error is not None:
+            return FAILED
+        return SLOW if self.latency_ms > self.threshold_ms else OK
+
+
+@dataclass
+class ModelState:
+    role: str
+    model: str
+    # Whether Ollama had the model loaded before the checks ran; a cold model explains a slow call
+    loaded: bool
+
+
+@dataclass
+class CacheState:
+    name: str
+    size: int
+    hits: int
+    misses: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def status(self) -> str:
+        if self.hits + self.misses < config.HEALTH_MIN_CACHE_LOOKUPS:
+            return OK
+        return SLOW if self.hit_rate < config.HEALTH_MIN_CACHE_HIT_RATE else OK
+
+
+@dataclass
+class HealthReport:
+    checks: List[BackendCheck] = field(default_factory=list)
+    models: List[ModelState] = field(default_factory=list)
+    collections: Dict[str, int] = field(default_factory=dict)
+    caches: List[CacheState] = field(default_factory=list)
+    sessions: Dict[str, int] = field(default_factory=dict)
+    # Per-instance load and throughput when several Ollama instances are configured
+    endpoints: List[Dict[str, Any]] = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return all(check.status == OK for check in self.checks) and all(cache.status == OK for cache in self.caches)
+
+    def format(self) -> str:
+        lines = [f"{'check':36s} {'ms':>8s} {'limit':>7s} {'status':>7s}"]
+        for check in self.checks:
+            latency = f"{check.latency_ms:8.1f}" if check.latency_ms is not None else f"{'-':>8s}"
+            lines.append(f"{check.name[:36]:36s} {latency} {check.threshold_ms:7.0f} {check.status:>7s}"
+                         + (f"  {check.error}" if check.error else f"  {check.detail}" if check.detail else ""))
+        lines.append("")
+        lines.append(f"{'role':11s} {'model':24s} {'loaded':>6s}")
+        for model in self.models:
+            lines.append(f"{model.role:11s} {model.model[:24]:24s} {'yes' if model.loaded else 'no':>6s}")
+        lines.append("")
+        lines.append(f"{'cache':24s} {'size':>7s} {'lookups':>8s} {'hit rate':>8s} {'status':>7s}")
+        for cache in self.caches:
+            lines.append(f"{cache.name[:24]:24s} {cache.size:7d} {cache.hits + cache.misses:8d} "
+                         f"{cache.hit_rate:8.0%} {cache.status:>7s}")
+        lines.append(f"{'sessions':24s} {self.sessions.get('sessions', 0):7d} ({self.sessions.get('bytes', 0)} bytes)")
+        if self.endpoints:
+            lines.append("")
+            lines.append(f"{'ollama instance':32s} {'up':>3s} {'busy':>5s} {'failed':>7s} {'req/s':>6s}")
+            for endpoint in self.endpoints:
+                lines.append(f"{endpoint['host'][:32]:32s} {'yes' if endpoint['up'] else 'no':>3s} "
+                             f"{endpoint['outstanding']:5d} {endpoint['failures']:7d} {endpoint['requests_per_second']:6.1f}")
+        lines.append("")
+        lines.append(f"{len(self.collections)} collection(s), {sum(self.collections.values())} vectors; "
+                     f"{'healthy' if self.healthy else 'DEGRADED'} after {self.duration:.1f}s")
+        return "\n".join(lines)
+
+
+def _timed(name: str, threshold_ms: float, call: Callable[[], Any]) -> Tuple[BackendCheck, Any]:
+    check = BackendCheck(name, threshold_ms)
+    start = time.perf_counter()
+    try:
+        result = call()
+    except Exception as e:
+        check.error = f"{type(e).__name__}: {e}"[:120]
+        logger.error(f"Health check {name} failed: {e}")
+        return check, None
+    check.latency_ms = (time.perf_counter() - start) * 1000
+    return check, result
+
+
+def _model_states() -> List[ModelState]:
+    from src.ollama_utils.residency import residency_manager
+
+    loaded = residency_manager.loaded_models()
+    return [
+        ModelState(role, model, any(name.split(":")[0] == model.split(":")[0] for name in loaded))
+        for role, model in residency_manager.models.items()
+    ]
+
+
+def _cache_states() -> List[CacheState]:
+    from src.ollama_utils.rerank import score_cache
+    from src.ollama_utils.retrieval import _partition_caches, _partition_lock, query_embedding_cache
+
+    caches = [CacheState("query embeddings", len(query_embedding_cache), query_embedding_cache.hits,
+                         query_embedding_cache.misses)]
+    with _partition_lock:
+        partitions = list(_partition_caches.values())
+    if partitions:
+        caches.append(CacheState(f"guild embeddings ({len(partitions)})", sum(len(cache) for cache in partitions),
+                                 sum(cache.hits for cache in partitions), sum(cache.misses for cache in partitions)))
+    caches.append(CacheState("rerank scores", len(score_cache), score_cache.hits, score_cache.misses))
+    return caches
+
+
+def run_health_check() -> HealthReport:
+    """Time one minimal call per backend; a failing backend is reported, never raised."""
+    from src.clients import get_notion_client, get_ollama_client
+    from src.database.database import get_chroma_client
+    from src.ollama_utils.residency import EMBEDDING, GENERATION, keep_alive_for
+    from src.ollama_utils.sessions import conversation_sessions
+
+    start = time.perf_counter()
+    report = HealthReport()
+    # Read before the calls below, which load any model that was not
+    report.models = _model_states()
+    ollama = get_ollama_client()
+    # With several instances each is timed on its own, so one slow instance stands out
+    targets = [("", ollama)] if len(ollama.endpoints) == 1 else [
+        (f" {endpoint.host}", endpoint.client) for endpoint in ollama.endpoints
+    ]
+    query_embedding = None
+    for suffix, client in targets:
+        check, response = _timed(f"ollama embed{suffix}", config.HEALTH_EMBED_MS, lambda: client.embeddings(
+            model=config.EMBEDDING_MODEL, prompt="health check", keep_alive=keep_alive_for(EMBEDDING)))
+        report.checks.append(check)
+        if response and query_embedding is None:
+            query_embedding = response["embedding"]
+
+        check, response = _timed(f"ollama generate{suffix}", config.HEALTH_GENERATE_MS, lambda: client.generate(
+            model=config.GENERATION_MODEL, prompt="Reply with OK.", options={"num_predict": 1},
+            keep_alive=keep_alive_for(GENERATION)))
+        if response and response.get("load_duration"):
+            check.detail = f"load {response['load_duration'] / 1e6:.0f} ms"
+        report.checks.append(check)
+    if len(ollama.endpoints) > 1:
+        report.endpoints = ollama.stats()
+
+    check, collections = _timed("chroma list", config.HEALTH_CHROMA_COUNT_MS,
+                                lambda: get_chroma_client().list_collections())
+    report.checks.append(check)
+    for collection in collections or []:
+        check, count = _timed(f"chroma count {collection.name}", config.HEALTH_CHROMA_COUNT_MS, collection.count)
+        report.checks.append(check)
+        if count is None:
+            continue
+        report.collections[collection.name] = count
+        if count == 0 or query_embedding is None:
+            continue
+        check, _ = _timed(f"chroma query {collection.name}", config.HEALTH_CHROMA_QUERY_MS, lambda: collection.query(
+            query_embeddings=[query_embedding], n_results=min(config.RETRIEVAL_FETCH_K, count), include=["distances"]))
+        report.checks.append(check)
+
+    check, _ = _timed("notion users.list", config.HEALTH_NOTION_MS,
+                      lambda: get_notion_client().users.list(page_size=1))
+    report.checks.append(check)
+
+    report.caches = _cache_states()
+    report.sessions = conversation_sessions.stats()
+    report.duration = time.perf_counter() - start
+    return report
+
+
+def main():
+    from src.service.client import get_service_client
+    from src.telemetry.logging_setup import configure_logging
+
+    configure_logging()
+    service = get_service_client()
+    if service is not None:
+        # The service's caches and loaded models are the ones /ask uses
+        result = service.health_check()
+        print(result["table"])
+        sys.exit(0 if result["healthy"] else 1)
+    report = run_health_check()
+    print(report.format())
+    sys.exit(0 if report.healthy else 1)
+
+
+if __name__ == "__main__":
+    main()
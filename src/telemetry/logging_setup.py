@@ -0,0 +1,126 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Optional
+
+from src import config
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+
+# Third-party loggers that emit a line per HTTP request at INFO
+NOISY_LOGGERS = ("httpx", "httpcore", "chromadb", "backoff")
+
+_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: str = None) -> logging.handlers.QueueListener:
+    """Route all logging through a queue drained by a background thread.
+
+    Safe to call more than once; only the first call installs handlers.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        handlers = [logging.StreamHandler(sys.stdout)]
+        if config.LOG_FILE:
+            handlers.append(logging.handlers.RotatingFileHandler(
+                config.LOG_FILE, maxBytes=10 * 1024 * 1024, backupCount=5, encoding="utf-8"
+            ))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        root.setLevel(level or config.LOG_LEVEL)
+        for name in NOISY_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        return _listener
+
+
+def redact(text: Any) -> str:
+    """Page content, prompts and answers only appear in logs when NOTEKEEPER_LOG_CONTENT is set."""
+    text = str(text)
+    if config.LOG_CONTENT:
+        return text
+    return f"<{len(text)} chars redacted>"
+
+
+class SampledLogger:
+    """Logs the first and then every `every`-th message per key, e.g. per-document debug lines."""
+
+    def __init__(self, logger: logging.Logger, every: int = None):
+        self.logger = logger
+        self.every = max(1, every or config.LOG_SAMPLE_EVERY)
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def log(self, level: int, key: str, msg: str, *args, **kwargs):
+        if not self.logger.isEnabledFor(level):
+            return
+        with self._lock:
+            count = self._counts[key]
+            self._counts[key] = count + 1
+        if count % self.every == 0:
+            suffix = f" (sampled 1/{self.every}, #{count + 1})" if self.every > 1 else ""
+            self.logger.log(level, msg + suffix, *args, **kwargs)
+
+    def debug(self, key: str, msg: str, *args, **kwargs):
+        self.log(logging.DEBUG, key, msg, *args, **kwargs)
+
+    def warning(self, key: str, msg: str, *args, **kwargs):
+        self.log(logging.WARNING, key, msg, *args, **kwargs)
+
+    def error(self, key: str, msg: str, *args, **kwargs):
+        self.log(logging.ERROR, key, msg, *args, **kwargs)
+
+
+class ProgressLogger:
+    """Aggregate progress lines for a loop, emitted at most once per interval."""
+
+    def __init__(self, logger: logging.Logger, label: str, total: Optional[int] = None, interval: float = None):
+        self.logger = logger
+        self.label = label
+        self.total = total
+        self.interval = config.LOG_PROGRESS_INTERVAL if interval is None else interval
+        self.done = 0
+        self.failed = 0
+        self._start = time.monotonic()
+        self._last = self._start
+        self._lock = threading.Lock()
+
+    def advance(self, count: int = 1, failed: int = 0):
+        with self._lock:
+            self.done += count
+            self.failed += failed
+            now = time.monotonic()
+            if now - self._last < self.interval:
+                return
+            self._last = now
+        self._emit()
+
+    def finish(self):
+        self._emit(final=True)
+
+    def _emit(self, final: bool = False):
+        elapsed = time.monotonic() - self._start
+        rate = self.done / elapsed if elapsed else 0.0
+        total = f"/{self.total}" if self.total is not None else ""
+        failed = f", {self.failed} failed" if self.failed else ""
+        state = "done" if final else "progress"
+        self.logger.info(f"{self.label} {state}: {self.done}{total}{failed} in {elapsed:.1f}s ({rate:.1f}/s)")
@@ -0,0 +1,109 @@
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, List
+
+# Number of most recent samples kept per series
+DEFAULT_WINDOW = 1024
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class LatencyHistogram:
+    """Rolling window of latency samples (in seconds) keyed by series name."""
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.window))
+        self._counts: Dict[str, int] = defaultdict(int)
+        self._errors: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, error: bool = False):
+        with self._lock:
+            self._samples[name].append(seconds)
+            self._counts[name] += 1
+            if error:
+                self._errors[name] += 1
+
+    @contextmanager
+    def time(self, name: str):
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, error=error)
+
+    def summary(self, name: str) -> Dict[str, float]:
+        with self._lock:
+            samples = list(self._samples.get(name, ()))
+            count = self._counts.get(name, 0)
+            errors = self._errors.get(name, 0)
+        return {
+            "count": count,
+            "errors": errors,
+            "p50": percentile(samples, 50),
+            "p95": percentile(samples, 95),
+            "p99": percentile(samples, 99),
+            "max": max(samples) if samples else 0.0,
+        }
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            names = list(self._samples.keys())
+        return {name: self.summary(name) for name in sorted(names)}
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._errors.clear()
+
+
+class Counter:
+    """Event counts keyed by name."""
+
+    def __init__(self):
+        self._counts: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(sorted(self._counts.items()))
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+# Per-endpoint HTTP latency for the shared Ollama and Notion clients
+http_latency = LatencyHistogram()
+
+# Request latency per Ollama instance when several are configured, keyed by host
+ollama_endpoint_latency = LatencyHistogram()
+
+# Per-stage latency of the /ask and ingest pipelines
+stage_latency = LatencyHistogram()
+
+# Ollama generation throughput in tokens/sec, keyed by model
+generation_throughput = LatencyHistogram()
+
+# /ask answers that were cut short or fell back, keyed by "<stage>.<outcome>"
+degradations = Counter()
@@ -0,0 +1,127 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Mapping, Optional
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+from src import config
+from src.telemetry.metrics import degradations, generation_throughput, stage_latency
+
+_lock = threading.Lock()
+_tracer = None
+
+
+class JSONLinesSpanExporter(SpanExporter):
+    """OpenTelemetry span exporter that appends one JSON object per span to a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(span.to_json(indent=None) + "\n")
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+def _build_tracer():
+    if config.TRACE_EXPORTER in ("file", "otlp"):
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+        if config.TRACE_EXPORTER == "otlp":
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            exporter = OTLPSpanExporter()
+        else:
+            exporter = JSONLinesSpanExporter(config.TRACE_FILE)
+
+        provider = TracerProvider(resource=Resource.create({"service.name": "notekeeper"}))
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+        trace.set_tracer_provider(provider)
+
+    return trace.get_tracer("notekeeper")
+
+
+def get_tracer():
+    global _tracer
+    with _lock:
+        if _tracer is None:
+            _tracer = _build_tracer()
+        return _tracer
+
+
+@contextmanager
+def span(name: str, timings: Optional[Dict[str, float]] = None, **attributes: Any):
+    """Trace a pipeline stage and record its duration in the stage histogram.
+
+    If `timings` is given, the stage duration in seconds is also stored in it under `name`.
+    """
+    start = time.perf_counter()
+    error = False
+    with get_tracer().start_as_current_span(name, attributes=attributes) as current:
+        try:
+            yield current
+        except BaseException:
+            error = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            stage_latency.record(name, elapsed, error=error)
+            if timings is not None:
+                timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def tokens_per_second(response: Mapping[str, Any]) -> Optional[float]:
+    """Generation speed from an Ollama response's eval_count/eval_duration (nanoseconds)."""
+    eval_count = response.get("eval_count")
+    eval_duration = response.get("eval_duration")
+    if not eval_count or not eval_duration:
+        return None
+    return eval_count / (eval_duration / 1e9)
+
+
+def record_generation(response: Mapping[str, Any], current_span=None) -> Optional[float]:
+    """Record tokens/sec of an Ollama generate response in the throughput histogram."""
+    speed = tokens_per_second(response)
+    if speed is None:
+        return None
+    generation_throughput.record(response.get("model") or "unknown", speed)
+    if current_span is not None:
+        current_span.set_attribute("ollama.eval_count", response["eval_count"])
+        current_span.set_attribute("ollama.eval_duration_ns", response["eval_duration"])
+        current_span.set_attribute("ollama.prompt_eval_count", response.get("prompt_eval_count") or 0)
+        current_span.set_attribute("ollama.tokens_per_second", speed)
+    return speed
+
+
+def format_stats() -> str:
+    """Plain-text table of per-stage p50/p95 and generation tokens/sec."""
+    lines = [f"{'stage':28s} {'count':>7s} {'p50 ms':>9s} {'p95 ms':>9s}"]
+    for name, summary in stage_latency.snapshot().items():
+        lines.append(f"{name:28s} {summary['count']:7d} {summary['p50'] * 1000:9.1f} {summary['p95'] * 1000:9.1f}")
+    throughput = generation_throughput.snapshot()
+    if throughput:
+        lines.append("")
+        lines.append(f"{'model':28s} {'count':>7s} {'p50 tok/s':>9s} {'p95 tok/s':>9s}")
+        for model, summary in throughput.items():
+            lines.append(f"{model:28s} {summary['count']:7d} {summary['p50']:9.1f} {summary['p95']:9.1f}")
+    degraded = degradations.snapshot()
+    if degraded:
+        lines.append("")
+        lines.append(f"{'degradation':28s} {'count':>7s}")
+        for name, count in degraded.items():
+            lines.append(f"{name:28s} {count:7d}")
+    if len(lines) == 1:
+        return "No requests recorded yet."
+    return "\n".join(lines)
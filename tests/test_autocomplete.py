@@ -0,0 +1,59 @@
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+from langchain_core.documents import Document
+from src.ollama_utils.autocomplete import PrefixIndex, names_from_docs
+
+
+def test_lookup_matches_any_word_prefix():
+    index = PrefixIndex()
+    index.update("db1", ["Lord Varis", "Varrick's Tavern", "Élodie Marsh"])
+    assert index.lookup("var") == ["Varrick's Tavern", "Lord Varis"]
+    assert index.lookup("lord v") == ["Lord Varis"]
+    assert index.lookup("elo") == ["Élodie Marsh"]
+    assert index.lookup("zz") == []
+
+
+def test_suggest_replaces_the_fragment_being_typed():
+    index = PrefixIndex()
+    index.update("db1", ["Lord Varis", "Varrick"])
+    suggestions = index.suggest("Who is lord va")
+    assert suggestions[0] == "Who is Lord Varis"
+    assert "Who is lord Varrick" in suggestions
+    assert index.suggest("Who is ") == []
+
+
+def test_update_replaces_only_that_databases_names():
+    index = PrefixIndex()
+    index.update("db1", ["Shared Name", "Old Name"])
+    index.update("db2", ["Shared Name"])
+    index.update("db1", ["New Name"])
+    assert index.lookup("name") == ["New Name", "Shared Name"]
+    index.update("db2", [])
+    assert index.lookup("sha") == []
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = PrefixIndex()
+    index.update("db1", names_from_docs([
+        Document(page_content="", metadata={"title": "Session 12", "notion_properties": {"About NPC": ["Mira"]}}),
+    ]))
+    index.save(tmp_path / "autocomplete.json")
+    restored = PrefixIndex()
+    assert restored.load(tmp_path / "autocomplete.json")
+    assert restored.lookup("mi") == ["Mira"]
+    assert restored.lookup("session") == ["Session 12"]
+
+
+def test_lookup_is_sub_millisecond_on_large_index():
+    index = PrefixIndex()
+    index.update("db1", [f"Character {i} of House {i % 97}" for i in range(20000)])
+    start = time.perf_counter()
+    for _ in range(100):
+        index.suggest("Tell me about character 12")
+    assert (time.perf_counter() - start) / 100 < 0.001
@@ -0,0 +1,52 @@
+import io
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+from src.ollama_utils import batch
+from src.ollama_utils.cache import LRUCache
+from src.ollama_utils.retrieval import AnswerResult
+
+
+def test_read_questions_accepts_strings_and_objects(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    path.write_text('"Who is Ireena?"\n\n{"id": "q2", "question": "Where is Vallaki?", "database_ids": ["db1"]}\n')
+    questions = list(batch.read_questions(path))
+    assert questions[0] == {"question": "Who is Ireena?", "id": 1}
+    assert questions[1]["id"] == "q2"
+    assert questions[1]["database_ids"] == ["db1"]
+
+
+def test_run_batch_writes_answers_and_errors():
+    def fake_answer(question, database_ids=None):
+        if question == "boom":
+            raise RuntimeError("Ollama is down")
+        return AnswerResult(answer=f"answer to {question}", timings={"ask": 0.1})
+
+    output = io.StringIO()
+    with patch.object(batch, "answer_question_with_details", side_effect=fake_answer), \
+            patch.object(batch, "get_chroma_client"):
+        summary = batch.run_batch([{"id": 1, "question": "hi"}, {"id": 2, "question": "boom"}], output, concurrency=2)
+
+    records = {r["id"]: r for r in map(json.loads, output.getvalue().splitlines())}
+    assert records[1]["answer"] == "answer to hi"
+    assert records[1]["timings"] == {"ask": 0.1}
+    assert records[2]["error"] == "Ollama is down"
+    assert summary["questions"] == 2
+    assert summary["failures"] == 1
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get_or_compute("a", lambda: 99) == 1
+    assert cache.stats()["hits"] == 2
@@ -0,0 +1,113 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+import pytest
+from benchmarks.fakes import FakeNotionServer, FakeOllamaServer, SyntheticDatabase
+from benchmarks.run import configure
+from src import config
+from src.cancellation import CancellationToken, OperationCancelled, OperationRegistry
+from src.clients import close_clients
+from src.database.jobs import CANCELLED, DONE
+from src.ollama_utils import retrieval
+from src.ollama_utils.deadline import Deadline
+
+
+def test_registry_cancels_by_id():
+    registry = OperationRegistry()
+    ask = registry.start("ask", "Who is Mira?", guild_id=1, user="gm")
+    registry.start("sync", "Strahd", guild_id=2)
+    woken = []
+    ask.token.on_cancel(lambda: woken.append(True))
+    assert [op.kind for op in registry.list(guild_id=1)] == ["ask"]
+    assert registry.cancel(ask.operation_id) and woken == [True]
+    with pytest.raises(OperationCancelled):
+        ask.token.check()
+    registry.finish(ask)
+    assert not registry.cancel(ask.operation_id)
+    assert CancellationToken().wait(0.01) is False
+
+
+def test_only_the_owner_or_a_manager_may_cancel():
+    registry = OperationRegistry()
+    ask = registry.start("ask", "Who is Mira?", guild_id=1, user="gm", user_id=42)
+    sync = registry.start("sync", "Strahd", guild_id=1)
+    assert ask.cancellable_by(42)
+    # Another member, even one who renamed themselves "gm", may not
+    assert not ask.cancellable_by(7)
+    assert ask.cancellable_by(7, manage_guild=True)
+    assert not sync.cancellable_by(42) and sync.cancellable_by(42, manage_guild=True)
+
+
+class EndlessStream:
+    """Stands in for the Ollama client: streams a word every 10 ms until closed."""
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def generate(self, **kwargs):
+        try:
+            while True:
+                time.sleep(0.01)
+                yield {"model": "m", "response": "word ", "done": False}
+        finally:
+            self.closed.set()
+
+
+def test_cancel_stops_generation_and_closes_the_stream(monkeypatch):
+    ollama = EndlessStream()
+    monkeypatch.setattr(retrieval, "get_ollama_client", lambda: ollama)
+    token = CancellationToken()
+    threading.Timer(0.1, token.cancel).start()
+    start = time.perf_counter()
+    with pytest.raises(OperationCancelled):
+        # No deadline: only the cancellation ends it
+        retrieval.generate_streaming("prompt", Deadline(), cancel=token)
+    assert time.perf_counter() - start < 0.3
+    assert ollama.closed.wait(1)
+
+
+@pytest.fixture
+def stand_ins(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "NPC_SUMMARIES_ENABLED", False)
+    monkeypatch.setattr(config, "INGEST_BATCH_SIZE", 1)
+    with FakeOllamaServer() as ollama, FakeNotionServer([SyntheticDatabase("db1", 20, npc_count=4)]) as notion:
+        configure(ollama.url, notion.url, str(tmp_path))
+        yield
+    close_clients()
+
+
+def test_cancelled_sync_stops_between_batches_and_resumes(stand_ins, monkeypatch):
+    from src.database.database import get_chroma_client
+    from src.notion.download import process_notion_databases
+    from src.ollama_utils import ingest
+
+    token = CancellationToken()
+    create_embeddings = ingest.create_embeddings
+
+    def cancel_after_second(docs, progress=None):
+        result = create_embeddings(docs, progress)
+        if progress.done == 2:
+            token.cancel()
+        return result
+
+    monkeypatch.setattr(ingest, "create_embeddings", cancel_after_second)
+    report = process_notion_databases(["db1"], cancel=token)
+    assert report.results[0].cancelled and report.results[0].error is None
+    # Cancelled on request, so not a failure
+    assert not report.failed and len(report.cancelled) == 1
+    assert "Synced 0/1 databases (1 cancelled)" in report.format()
+    job = ingest.get_job_store().list_jobs()[0]
+    assert job.status == CANCELLED and job.chunks_written == 2
+    # Both batches that started were written whole
+    assert get_chroma_client().get_collection("notion_db1").count() == 2
+
+    monkeypatch.setattr(ingest, "create_embeddings", create_embeddings)
+    job = ingest.process_and_store_embeddings("db1")
+    assert job.status == DONE and job.chunks_written == 4
+    assert get_chroma_client().get_collection("notion_db1").count() == 4
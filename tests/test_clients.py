@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+import httpx
+import pytest
+from src.clients import registry
+from src.telemetry.metrics import LatencyHistogram, http_latency, percentile
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry():
+    registry.close_clients()
+    http_latency.reset()
+    yield
+    registry.close_clients()
+
+
+def test_ollama_client_is_shared():
+    assert registry.get_ollama_client() is registry.get_ollama_client()
+
+
+def test_notion_client_is_shared(monkeypatch):
+    monkeypatch.setattr(registry.config, "NOTION_API_KEY", "test_api_key")
+    assert registry.get_notion_client() is registry.get_notion_client()
+
+
+def test_notion_client_requires_key(monkeypatch):
+    monkeypatch.setattr(registry.config, "NOTION_API_KEY", None)
+    with pytest.raises(ValueError):
+        registry.get_notion_client()
+
+
+def test_embeddings_and_llm_are_cached_per_model():
+    assert registry.get_embeddings("m1") is registry.get_embeddings("m1")
+    assert registry.get_embeddings("m1") is not registry.get_embeddings("m2")
+    assert registry.get_llm("m1") is registry.get_llm("m1")
+
+
+def test_latency_hooks_record_per_endpoint():
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json={}))
+    with httpx.Client(transport=transport, event_hooks=registry._latency_hooks("notion")) as client:
+        client.get("https://api.notion.com/v1/pages/0f4e3c9a-1b2c-4d5e-8f90-123456789abc")
+        client.get("https://api.notion.com/v1/pages/1f4e3c9a1b2c4d5e8f90123456789abc")
+    metrics = registry.get_latency_metrics()
+    assert metrics["notion GET /v1/pages/:id"]["count"] == 2
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram(window=100)
+    for i in range(1, 101):
+        histogram.record("stage", i / 100)
+    summary = histogram.summary("stage")
+    assert summary["count"] == 100
+    assert summary["p50"] == 0.5
+    assert summary["p95"] == 0.95
+    assert percentile([], 50) == 0.0
@@ -0,0 +1,92 @@
+import json
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+import pytest
+from src.ollama_utils import answer, retrieval
+from src.ollama_utils.deadline import Deadline, DeadlineExceeded
+from src.ollama_utils.retrieval import RetrievedChunk
+from src.telemetry.metrics import degradations
+
+
+class SlowStream:
+    """Stands in for the Ollama client: streams one word every `delay` seconds."""
+
+    def __init__(self, words, delay):
+        self.words, self.delay = words, delay
+
+    def generate(self, **kwargs):
+        assert kwargs["stream"] is True
+        for i, word in enumerate(self.words):
+            time.sleep(self.delay)
+            yield {"model": "m", "response": word + " ", "done": i == len(self.words) - 1,
+                   "eval_count": len(self.words), "eval_duration": 1_000_000}
+
+
+def test_deadline_run_times_out():
+    with pytest.raises(DeadlineExceeded) as raised:
+        Deadline(0.05).run("embed", time.sleep, 1)
+    assert raised.value.stage == "embed"
+    assert Deadline(1).run("embed", lambda: 42, cap=0.5) == 42
+    # Without a deadline stages are not bounded
+    assert Deadline().timeout(cap=1) is None
+
+
+def test_generate_streaming_stops_at_deadline(monkeypatch):
+    monkeypatch.setattr(retrieval, "get_ollama_client", lambda: SlowStream(["word"] * 50, 0.02))
+    start = time.perf_counter()
+    response, finished = retrieval.generate_streaming("prompt", Deadline(0.2))
+    assert time.perf_counter() - start < 0.4
+    assert not finished
+    assert 0 < len(response["response"].split()) < 50
+
+    monkeypatch.setattr(retrieval, "get_ollama_client", lambda: SlowStream(["all", "done"], 0))
+    response, finished = retrieval.generate_streaming("prompt", Deadline(1))
+    assert finished
+    assert response["response"] == "all done "
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    chunk = RetrievedChunk(
+        id="npc_1", collection="notion_a", document="Mira\nTavern", embedding=[1.0, 0.0],
+        metadata={"About NPC": "Mira", "pages": json.dumps([{"title": "Tavern", "url": "https://notion.so/tavern"}])},
+    )
+    client = SimpleNamespace(list_collections=lambda: [SimpleNamespace(name="notion_a")])
+    monkeypatch.setattr(answer, "get_chroma_client", lambda: client)
+    monkeypatch.setattr(answer, "embed_query", lambda question, **kwargs: [1.0, 0.0])
+    monkeypatch.setattr(answer, "search_collections", lambda *args, **kwargs: {"notion_a": [chunk]})
+    degradations.reset()
+    return monkeypatch
+
+
+def test_slow_generation_falls_back_to_page_links(pipeline):
+    pipeline.setattr(retrieval, "get_ollama_client", lambda: SlowStream(["x"] * 100, 0.05))
+    result = answer.answer_question_with_details("Who is Mira?", deadline=0.3)
+    assert result.degraded == "generate.retrieval_only"
+    assert "[Tavern](https://notion.so/tavern)" in result.answer
+    assert degradations.snapshot() == {"generate.retrieval_only": 1}
+
+
+def test_long_partial_answer_is_kept(pipeline):
+    pipeline.setattr(retrieval, "get_ollama_client", lambda: SlowStream(["Mira runs the tavern."] * 100, 0.01))
+    result = answer.answer_question_with_details("Who is Mira?", deadline=0.3)
+    assert result.degraded == "generate.partial"
+    assert result.answer.startswith("Mira runs the tavern.")
+    assert result.answer.endswith(answer.PARTIAL_ANSWER_SUFFIX)
+
+
+def test_slow_embedding_times_out(pipeline):
+    pipeline.setattr(answer, "embed_query", lambda question, **kwargs: time.sleep(1))
+    pipeline.setattr(answer.config, "ASK_EMBED_TIMEOUT", 0.1)
+    start = time.perf_counter()
+    result = answer.answer_question_with_details("Who is Mira?", deadline=5)
+    assert time.perf_counter() - start < 0.5
+    assert result.degraded == "embed.timeout"
+    assert result.answer == answer.TIMEOUT_ANSWER
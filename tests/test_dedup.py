@@ -0,0 +1,75 @@
+import json
+import sys
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+from langchain_core.documents import Document
+from src.ollama_utils.dedup import candidate_pairs, deduplicate, minhash_signatures
+
+TEMPLATE = "Session recap: the party met at the Blue Water Inn in Vallaki and argued about the Feast of St. Andral"
+
+
+def npc_doc(npc, content):
+    return Document(page_content=content, metadata={"About NPC": npc, "document_count": 2, "source": "synthesized"})
+
+
+def fake_embed(docs):
+    # Near-identical texts get identical vectors; anything else points elsewhere
+    return [[1.0, 0.0] if "Vallaki" in doc.page_content else [0.0, 1.0] for doc in docs], list(range(len(docs)))
+
+
+def test_minhash_finds_near_duplicates_only():
+    texts = [TEMPLATE, TEMPLATE + ".", "Strahd von Zarovich rules Barovia from Castle Ravenloft"]
+    pairs = candidate_pairs(minhash_signatures(texts))
+    assert (0, 1) in pairs
+    assert (0, 2) not in pairs and (1, 2) not in pairs
+
+
+def test_deduplicate_merges_provenance_and_reports_savings():
+    ids = ["npc_a", "npc_b", "npc_c"]
+    docs = [npc_doc("Ireena", TEMPLATE), npc_doc("Ismark", TEMPLATE + " again"), npc_doc("Strahd", "Castle Ravenloft")]
+    embedded = []
+
+    def embed(batch):
+        embedded.extend(doc.page_content for doc in batch)
+        return fake_embed(batch)
+
+    kept_ids, kept_docs, embeddings, report = deduplicate(ids, docs, embed, jaccard=0.7, cosine=0.95)
+    assert kept_ids == ["npc_b", "npc_c"]
+    assert json.loads(kept_docs[0].metadata["merged_npcs"]) == ["Ireena"]
+    assert json.loads(kept_docs[0].metadata["merged_ids"]) == ["npc_a"]
+    assert report.removed == 1
+    assert report.bytes_saved > len(TEMPLATE)
+    # Only the candidate pair was embedded, and its surviving vector is handed on
+    assert len(embedded) == 2
+    assert list(embeddings) == ["npc_b"]
+
+
+def test_deduplicate_keeps_pairs_that_fail_the_cosine_check():
+    ids = ["npc_a", "npc_b"]
+    docs = [npc_doc("Ireena", TEMPLATE), npc_doc("Ismark", TEMPLATE + " again")]
+    orthogonal = lambda batch: ([[1.0, 0.0], [0.0, 1.0]], [0, 1])
+    kept_ids, _, _, report = deduplicate(ids, docs, orthogonal, jaccard=0.7)
+    assert kept_ids == ids
+    assert report.removed == 0
+
+
+def test_deduplicate_reuses_embeddings_already_stored_for_unchanged_text():
+    ids = ["npc_a", "npc_b"]
+    docs = [npc_doc("Ireena", TEMPLATE), npc_doc("Ismark", TEMPLATE + " again")]
+    embedded = []
+
+    def embed(batch):
+        embedded.extend(doc.page_content for doc in batch)
+        return fake_embed(batch)
+
+    # npc_b was written by an interrupted run with the same text; npc_a's text has since changed
+    stored = {"npc_a": ("an older text", [0.0, 1.0]), "npc_b": (TEMPLATE + " again", [1.0, 0.0])}
+    kept_ids, _, embeddings, report = deduplicate(ids, docs, embed, jaccard=0.7, cosine=0.95,
+                                                  stored=lambda item_ids: {i: stored[i] for i in item_ids})
+    assert embedded == [TEMPLATE]
+    assert report.reused == 1 and kept_ids == ["npc_b"]
+    assert embeddings == {"npc_b": [1.0, 0.0]}
@@ -0,0 +1,52 @@
+import sys
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+import chromadb
+import numpy as np
+import pytest
+from src.database.export import JSONL, NPY, export_collection, import_collection, iter_collection
+
+
+@pytest.fixture
+def client(tmp_path):
+    return chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+
+
+@pytest.fixture
+def collection(client):
+    collection = client.create_collection("notion_export", metadata={"hnsw:space": "cosine"})
+    collection.add(
+        ids=[f"doc_{i}" for i in range(25)],
+        documents=[f"note {i}" for i in range(25)],
+        metadatas=[{"name": f"Note {i}", "index": i} for i in range(25)],
+        embeddings=[[float(i), 1.0, -float(i)] for i in range(25)],
+    )
+    return collection
+
+
+def test_iter_collection_pages(collection):
+    pages = list(iter_collection(collection, batch_size=10))
+    assert [len(page["ids"]) for page in pages] == [10, 10, 5]
+    assert len({doc_id for page in pages for doc_id in page["ids"]}) == 25
+
+
+@pytest.mark.parametrize("fmt", [JSONL, NPY])
+def test_export_then_import_round_trips(client, collection, tmp_path, fmt):
+    manifest = export_collection(collection, tmp_path / "backup", fmt, batch_size=4, shard_size=10)
+    assert manifest["count"] == 25
+    assert [shard["count"] for shard in manifest["shards"]] == [10, 10, 5]
+    if fmt == NPY:
+        assert np.load(tmp_path / "backup" / "notion_export" / manifest["shards"][0]["embeddings"]).shape == (10, 3)
+
+    restored = import_collection(tmp_path / "backup" / "notion_export", name="notion_restored", batch_size=7, client=client)
+    assert restored.metadata["hnsw:space"] == "cosine"
+    original = collection.get(ids=["doc_7"], include=["documents", "metadatas", "embeddings"])
+    copy = restored.get(ids=["doc_7"], include=["documents", "metadatas", "embeddings"])
+    assert restored.count() == 25
+    assert copy["documents"] == original["documents"]
+    assert copy["metadatas"] == original["metadatas"]
+    assert np.allclose(copy["embeddings"], original["embeddings"])
@@ -0,0 +1,71 @@
+import json
+import sys
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+from src.clients.rate_limit import TokenBucket
+from src.discord.guilds import LEGACY_GUILDS, load_guilds
+from src.notion import normalize_database_id
+from src.ollama_utils import retrieval
+from src.ollama_utils.answer import scoped_collections
+from src.ollama_utils.autocomplete import PrefixIndex
+
+
+def test_load_guilds_from_file_and_legacy_fallback(tmp_path):
+    legacy = load_guilds(tmp_path / "missing.json")
+    assert list(legacy) == LEGACY_GUILDS
+    assert legacy[LEGACY_GUILDS[0]].database_ids is None
+
+    path = tmp_path / "guilds.json"
+    path.write_text(json.dumps({
+        "1": {"name": "Strahd", "databases": ["db1", "db2"], "ask_rate": 1, "ask_burst": 2},
+        "2": {"databases": []},
+    }))
+    guilds = load_guilds(path)
+    assert guilds[1].database_ids == ["db1", "db2"]
+    assert guilds[1].ask_limiter.burst == 2
+    assert guilds[2].database_ids == []
+
+
+def test_database_ids_are_normalized_once_on_load(tmp_path):
+    path = tmp_path / "guilds.json"
+    path.write_text(json.dumps({"1": {"databases": [" 8D5DC853-7d04-457f-a92a-543a83ac397b"]}}))
+    guild = load_guilds(path)[1]
+    assert guild.database_ids == ["8d5dc8537d04457fa92a543a83ac397b"]
+
+    index = PrefixIndex()
+    index.update(normalize_database_id("8d5dc853-7d04-457f-a92a-543a83ac397b"), ["Mira the Baker"])
+    assert index.lookup("mira", databases=guild.database_ids) == ["Mira the Baker"]
+
+
+def test_scoped_collections_only_includes_the_guilds_databases():
+    names = ["notion_8d5dc853-7d04-457f-a92a-543a83ac397b", "notion_db2", "restored_notes"]
+    assert scoped_collections(names, ["8d5dc8537d04457fa92a543a83ac397b"]) == [names[0]]
+    assert scoped_collections(names, []) == []
+    assert scoped_collections(names, None) == names
+
+
+def test_autocomplete_is_scoped_to_the_guilds_databases():
+    index = PrefixIndex()
+    index.update("db1", ["Mira the Baker"])
+    index.update("db2", ["Mirabel", "Mira the Baker"])
+    assert index.lookup("mira", databases=["db1"]) == ["Mira the Baker"]
+    assert index.lookup("mira", databases=["db2"]) == ["Mirabel", "Mira the Baker"]
+    assert index.lookup("mira", databases=[]) == []
+
+
+def test_embedding_cache_partitions_are_separate():
+    first, second = retrieval.embedding_cache(("db1",)), retrieval.embedding_cache(("db2",))
+    assert first is retrieval.embedding_cache(("db1",))
+    assert first is not second and first is not retrieval.embedding_cache()
+    first.put(("m", "Who?"), [1.0])
+    assert second.get(("m", "Who?")) is None
+
+
+def test_try_acquire_does_not_wait():
+    bucket = TokenBucket(rate=0.001, burst=2)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
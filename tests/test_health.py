@@ -0,0 +1,62 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+import pytest
+from benchmarks.fakes import FakeNotionServer, FakeOllamaServer, SyntheticDatabase
+from benchmarks.run import configure
+from src import config
+from src.clients import close_clients
+from src.telemetry import health
+from src.telemetry.health import FAILED, OK, SLOW, CacheState
+
+
+@pytest.fixture
+def stand_ins(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "NPC_SUMMARIES_ENABLED", False)
+    with FakeOllamaServer() as ollama, FakeNotionServer([SyntheticDatabase("db1", 10)]) as notion:
+        configure(ollama.url, notion.url, str(tmp_path))
+        yield notion
+    close_clients()
+
+
+def test_health_check_times_every_backend(stand_ins, monkeypatch):
+    from src.notion.download import process_notion_databases
+
+    process_notion_databases(["db1"])
+    for threshold in ["HEALTH_EMBED_MS", "HEALTH_CHROMA_COUNT_MS", "HEALTH_NOTION_MS"]:
+        monkeypatch.setattr(config, threshold, 10_000.0)
+    monkeypatch.setattr(config, "HEALTH_CHROMA_QUERY_MS", 0.0)
+    report = health.run_health_check()
+    statuses = {check.name: check.status for check in report.checks}
+    assert statuses["ollama embed"] == OK and statuses["notion users.list"] == OK
+    assert statuses["chroma count notion_db1"] == OK
+    # Over its threshold, so reported as slow
+    assert statuses["chroma query notion_db1"] == SLOW and not report.healthy
+    assert list(report.collections) == ["notion_db1"] and report.collections["notion_db1"] > 0
+    assert {model.role for model in report.models} == {"embedding", "generation"}
+    assert "chroma query notion_db1" in report.format()
+
+
+def test_unreachable_backend_is_reported_not_raised(stand_ins, monkeypatch):
+    from src.clients import registry
+
+    def refuse(**kwargs):
+        raise ConnectionError("Notion is down")
+
+    monkeypatch.setattr(registry, "get_notion_client", lambda: SimpleNamespace(users=SimpleNamespace(list=refuse)))
+    report = health.run_health_check()
+    notion = next(check for check in report.checks if check.name == "notion users.list")
+    assert notion.status == FAILED and "Notion is down" in notion.error
+    assert not report.healthy and "DEGRADED" in report.format()
+
+
+def test_cache_hit_rate_is_judged_after_enough_lookups(monkeypatch):
+    monkeypatch.setattr(config, "HEALTH_MIN_CACHE_LOOKUPS", 10)
+    assert CacheState("query embeddings", 5, 0, 5).status == OK
+    assert CacheState("query embeddings", 5, 1, 19).status == SLOW
+    assert CacheState("query embeddings", 5, 10, 10).status == OK
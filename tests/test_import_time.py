@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+import pytest
+
+# Cumulative import budget for the bot module, in milliseconds
+IMPORT_BUDGET_MS = int(os.getenv("NOTEKEEPER_IMPORT_BUDGET_MS", "1500"))
+
+# Subsystems that must only be loaded on first use
+HEAVY_MODULES = ("langchain", "langchain_community", "langchain_chroma", "chromadb", "notion_client", "ollama")
+
+
+def import_times(module: str):
+    """Run `python -X importtime -c 'import <module>'` and return {module: cumulative_us}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=project_root,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.fixture(scope="module")
+def bot_import_times():
+    return import_times("src.discord.bot")
+
+
+def test_bot_import_skips_heavy_subsystems(bot_import_times):
+    loaded = {name.split(".")[0] for name in bot_import_times}
+    assert not loaded.intersection(HEAVY_MODULES)
+
+
+def test_bot_import_within_budget(bot_import_times):
+    assert bot_import_times["src.discord.bot"] / 1000 < IMPORT_BUDGET_MS
@@ -0,0 +1,112 @@
+import sys
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+import pytest
+from langchain_core.documents import Document
+from benchmarks.fakes import FakeNotionServer, FakeOllamaServer, SyntheticDatabase
+from benchmarks.run import configure
+from src import config
+from src.clients import close_clients
+from src.database.jobs import DONE, EMBEDDED, FAILED, FAILED_ITEM, JobStore, WRITTEN
+
+
+def page(page_id):
+    return Document(page_content=f"body {page_id}", metadata={"notion_id": page_id, "last_edited_time": "t1"})
+
+
+def test_job_store_resumes_unfinished_job(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    job = store.start("db1")
+    store.save_page(job.job_id, page("p1"))
+    store.mark_items(job.job_id, {"npc_1": "hash1"}, WRITTEN)
+    store.finish(job.job_id, FAILED, "Ollama went away")
+
+    resumed = store.start("db1")
+    assert resumed.job_id == job.job_id
+    assert resumed.pages_fetched == 1
+    assert resumed.chunks_written == 1
+    assert store.load_pages(job.job_id)["p1"].page_content == "body p1"
+    assert store.written_items(job.job_id) == {"npc_1": "hash1"}
+
+    store.finish(job.job_id, DONE)
+    assert store.load_pages(job.job_id) == {}
+    assert store.start("db1").job_id != job.job_id
+
+
+def test_chunks_marked_again_are_counted_once(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    job = store.start("db1")
+    store.mark_items(job.job_id, {"npc_1": "hash1", "npc_2": "hash2"}, EMBEDDED)
+    store.mark_items(job.job_id, {"npc_2": "hash2"}, FAILED_ITEM, "write failed")
+    # The retry embeds npc_2 again, then both are written, npc_1 twice after a resume
+    store.mark_items(job.job_id, {"npc_2": "hash2"}, EMBEDDED)
+    store.mark_items(job.job_id, {"npc_1": "hash1", "npc_2": "hash2"}, WRITTEN)
+    store.mark_items(job.job_id, {"npc_1": "hash1"}, WRITTEN)
+    job = store.get(job.job_id)
+    assert job.chunks_embedded == 2 and job.chunks_written == 2
+
+
+@pytest.fixture
+def stand_ins(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "NPC_SUMMARIES_ENABLED", False)
+    monkeypatch.setattr(config, "INGEST_BATCH_SIZE", 1)
+    monkeypatch.setattr(config, "INGEST_RETRY_BACKOFF", 0)
+    with FakeOllamaServer() as ollama, FakeNotionServer([SyntheticDatabase("db1", 20, npc_count=4)]) as notion:
+        configure(ollama.url, notion.url, str(tmp_path))
+        yield
+    close_clients()
+
+
+def test_ingest_resumes_from_checkpointed_pages(stand_ins, monkeypatch):
+    from src.notion import download
+    from src.ollama_utils.ingest import process_and_store_embeddings
+
+    fetched = []
+    extract_page_content = download.extract_page_content
+
+    def crash_after_twelve(notion, page_id):
+        if len(fetched) == 12:
+            raise ConnectionError("bot restarted")
+        fetched.append(page_id)
+        return extract_page_content(notion, page_id)
+
+    monkeypatch.setattr(download, "extract_page_content", crash_after_twelve)
+    with pytest.raises(RuntimeError):
+        process_and_store_embeddings("db1")
+
+    monkeypatch.setattr(download, "extract_page_content",
+                        lambda notion, page_id: fetched.append(page_id) or extract_page_content(notion, page_id))
+    job = process_and_store_embeddings("db1")
+    assert job.status == DONE
+    assert job.pages_fetched == 20
+    assert len(fetched) == 20  # the 12 checkpointed pages were not fetched again
+
+
+def test_ingest_skips_chunks_written_before_a_crash(stand_ins, monkeypatch):
+    from src.ollama_utils import ingest
+
+    embedded = []
+    create_embeddings = ingest.create_embeddings
+
+    def crash_on_third(docs, progress=None):
+        if len(embedded) == 2:
+            raise RuntimeError("Ollama crashed")
+        embedded.extend(doc.page_content for doc in docs)
+        return create_embeddings(docs, progress)
+
+    monkeypatch.setattr(ingest, "create_embeddings", crash_on_third)
+    with pytest.raises(RuntimeError):
+        ingest.process_and_store_embeddings("db1")
+
+    monkeypatch.setattr(ingest, "create_embeddings", create_embeddings)
+    job = ingest.process_and_store_embeddings("db1")
+    assert job.status == DONE
+    assert job.chunks_written == 4  # two before the crash, two after the resume
+
+    from src.database.database import get_chroma_client
+    ids = get_chroma_client().get_collection("notion_db1").get()["ids"]
+    assert sorted(ids) == sorted(ingest.synthesized_id(f"NPC {i}") for i in range(4))
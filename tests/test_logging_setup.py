@@ -0,0 +1,39 @@
+import logging
+import sys
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+from src.telemetry import logging_setup
+from src.telemetry.logging_setup import ProgressLogger, SampledLogger, redact
+
+
+def test_redact_hides_content_by_default(monkeypatch):
+    monkeypatch.setattr(logging_setup.config, "LOG_CONTENT", False)
+    assert redact("secret campaign notes") == "<21 chars redacted>"
+    monkeypatch.setattr(logging_setup.config, "LOG_CONTENT", True)
+    assert redact("secret campaign notes") == "secret campaign notes"
+
+
+def test_sampled_logger_emits_every_nth_per_key(caplog):
+    logger = logging.getLogger("test.sampled")
+    sampled = SampledLogger(logger, every=10)
+    with caplog.at_level(logging.DEBUG, logger="test.sampled"):
+        for i in range(25):
+            sampled.debug("page", f"page {i}")
+        sampled.debug("other", "other 0")
+    messages = [record.getMessage() for record in caplog.records]
+    assert [m.split(" (")[0] for m in messages] == ["page 0", "page 10", "page 20", "other 0"]
+
+
+def test_progress_logger_aggregates(caplog):
+    logger = logging.getLogger("test.progress")
+    progress = ProgressLogger(logger, "Embedding", total=100, interval=3600)
+    with caplog.at_level(logging.INFO, logger="test.progress"):
+        for _ in range(100):
+            progress.advance()
+        progress.finish()
+    assert len(caplog.records) == 1
+    assert "Embedding done: 100/100" in caplog.records[0].getMessage()
@@ -0,0 +1,103 @@
+import random
+import sys
+import threading
+import uuid
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+import pytest
+from src import config
+from src.database import database
+from src.ollama_utils.retrieval import search_collections
+
+
+@pytest.fixture
+def chroma(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CHROMA_PERSIST_DIRECTORY", tmp_path / "chroma")
+    monkeypatch.setattr(config, "INGEST_JOB_DB", tmp_path / "jobs.sqlite3")
+    monkeypatch.setattr(config, "EXACT_SEARCH_MAX_MB", 0)
+    monkeypatch.setattr(config, "MAINTENANCE_PAGE_SIZE", 70)
+    monkeypatch.setattr(config, "MAINTENANCE_RETIRE_GRACE", 0.2)
+    client = database.get_chroma_client()
+    yield client
+    database._clients.clear()
+
+
+def fill(client, name, upserts=3, deleted=100):
+    rng = random.Random(name)
+    # Small batches and sync threshold persist the HNSW metadata the tombstone count is read from
+    collection = client.create_collection(
+        name, metadata={"hnsw:space": "cosine", "hnsw:batch_size": 5, "hnsw:sync_threshold": 10}
+    )
+    for _ in range(upserts):
+        collection.upsert(ids=[f"doc_{i}" for i in range(200)], documents=[f"page {i}" for i in range(200)],
+                          embeddings=[[rng.random() for _ in range(8)] for _ in range(200)],
+                          metadatas=[{"About NPC": f"npc {i}"} for i in range(200)])
+    if deleted:
+        # Pages removed from Notion, then new ones synced; Chroma persists the deletes with the next write
+        collection.delete(ids=[f"doc_{i}" for i in range(deleted)])
+        collection.add(ids=[f"new_{i}" for i in range(20)], documents=[f"new page {i}" for i in range(20)],
+                       embeddings=[[rng.random() for _ in range(8)] for _ in range(20)])
+    return collection
+
+
+def test_maintenance_rebuilds_fragmented_collections(chroma):
+    fragmented = fill(chroma, "notion_fragmented")
+    fill(chroma, "notion_clean", upserts=1, deleted=0)
+    orphan = Path(config.CHROMA_PERSIST_DIRECTORY) / str(uuid.uuid4())
+    orphan.mkdir()
+    # Not a segment directory, so maintenance must leave it alone
+    (Path(config.CHROMA_PERSIST_DIRECTORY) / "backups").mkdir()
+    query = [0.5] * 8
+    before = fragmented.query(query_embeddings=[query], n_results=5)["ids"]
+
+    report = database.maintain_database()
+
+    stats = {s.name: s for s in report.before.collections}
+    assert stats["notion_fragmented"].tombstones == 100 and stats["notion_fragmented"].log_entries == 720
+    assert report.before.orphaned_segments == 1
+    assert report.rebuilt == ["notion_fragmented"]
+    after = {s.name: s for s in report.after.collections}
+    assert after["notion_fragmented"].vectors == 120
+    assert after["notion_fragmented"].log_entries == 120
+    assert after["notion_fragmented"].tombstones == 0
+    assert report.after.orphaned_segments == 0 and report.after.orphaned_log_entries == 0
+    assert not orphan.exists() and (Path(config.CHROMA_PERSIST_DIRECTORY) / "backups").is_dir()
+    assert "notion_fragmented" in report.format()
+
+    # Only the offline VACUUM gives the freed pages back; it reopens the shared client around it
+    vacuumed = database.maintain_database(rebuild=False, vacuum=True)
+    assert vacuumed.after.sqlite_free_bytes == 0
+    assert vacuumed.after.sqlite_bytes < report.before.sqlite_bytes
+    client = database.get_chroma_client()
+    assert client is not chroma
+    assert sorted(c.name for c in client.list_collections()) == ["notion_clean", "notion_fragmented"]
+    rebuilt = client.get_collection("notion_fragmented")
+    assert rebuilt.metadata["hnsw:space"] == "cosine"
+    assert rebuilt.query(query_embeddings=[query], n_results=5)["ids"] == before
+
+
+def test_queries_are_served_during_maintenance(chroma):
+    fill(chroma, "notion_busy")
+    stop, errors, served = threading.Event(), [], []
+
+    def ask():
+        while not stop.is_set():
+            try:
+                served.append(len(search_collections(chroma, [0.5] * 8, ["notion_busy"], 5).get("notion_busy", [])))
+            except Exception as e:
+                errors.append(e)
+
+    reader = threading.Thread(target=ask)
+    reader.start()
+    try:
+        report = database.maintain_database(rebuild=True)
+    finally:
+        stop.set()
+        reader.join()
+    assert report.rebuilt == ["notion_busy"]
+    # Every query saw the collection, before, during or after the swap
+    assert not errors and served and 0 not in served
@@ -0,0 +1,126 @@
+import sys
+import threading
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+import httpx
+import pytest
+from langchain_core.documents import Document
+from benchmarks.fakes import FakeOllamaServer, deterministic_embedding
+from src import config
+from src.clients import registry
+from src.clients.ollama_pool import OllamaEndpoint, OllamaPool
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubClient:
+    """Stands in for ollama.Client: embeds after `gate` opens, or fails with `error`."""
+
+    def __init__(self, name, error=None):
+        self.name = name
+        self.error = error
+        self.gate = threading.Event()
+        self.gate.set()
+        self.started = threading.Event()
+        self.calls = 0
+
+    def embeddings(self, **kwargs):
+        self.calls += 1
+        self.started.set()
+        if self.error:
+            raise self.error
+        self.gate.wait(5)
+        return {"embedding": [1.0], "host": self.name}
+
+    def generate(self, stream=False, **kwargs):
+        self.calls += 1
+        yield {"response": "a", "done": False}
+        yield {"response": "b", "done": True}
+
+    def ps(self):
+        if self.error:
+            raise self.error
+        return {"models": [{"name": f"model-{self.name}"}]}
+
+
+def make_pool(*clients, clock=None):
+    clock = clock or Clock()
+    return OllamaPool([OllamaEndpoint(c.name, c, clock) for c in clients], retry_after=15, health_interval=0)
+
+
+def test_requests_go_to_the_instance_with_fewest_in_flight():
+    busy, idle = StubClient("busy"), StubClient("idle")
+    pool = make_pool(busy, idle)
+    busy.gate.clear()
+    # An ingest request holds "busy" (the first instance takes the first call); every
+    # other call finds "idle" with nothing in flight
+    held = threading.Thread(target=pool.embeddings, kwargs={"model": "m", "prompt": "slow"})
+    held.start()
+    assert busy.started.wait(5)
+    assert [pool.embeddings(model="m", prompt="q")["host"] for _ in range(3)] == ["idle"] * 3
+    busy.gate.set()
+    held.join()
+    stats = {e["host"]: e for e in pool.stats()}
+    assert stats["busy"]["requests"] == 1 and stats["idle"]["requests"] == 3
+    assert all(e["outstanding"] == 0 for e in stats.values())
+
+
+def test_unreachable_instance_fails_over_and_comes_back():
+    clock = Clock()
+    down, up = StubClient("down", error=httpx.ConnectError("refused")), StubClient("up")
+    pool = make_pool(down, up, clock=clock)
+    assert [pool.embeddings(model="m", prompt="q")["host"] for _ in range(4)] == ["up"] * 4
+    # Tried once, then skipped until the retry time
+    assert down.calls == 1 and not pool.endpoints[0].available()
+    assert pool.ps() == {"models": [{"name": "model-up"}]}
+
+    down.error = None
+    clock.now += 5
+    pool.probe()
+    assert pool.endpoints[0].available()
+    assert {pool.embeddings(model="m", prompt="q")["host"] for _ in range(4)} == {"down", "up"}
+
+
+def test_errors_from_every_instance_are_raised():
+    pool = make_pool(StubClient("a", error=httpx.ConnectError("refused")),
+                     StubClient("b", error=httpx.ReadTimeout("slow")))
+    with pytest.raises(httpx.ReadTimeout):
+        pool.embeddings(model="m", prompt="q")
+
+
+def test_stream_holds_its_instance_until_closed():
+    pool = make_pool(StubClient("a"), StubClient("b"))
+    stream = pool.generate(model="m", prompt="q", stream=True)
+    assert next(stream)["response"] == "a"
+    assert sum(e.outstanding for e in pool.endpoints) == 1
+    stream.close()
+    assert sum(e.outstanding for e in pool.endpoints) == 0
+
+
+def test_ingest_embeds_across_every_instance(monkeypatch):
+    from src.ollama_utils.ingest import create_embeddings
+
+    with FakeOllamaServer() as first, FakeOllamaServer() as second:
+        monkeypatch.setattr(config, "OLLAMA_HOSTS", [first.url, second.url])
+        monkeypatch.setattr(config, "OLLAMA_HEALTH_INTERVAL", 0)
+        registry.close_clients()
+        try:
+            docs = [Document(page_content=f"page {i}") for i in range(40)]
+            embeddings, valid_indices = create_embeddings(docs)
+        finally:
+            registry.close_clients()
+    assert valid_indices == list(range(40))
+    # In document order, whichever instance embedded each one
+    assert embeddings == [deterministic_embedding(f"page {i}", first.dimensions) for i in range(40)]
+    assert first.request_count > 0 and second.request_count > 0
+    assert first.request_count + second.request_count == 40
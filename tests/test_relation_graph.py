@@ -0,0 +1,80 @@
+import sys
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+import chromadb
+import pytest
+from langchain_core.documents import Document
+from src import config
+from src.database import relation_graph, vector_index
+from src.database.relation_graph import RelationGraph, edges_from_docs
+from src.ollama_utils.retrieval import RetrievedChunk, expand_related
+
+
+def page(title, about=(), **relations):
+    properties = {"About NPC": list(about), "Status": {"select": {"name": "Alive"}}, **relations}
+    return Document(page_content=title, metadata={"title": title, "notion_properties": properties})
+
+
+def test_csr_neighbours_are_symmetric_and_sorted():
+    graph = RelationGraph.from_edges([("Mira", "Ireena"), ("Mira", "Strahd"), ("Ireena", "Ismark"), ("Mira", "Mira")])
+    assert graph.neighbors("Mira") == ["Ireena", "Strahd"]
+    assert graph.neighbors("Ismark") == ["Ireena"]
+    assert graph.neighbors("Nobody") == []
+    assert graph.edge_count == 3
+    assert list(graph.indptr) == [0, 2, 3, 5, 6]
+
+
+def test_edges_come_from_relation_properties_only():
+    edges = edges_from_docs([
+        page("Session 3", about=["Mira", "Ireena"], Location=["Vallaki"]),
+        page("Strahd", Allies=["Rahadin", "Error"]),
+        page("Tags", Tags=[{"name": "villain"}]),
+    ])
+    assert edges == {("Ireena", "Mira"), ("Mira", "Vallaki"), ("Ireena", "Vallaki"), ("Strahd", "Rahadin")}
+
+
+def test_update_graph_persists_and_skips_unchanged(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "RELATION_GRAPH_DIRECTORY", tmp_path)
+    relation_graph.update_graph("notion_a", [("Mira", "Ireena")])
+    mtime = (tmp_path / "notion_a.npz").stat().st_mtime_ns
+    assert relation_graph.get_graph("notion_a").neighbors("Ireena") == ["Mira"]
+    relation_graph.update_graph("notion_a", [("Ireena", "Mira")])
+    assert (tmp_path / "notion_a.npz").stat().st_mtime_ns == mtime
+    relation_graph.update_graph("notion_a", [("Mira", "Strahd")])
+    assert relation_graph.get_graph("notion_a").neighbors("Mira") == ["Strahd"]
+
+
+@pytest.mark.parametrize("exact_mb", [64, 0])
+def test_expand_related_adds_nearest_neighbour_per_npc(tmp_path, monkeypatch, exact_mb):
+    monkeypatch.setattr(config, "RELATION_GRAPH_DIRECTORY", tmp_path / "graph")
+    monkeypatch.setattr(config, "VECTOR_INDEX_DIRECTORY", tmp_path / "vector_index")
+    monkeypatch.setattr(config, "EXACT_SEARCH_MAX_MB", exact_mb)
+    for state in ("_indexes", "_dimensions", "_pending", "_build_locks"):
+        monkeypatch.setattr(vector_index, state, {})
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    collection = client.create_collection("notion_a", metadata={"hnsw:space": "cosine"})
+    collection.add(
+        ids=["npc_mira", "npc_ireena", "summary_ireena", "npc_strahd", "npc_ismark"],
+        documents=["Mira", "Ireena notes", "Ireena summary", "Strahd", "Ismark"],
+        metadatas=[
+            {"About NPC": "Mira", "source": "synthesized"},
+            {"About NPC": "Ireena", "source": "synthesized"},
+            {"About NPC": "Ireena", "source": "summary"},
+            {"About NPC": "Strahd", "source": "synthesized"},
+            {"About NPC": "Ismark", "source": "synthesized"},
+        ],
+        embeddings=[[1.0, 0.0], [0.6, 0.8], [0.8, 0.6], [0.0, 1.0], [1.0, 0.1]],
+    )
+    vector_index.refresh_index(collection)
+    relation_graph.update_graph("notion_a", [("Mira", "Ireena"), ("Mira", "Strahd"), ("Ireena", "Ismark")])
+
+    selected = [RetrievedChunk("npc_mira", "notion_a", "Mira", {"About NPC": "Mira"}, [1.0, 0.0])]
+    expanded = expand_related(client, [1.0, 0.0], selected, k=2)
+    # Ireena's summary wins over her raw notes; Ismark is two hops away
+    assert [chunk.id for chunk in expanded] == ["summary_ireena", "npc_strahd"]
+    assert all(chunk.related_to == "Mira" for chunk in expanded)
+    assert expanded[0].distance < expanded[1].distance
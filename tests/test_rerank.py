@@ -0,0 +1,88 @@
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+from src.ollama_utils import answer, rerank as rerank_module
+from src.ollama_utils.rerank import OllamaReranker, rerank, score_cache
+from src.ollama_utils.retrieval import RetrievedChunk
+from src.telemetry.metrics import degradations
+
+
+class KeywordReranker:
+    """Scores a passage by how many question words it contains, recording each batch."""
+    name = "keyword"
+
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.delay = delay
+
+    def score(self, question, passages):
+        time.sleep(self.delay)
+        self.batches.append(list(passages))
+        words = set(question.lower().split())
+        return [float(len(words & set(passage.lower().split()))) for passage in passages]
+
+
+def chunk(i, text):
+    return RetrievedChunk(f"c{i}", "notion_a", text, {"About NPC": "Mira"}, [1.0, 0.0])
+
+
+def test_rerank_keeps_the_best_and_caches_scores():
+    score_cache.clear()
+    chunks = [chunk(0, "the mill"), chunk(1, "mira lives in vallaki"), chunk(2, "mira bakes"), chunk(3, "the road")]
+    reranker = KeywordReranker()
+    ranked = rerank("where does mira live in vallaki", chunks, top_n=2, reranker=reranker, batch_size=3)
+    assert [c.id for c in ranked] == ["c1", "c2"]
+    assert ranked[0].rerank_score == 3.0
+    assert [len(batch) for batch in reranker.batches] == [3, 1]
+
+    # Cached pairs are not scored again; only the new chunk is
+    rerank("where does mira live in vallaki", chunks + [chunk(4, "vallaki")], top_n=2, reranker=reranker, batch_size=3)
+    assert reranker.batches[2:] == [["vallaki"]]
+
+
+def test_ollama_reranker_parses_the_relevance_digit(monkeypatch):
+    replies = {"useful": " 8", "useless": "0", "rambling": "I think"}
+    client = SimpleNamespace(generate=lambda model, prompt, **kwargs: {
+        "response": next(reply for key, reply in replies.items() if f"Passage: {key}" in prompt)
+    })
+    monkeypatch.setattr(rerank_module, "get_ollama_client", lambda: client)
+    assert OllamaReranker("tiny", batch_size=2).score("q", ["useful", "useless", "rambling"]) == [8.0, 0.0, 0.0]
+
+
+def run_pipeline(monkeypatch, reranker, deadline=None):
+    chunks = [chunk(i, text) for i, text in enumerate(["the mill", "mira lives in vallaki", "mira bakes", "the road"])]
+    prompts = []
+    client = SimpleNamespace(list_collections=lambda: [SimpleNamespace(name="notion_a")])
+    monkeypatch.setattr(answer, "get_chroma_client", lambda: client)
+    monkeypatch.setattr(answer, "embed_query", lambda question, **kwargs: [1.0, 0.0])
+    monkeypatch.setattr(answer, "search_collections", lambda *args, **kwargs: {"notion_a": chunks})
+    monkeypatch.setattr(answer, "select_chunks", lambda query, candidates, k, *args, **kwargs: candidates["notion_a"][:k])
+    monkeypatch.setattr(answer, "get_reranker", lambda: reranker)
+    monkeypatch.setattr(answer, "generate", lambda prompt, **kwargs: prompts.append(prompt) or {"response": "ok"})
+    monkeypatch.setattr(answer.config, "RELATION_EXPANSION", False)
+    monkeypatch.setattr(answer.config, "RERANK_TOP_N", 1)
+    monkeypatch.setattr(answer.config, "ASK_RERANK_TIMEOUT", 0.1)
+    score_cache.clear()
+    degradations.reset()
+    result = answer.answer_question_with_details("where does mira live", deadline=deadline)
+    return result, prompts
+
+
+def test_only_the_reranked_chunks_reach_the_prompt(monkeypatch):
+    result, prompts = run_pipeline(monkeypatch, KeywordReranker())
+    assert result.chunk_ids == ["c1"]
+    assert "mira lives in vallaki" in prompts[0] and "mira bakes" not in prompts[0]
+    assert "ask.rerank" in result.timings
+
+
+def test_slow_reranker_falls_back_to_retrieval_order(monkeypatch):
+    monkeypatch.setattr(answer, "generate_streaming", lambda prompt, budget, **kwargs: ({"response": "ok"}, True))
+    result, _ = run_pipeline(monkeypatch, KeywordReranker(delay=1), deadline=5)
+    assert result.chunk_ids == ["c0"]
+    assert degradations.snapshot() == {"rerank.timeout": 1}
@@ -0,0 +1,70 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+from src import config
+from src.ollama_utils.residency import (
+    EMBEDDING,
+    GENERATION,
+    ModelResidencyManager,
+    in_play_hours,
+    keep_alive_for,
+    parse_play_hours,
+)
+
+
+def test_play_hours_wrap_past_midnight():
+    ranges = parse_play_hours("18:00-01:30, 13-15")
+    assert in_play_hours(ranges, datetime(2024, 1, 1, 19, 0))
+    assert in_play_hours(ranges, datetime(2024, 1, 1, 0, 45))
+    assert in_play_hours(ranges, datetime(2024, 1, 1, 14, 0))
+    assert not in_play_hours(ranges, datetime(2024, 1, 1, 10, 0))
+    assert in_play_hours([], datetime(2024, 1, 1, 10, 0))
+
+
+def test_preload_sends_keep_alive_per_model():
+    client = MagicMock()
+    client.generate.return_value = {"load_duration": 2_500_000_000}
+    manager = ModelResidencyManager({EMBEDDING: "embed-model", GENERATION: "gen-model"})
+    with patch("src.ollama_utils.residency.get_ollama_client", return_value=client):
+        stats = manager.preload()
+    client.embeddings.assert_called_once()
+    assert client.embeddings.call_args.kwargs["model"] == "embed-model"
+    assert "keep_alive" in client.generate.call_args.kwargs
+    assert stats[GENERATION].last_load_seconds == 2.5
+    assert stats[EMBEDDING].loads == 1
+
+
+def test_record_response_separates_load_and_inference():
+    manager = ModelResidencyManager({GENERATION: "gen-model"})
+    manager.record_response(GENERATION, {"load_duration": 10_000_000, "prompt_eval_duration": 1_000_000_000, "eval_duration": 2_000_000_000})
+    assert manager.stats[GENERATION].loads == 0
+    assert manager.stats[GENERATION].last_inference_seconds == 3.0
+
+
+def test_keep_warm_pings_are_not_counted_as_loads():
+    client = MagicMock()
+    client.generate.return_value = {"load_duration": 20_000_000}
+    manager = ModelResidencyManager({GENERATION: "gen-model"})
+    with patch("src.ollama_utils.residency.get_ollama_client", return_value=client):
+        manager.preload()
+        manager.preload(ping=True)
+        client.generate.return_value = {"load_duration": 3_000_000_000}
+        manager.preload(ping=True)
+    stats = manager.stats[GENERATION]
+    # The warm ping leaves the load count and time alone; the ping that found the model unloaded is a load
+    assert stats.pings == 2 and stats.loads == 2
+    assert stats.last_load_seconds == 3.0
+
+
+def test_keep_alive_is_short_outside_play_hours(monkeypatch):
+    monkeypatch.setattr(config, "PLAY_HOURS", "18:00-23:00")
+    monkeypatch.setattr(config, "EMBEDDING_KEEP_ALIVE", "2h")
+    monkeypatch.setattr(config, "OFF_HOURS_KEEP_ALIVE", "5m")
+    assert keep_alive_for(EMBEDDING, datetime(2024, 1, 1, 19, 0)) == "2h"
+    assert keep_alive_for(EMBEDDING, datetime(2024, 1, 1, 10, 0)) == "5m"
@@ -0,0 +1,67 @@
+import sys
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+from src.ollama_utils.retrieval import (
+    RetrievedChunk,
+    build_prompt,
+    maximal_marginal_relevance,
+    select_chunks,
+)
+from src.telemetry.metrics import stage_latency
+from src.telemetry.tracing import format_stats, record_generation, span
+
+
+def chunk(chunk_id, embedding, collection="notion_a"):
+    return RetrievedChunk(id=chunk_id, collection=collection, document=f"doc {chunk_id}", metadata={}, embedding=embedding)
+
+
+def test_mmr_prefers_diverse_results():
+    query = [1.0, 0.0]
+    embeddings = [[1.0, 0.0], [0.99, 0.01], [0.7, 0.7]]
+    assert maximal_marginal_relevance(query, embeddings, k=2, lambda_mult=0.3) == [0, 2]
+    assert maximal_marginal_relevance(query, embeddings, k=2, lambda_mult=1.0) == [0, 1]
+    assert maximal_marginal_relevance(query, [], k=2) == []
+
+
+def test_select_chunks_interleaves_collections():
+    candidates = {
+        "notion_a": [chunk("a1", [1.0, 0.0]), chunk("a2", [0.0, 1.0])],
+        "notion_b": [chunk("b1", [1.0, 0.0], "notion_b")],
+    }
+    selected = select_chunks([1.0, 0.0], candidates, k=2)
+    assert [c.id for c in selected] == ["a1", "b1", "a2"]
+
+
+def test_build_prompt_respects_context_limit():
+    chunks = [chunk("a1", [1.0]), chunk("a2", [1.0])]
+    prompt, included = build_prompt("Who?", chunks, max_context_length=len("doc a1") + 2)
+    assert included == ["a1"]
+    assert "doc a1" in prompt
+    assert "doc a2" not in prompt
+    assert prompt.endswith("Question: Who?\nHelpful Answer:")
+
+
+def test_span_records_stage_timings():
+    stage_latency.reset()
+    timings = {}
+    with span("ask.test", timings):
+        pass
+    assert "ask.test" in timings
+    assert stage_latency.summary("ask.test")["count"] == 1
+    assert "ask.test" in format_stats()
+
+
+def test_record_generation_tokens_per_second():
+    response = {"model": "m", "eval_count": 50, "eval_duration": 2_000_000_000}
+    assert record_generation(response) == 25.0
+    assert record_generation({"model": "m"}) is None
+
+
+def test_select_chunks_similarity_keeps_nearest_first():
+    candidates = {"notion_a": [chunk("a1", [1.0, 0.0]), chunk("a2", [0.99, 0.01]), chunk("a3", [0.0, 1.0])]}
+    selected = select_chunks([1.0, 0.0], candidates, k=2, search_type="similarity")
+    assert [c.id for c in selected] == ["a1", "a2"]
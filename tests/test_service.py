@@ -0,0 +1,65 @@
+import sys
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+import pytest
+from fastapi.testclient import TestClient
+from benchmarks.fakes import FakeNotionServer, FakeOllamaServer, SyntheticDatabase
+from benchmarks.run import configure
+from src import config
+from src.clients import close_clients
+from src.database.export import iter_collection
+from src.service import app as service_app
+from src.service.client import ServiceClient, ServiceError
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "NOTION_DATABASE_IDS", [])
+    with FakeOllamaServer() as ollama, FakeNotionServer([SyntheticDatabase("db1", 20)]) as notion:
+        configure(ollama.url, notion.url, str(tmp_path))
+        with TestClient(service_app.app) as http:
+            yield ServiceClient("http://testserver", http=http)
+    close_clients()
+
+
+def test_sync_then_answer_through_service(service):
+    report = service.sync()
+    assert report["failed"] == 0
+    assert report["pages"] == 20
+    assert "1/1 databases" in report["table"]
+
+    result = service.ask("Who is NPC 1?")
+    assert result["answer"] == "A deterministic benchmark answer."
+    assert result["degraded"] is None
+    assert result["chunks"] and "embedding" not in result["chunks"][0]
+
+    results = service.ask_batch([{"question": "Who is NPC 1?", "session": "batch:1"}, {"question": "Who is NPC 2?"}])
+    assert [r["question"] for r in results] == ["Who is NPC 1?", "Who is NPC 2?"]
+    # The batch question with a session started a conversation there
+    assert service.forget("batch:1")
+    assert service.health()["collections"] == 1
+
+
+def test_remote_collections_page_like_chroma(service):
+    service.sync()
+    (collection,) = service.list_collections()
+    pages = list(iter_collection(collection, batch_size=4, include=("documents", "embeddings")))
+    assert sum(len(page["ids"]) for page in pages) == collection.count()
+    assert all(isinstance(embedding[0], float) for page in pages for embedding in page["embeddings"])
+    with pytest.raises(ServiceError) as raised:
+        service.get_collection("missing").get(limit=1)
+    assert raised.value.status_code == 404
+
+
+def test_only_one_writer_at_a_time(service):
+    assert service_app._writer_lock.acquire()
+    try:
+        with pytest.raises(ServiceError) as raised:
+            service.sync()
+        assert raised.value.status_code == 409
+    finally:
+        service_app._writer_lock.release()
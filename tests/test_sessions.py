@@ -0,0 +1,125 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+import pytest
+from src.ollama_utils import answer
+from src.ollama_utils.retrieval import RetrievedChunk
+from src.ollama_utils.sessions import SessionStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_sessions_expire_after_ttl():
+    clock = Clock()
+    store = SessionStore(ttl=60, max_bytes=10_000, max_context_tokens=100, clock=clock)
+    first = store.record("g:c", "Who is Mira?", ["a"], [1, 2, 3])
+    clock.now = 30
+    follow_up = store.record("g:c", "Where does she live?", ["b"], [1, 2, 3, 4], previous=store.get("g:c"))
+    assert follow_up.turns == 2 and follow_up.chunk_ids == {"a", "b"}
+    assert follow_up.retrieval_text("Her brother?") == "Who is Mira?\nWhere does she live?\nHer brother?"
+    clock.now = 89
+    assert store.get("g:c") is follow_up
+    clock.now = 150
+    assert store.get("g:c") is None
+    assert store.stats() == {"sessions": 0, "bytes": 0}
+    assert first.turns == 1
+
+
+def test_memory_and_context_caps():
+    store = SessionStore(ttl=60, max_bytes=100, max_context_tokens=10)
+    store.record("a", "q", [], [1] * 10)
+    store.record("b", "q", [], [1] * 10)
+    store.get("a")
+    # 41 bytes each: the third evicts the least recently used, "b"
+    store.record("c", "q", [], [1] * 10)
+    assert store.get("b") is None and store.get("a") and store.get("c")
+    assert store.stats()["bytes"] <= 100
+    # A context past the model's window ends the conversation
+    assert store.record("a", "q", [], [1] * 11) is None
+    assert store.get("a") is None
+    assert store.forget("c") and not store.forget("c")
+
+
+class RecordingOllama:
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, stream=False, **kwargs):
+        self.calls.append(kwargs)
+        response = {"model": "m", "response": "She lives in Vallaki.", "done": True,
+                    "context": list(range(len(self.calls) * 10)), "eval_count": 5, "eval_duration": 1_000_000}
+        # Streamed, the same response arrives as a single final chunk
+        return (chunk for chunk in [response]) if stream else response
+
+
+@pytest.fixture
+def conversation(monkeypatch):
+    chunks = {
+        "mira": RetrievedChunk("mira", "notion_a", "Mira runs the tavern.", {"About NPC": "Mira"}, [1.0, 0.0]),
+        "house": RetrievedChunk("house", "notion_a", "Mira's house is in Vallaki.", {"About NPC": "Mira"}, [0.9, 0.1]),
+    }
+    ollama = RecordingOllama()
+    client = SimpleNamespace(list_collections=lambda: [SimpleNamespace(name="notion_a")])
+    searches = iter([["mira"], ["mira", "house"]])
+    embedded = []
+    monkeypatch.setattr(answer, "get_chroma_client", lambda: client)
+    monkeypatch.setattr(answer, "embed_query", lambda text, **kwargs: embedded.append(text) or [1.0, 0.0])
+    monkeypatch.setattr(answer, "search_collections",
+                        lambda *args, **kwargs: {"notion_a": [chunks[i] for i in next(searches)]})
+    monkeypatch.setattr(answer.config, "RELATION_EXPANSION", False)
+    monkeypatch.setattr(answer, "conversation_sessions", SessionStore(ttl=60, max_bytes=10_000, max_context_tokens=100))
+    monkeypatch.setattr("src.ollama_utils.retrieval.get_ollama_client", lambda: ollama)
+    return ollama, embedded
+
+
+@pytest.mark.parametrize("deadline", [None, 5])
+def test_follow_up_sends_only_new_chunks_with_context(conversation, deadline):
+    ollama, embedded = conversation
+    first = answer.answer_question_with_details("Who is Mira?", deadline=deadline, session="g:c")
+    second = answer.answer_question_with_details("Where does she live?", deadline=deadline, session="g:c")
+
+    assert not first.follow_up and second.follow_up
+    assert embedded == ["Who is Mira?", "Who is Mira?\nWhere does she live?"]
+    assert ollama.calls[0]["context"] is None
+    assert ollama.calls[1]["context"] == list(range(10))
+    assert "Mira runs the tavern." in ollama.calls[0]["prompt"]
+    assert "Mira runs the tavern." not in ollama.calls[1]["prompt"]
+    assert "Mira's house is in Vallaki." in ollama.calls[1]["prompt"]
+    assert second.chunk_ids == ["mira", "house"]
+    assert answer.conversation_sessions.get("g:c").turns == 2
+
+
+def test_chunks_cut_from_the_prompt_are_sent_next_turn(monkeypatch):
+    # Together the two chunks overflow the prompt's context budget, so "house" is cut the first time
+    chunks = [
+        RetrievedChunk("mira", "notion_a", "Mira runs the tavern. " * 100, {"About NPC": "Mira"}, [1.0, 0.0]),
+        RetrievedChunk("house", "notion_a", "Mira's house is in Vallaki. " * 60, {"About NPC": "Mira"}, [0.9, 0.1]),
+    ]
+    ollama = RecordingOllama()
+    client = SimpleNamespace(list_collections=lambda: [SimpleNamespace(name="notion_a")])
+    monkeypatch.setattr(answer, "get_chroma_client", lambda: client)
+    monkeypatch.setattr(answer, "embed_query", lambda text, **kwargs: [1.0, 0.0])
+    monkeypatch.setattr(answer, "search_collections", lambda *args, **kwargs: {"notion_a": chunks})
+    monkeypatch.setattr(answer.config, "RELATION_EXPANSION", False)
+    monkeypatch.setattr(answer, "conversation_sessions", SessionStore(ttl=60, max_bytes=10_000, max_context_tokens=100))
+    monkeypatch.setattr("src.ollama_utils.retrieval.get_ollama_client", lambda: ollama)
+
+    answer.answer_question_with_details("Who is Mira?", session="g:c")
+    assert "Mira's house is in Vallaki." not in ollama.calls[0]["prompt"]
+    assert answer.conversation_sessions.get("g:c").chunk_ids == {"mira"}
+
+    answer.answer_question_with_details("Where does she live?", session="g:c")
+    assert "Mira's house is in Vallaki." in ollama.calls[1]["prompt"]
+    assert "Mira runs the tavern." not in ollama.calls[1]["prompt"]
+    assert answer.conversation_sessions.get("g:c").chunk_ids == {"mira", "house"}
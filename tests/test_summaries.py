@@ -0,0 +1,70 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+import chromadb
+from langchain_core.documents import Document
+from src.ollama_utils import summaries
+from src.ollama_utils.retrieval import RetrievedChunk, prefer_summaries
+
+
+def fake_generate(prompt):
+    return f"summary of {len(prompt)} chars"
+
+
+def test_split_notes_packs_batches():
+    batches = summaries.split_notes(["a" * 40, "b" * 40, "c" * 40], max_chars=100)
+    assert len(batches) == 2
+    assert all(len(batch) <= 100 for batch in batches)
+
+
+def test_summarize_npc_reduces_to_one_summary():
+    with patch.object(summaries, "_generate", side_effect=fake_generate) as generate:
+        result = summaries.summarize_npc("Ireena", ["note " * 30] * 10, max_chars=200)
+    assert result.startswith("summary of")
+    assert generate.call_count > 10
+
+
+def test_only_changed_groups_are_regenerated():
+    doc_a = Document(page_content="Note A", metadata={"notion_id": "p1", "last_edited_time": "t1"})
+    doc_b = Document(page_content="Note B", metadata={"notion_id": "p2", "last_edited_time": "t1"})
+    groups = {"Ireena": [doc_a], "Strahd": [doc_b]}
+    unchanged = summaries.inputs_hash(summaries.source_versions([doc_a], {}))
+    collection = MagicMock()
+    collection.get.return_value = {
+        "ids": [summaries.summary_id("Ireena"), summaries.summary_id("Strahd")],
+        "metadatas": [{"inputs_hash": unchanged}, {"inputs_hash": "stale"}],
+    }
+    with patch.object(summaries, "_generate", side_effect=fake_generate):
+        ids, docs = summaries.build_npc_summaries(collection, groups, {})
+    assert ids == [summaries.summary_id("Strahd")]
+    assert docs[0].metadata["source"] == "summary"
+    assert '"p2": "t1"' in docs[0].metadata["source_versions"]
+
+
+def test_summary_of_a_vanished_npc_is_deleted_on_the_next_sync():
+    from src.ollama_utils import ingest
+
+    collection = chromadb.EphemeralClient().get_or_create_collection("notion_vanished")
+    collection.add(
+        ids=[summaries.summary_id("Ireena"), summaries.summary_id("Strahd"), "doc_ireena"],
+        documents=["Ireena summary", "Strahd summary", "Ireena notes"],
+        metadatas=[{"source": "summary"}, {"source": "summary"}, {"source": "synthesized"}],
+        embeddings=[[1.0, 0.0], [0.0, 1.0], [0.9, 0.1]],
+    )
+    doc = Document(page_content="Note", metadata={"notion_id": "p1", "last_edited_time": "t1"})
+    # Strahd lost his notes and Ireena's are unchanged, so there is nothing to regenerate
+    with patch.object(ingest, "build_npc_summaries", return_value=([], [])):
+        ingest.store_npc_summaries("vanished", collection, {"Ireena": [doc]}, {})
+    assert sorted(collection.get(include=[])["ids"]) == sorted([summaries.summary_id("Ireena"), "doc_ireena"])
+
+
+def test_prefer_summaries_drops_raw_group_document():
+    def chunk(chunk_id, source):
+        return RetrievedChunk(chunk_id, "notion_a", chunk_id, {"About NPC": "Ireena", "source": source}, [1.0])
+    candidates = {"notion_a": [chunk("doc_0", "synthesized"), chunk("summary_x", "summary")]}
+    assert [c.id for c in prefer_summaries(candidates)["notion_a"]] == ["summary_x"]
@@ -0,0 +1,42 @@
+import json
+import sys
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+from src.ollama_utils.retrieval import RetrievedChunk
+from src.ollama_utils.sweep import SweepConfig, SweepResult, build_grid, pick_cheapest, score
+
+
+def chunk(chunk_id, **metadata):
+    return RetrievedChunk(id=chunk_id, collection="notion_a", document=chunk_id, metadata=metadata, embedding=[1.0])
+
+
+def test_build_grid_skips_lambda_for_similarity_and_small_fetch_k():
+    grid = build_grid(["mmr", "similarity"], ks=[4, 8], fetch_ks=[4], lambdas=[0.3, 0.7], search_efs=[0])
+    assert grid == [
+        SweepConfig("mmr", 4, 4, 0.3, 0),
+        SweepConfig("mmr", 4, 4, 0.7, 0),
+        SweepConfig("similarity", 4, 4, None, 0),
+    ]
+
+
+def test_score_matches_chunk_ids_npcs_and_summary_sources():
+    chunks = [
+        chunk("doc_0", **{"About NPC": "Strahd"}),
+        chunk("summary_1", source="summary", source_versions=json.dumps({"page-1": "2024-01-01"})),
+    ]
+    assert score(chunks, {"Ireena", "page-1"}) == (0.5, 0.5)
+    assert score(chunks, {"Strahd"}) == (1.0, 1.0)
+    assert score(chunks, {"missing"}) == (0.0, 0.0)
+
+
+def test_pick_cheapest_prefers_fewer_chunks_then_latency():
+    def result(k, recall, p95):
+        return SweepResult(SweepConfig("mmr", k, 40, 0.5), recall, 1.0, p95 / 2, p95, float(k))
+
+    results = [result(8, 0.95, 0.001), result(4, 0.9, 0.004), result(4, 0.9, 0.002), result(2, 0.5, 0.001)]
+    assert pick_cheapest(results, 0.9) is results[2]
+    assert pick_cheapest(results, 0.99) is None
@@ -0,0 +1,64 @@
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+import httpx
+import pytest
+from benchmarks.fakes import FakeNotionServer, FakeOllamaServer, SyntheticDatabase
+from benchmarks.run import configure
+from src import config
+from src.clients import close_clients
+from src.clients.rate_limit import TokenBucket, rate_limit_hooks
+
+
+def test_token_bucket_limits_rate_after_burst():
+    bucket = TokenBucket(rate=50, burst=2)
+    start = time.monotonic()
+    for _ in range(7):
+        bucket.acquire()
+    # Two requests ride the burst, the other five wait 1/50s each
+    assert time.monotonic() - start >= 0.09
+
+
+def test_rate_limit_hooks_pause_on_429():
+    bucket = TokenBucket(rate=1000, burst=1)
+    transport = httpx.MockTransport(lambda request: httpx.Response(429, headers={"Retry-After": "0.1"}))
+    with httpx.Client(transport=transport, event_hooks=rate_limit_hooks(bucket)) as client:
+        client.get("https://api.notion.com/v1/users")
+        start = time.monotonic()
+        client.get("https://api.notion.com/v1/users")
+    assert time.monotonic() - start >= 0.09
+
+
+@pytest.fixture
+def stand_ins(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "NOTION_DATABASE_IDS", [])
+    databases = [SyntheticDatabase("db1", 20), SyntheticDatabase("db2", 30)]
+    with FakeOllamaServer() as ollama, FakeNotionServer(databases) as notion:
+        configure(ollama.url, notion.url, str(tmp_path))
+        yield
+    close_clients()
+
+
+def test_process_notion_databases_discovers_and_isolates_failures(stand_ins):
+    from src.notion.download import discover_databases, process_notion_databases
+
+    assert [database["id"] for database in discover_databases()] == ["db1", "db2"]
+
+    report = process_notion_databases()
+    assert {result.database_id: result.pages for result in report.results} == {"db1": 20, "db2": 30}
+    assert not report.failed
+
+    report = process_notion_databases(["db1", "missing"])
+    assert [result.database_id for result in report.failed] == ["missing"]
+    assert report.pages == 20
+    assert "1/2 databases" in report.format()
+
+    # A hyphenated id syncs into the same collection as the bare one
+    report = process_notion_databases(["D-B1"])
+    assert [result.database_id for result in report.results] == ["db1"]
+    assert not report.failed
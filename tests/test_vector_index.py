@@ -0,0 +1,122 @@
+import sys
+from pathlib import Path
+
+# Add the project root to sys.path
+project_root = Path(__file__).parents[1]
+sys.path.insert(0, str(project_root))
+
+import chromadb
+import numpy as np
+import pytest
+from src import config
+from src.database import export, vector_index
+from src.ollama_utils.retrieval import search_collections
+
+
+@pytest.fixture
+def collection(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "VECTOR_INDEX_DIRECTORY", tmp_path / "vector_index")
+    for state in ("_indexes", "_dimensions", "_pending", "_build_locks"):
+        monkeypatch.setattr(vector_index, state, {})
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    collection = client.create_collection("notion_exact", metadata={"hnsw:space": "cosine"})
+    rng = np.random.default_rng(0)
+    collection.add(
+        ids=[f"doc_{i}" for i in range(200)],
+        documents=[f"note {i}" for i in range(200)],
+        metadatas=[{"index": i} for i in range(200)],
+        embeddings=rng.normal(size=(200, 16)).tolist(),
+    )
+    return client, collection
+
+
+def test_exact_search_matches_brute_force(collection):
+    _, chroma_collection = collection
+    vector_index.refresh_index(chroma_collection)
+    index = vector_index.get_index(chroma_collection)
+    records = chroma_collection.get(include=["embeddings"])
+    embeddings = np.array(records["embeddings"])
+    query = embeddings[3] + 0.1
+
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    expected = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:10]
+    found = index.search(query, 10)
+    assert [index.ids[row] for row, _ in found] == [records["ids"][i] for i in expected]
+    assert found[0][1] <= found[-1][1]
+
+
+def test_first_query_falls_back_to_chroma_while_the_index_builds(collection):
+    _, chroma_collection = collection
+    assert vector_index.get_index(chroma_collection) is None
+    vector_index._pending["notion_exact"].result()
+    assert vector_index.get_index(chroma_collection).count == 200
+
+
+def test_stale_index_is_served_while_rebuilt_in_background(collection):
+    _, chroma_collection = collection
+    vector_index.refresh_index(chroma_collection)
+    chroma_collection.delete(ids=["doc_0", "doc_1"])
+    # The query path never waits on a rebuild
+    assert vector_index.get_index(chroma_collection).count == 200
+    vector_index._pending["notion_exact"].result()
+    index = vector_index.get_index(chroma_collection)
+    assert index.count == 198
+    assert "doc_0" not in index.ids
+
+
+class GrowingCollection:
+    """A collection that gains records after build_index has read its count."""
+
+    def __init__(self, collection, added: int):
+        self.collection = collection
+        self.name = collection.name
+        self.added = added
+
+    def count(self) -> int:
+        count = self.collection.count()
+        if self.added:
+            rng = np.random.default_rng(1)
+            self.collection.add(ids=[f"new_{i}" for i in range(self.added)],
+                                documents=[f"new note {i}" for i in range(self.added)],
+                                metadatas=[{"index": 200 + i} for i in range(self.added)],
+                                embeddings=rng.normal(size=(self.added, 16)).tolist())
+            self.added = 0
+        return count
+
+    def get(self, **kwargs):
+        return self.collection.get(**kwargs)
+
+
+def test_build_survives_records_added_while_paging(collection, monkeypatch):
+    _, chroma_collection = collection
+    monkeypatch.setattr(vector_index, "iter_collection",
+                        lambda c, include: export.iter_collection(c, batch_size=64, include=include))
+    index = vector_index.build_index(GrowingCollection(chroma_collection, added=150))
+    assert index.count == 350 and index.matrix.shape == (350, 16)
+    assert "new_149" in index.ids
+    row = index.ids.index("doc_7")
+    embedding = np.array(chroma_collection.get(ids=["doc_7"], include=["embeddings"])["embeddings"][0])
+    assert np.allclose(index.matrix[row], embedding / np.linalg.norm(embedding), atol=1e-6)
+
+
+def test_threshold_is_sized_in_bytes(collection, monkeypatch):
+    _, chroma_collection = collection
+    # 200 vectors x 16 dimensions x 4 bytes = 12,800 bytes
+    monkeypatch.setattr(config, "EXACT_SEARCH_MAX_MB", 0.02)
+    assert vector_index.use_exact(chroma_collection, 200)
+    monkeypatch.setattr(config, "EXACT_SEARCH_MAX_MB", 0.01)
+    assert not vector_index.use_exact(chroma_collection, 200)
+
+
+def test_search_collections_picks_backend_by_size(collection, monkeypatch):
+    client, chroma_collection = collection
+    query = chroma_collection.get(ids=["doc_5"], include=["embeddings"])["embeddings"][0]
+
+    vector_index.refresh_index(chroma_collection)
+    exact = search_collections(client, query, ["notion_exact"], fetch_k=5)["notion_exact"]
+    monkeypatch.setattr(config, "EXACT_SEARCH_MAX_MB", 0.01)
+    approximate = search_collections(client, query, ["notion_exact"], fetch_k=5)["notion_exact"]
+
+    assert exact[0].id == "doc_5"
+    assert exact[0].metadata == {"index": 5}
+    assert [chunk.id for chunk in exact] == [chunk.id for chunk in approximate]